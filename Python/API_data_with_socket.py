@@ -4,6 +4,9 @@ import keyboard
 
 from AeroPy.TrignoBase import TrignoBase
 from AeroPy.DataManager import DataKernel
+from AeroPy.ChannelRouting import build_routing_table, guids_by_type
+from AeroPy.Recording import RecordingBuffer
+from AeroPy.RecordingFile import RecordingReader, RecordingWriter
 from Export import CsvWriter
 
 import threading
@@ -33,8 +36,10 @@ emg_socket.connect((HOST, EMG_PORT))
 acc_socket.connect((HOST, ACC_PORT))
 gyro_socket.connect((HOST, GYRO_PORT))
 
-# Initialize a dictionary to store data for each channel
-recorded_data = []
+# Initialize the per-channel sample buffers (NumPy chunks, one packet appended at a time)
+recorded_data = RecordingBuffer()
+# Streamed to disk during the acquisition, converted to CSV at the end
+recording_path = "recorded_data.emgrec"
 
 # Initialize Trigno Base connection
 def initialize_trigno_base():
@@ -53,35 +58,21 @@ def initialize_trigno_base():
         return None
 
 def process_channel_data(channel_guid, data):
-    sensor_type = None
-    sock = None
-
-    if channel_guid in emg_guids:
-        sensor_type = "EMG"
-        sock = emg_socket
-    elif channel_guid in acc_guids:
-        sensor_type = "ACC"
-        sock = acc_socket
-    elif channel_guid in gyro_guids:
-        sensor_type = "GYRO"
-        sock = gyro_socket
-
-    if sensor_type is None:
+    # One lookup in the routing table built after SetSampleMode gives type and socket
+    route = routes.get(channel_guid)
+    if route is None:
         # Skip if not recognized sensor type
         return
+    sensor_type = route.dtype
+    sock = route.target
+
+    recorded_data.append_packet(channel_guid, sensor_type, data)
 
     for sample in data:
         time_point = sample.Item1
         value = sample.Item2
         print(f"[{sensor_type}] Channel GUID: {channel_guid}, Time: {time_point}, Value: {value}")
 
-        recorded_data.append({
-            "sensor_type": sensor_type,
-            "channel_guid": channel_guid,
-            "time_point": time_point,
-            "value": value
-        })
-
         # Send data over the socket as a CSV line
         message = f"{sensor_type},{channel_guid},{time_point},{value}\n"
         try:
@@ -101,10 +92,6 @@ if __name__ == "__main__":
         base.Connect_Callback() 
         print("Connected to Trigno Base Station")
 
-        emg_guids = []
-        skin_guids = []
-        acc_guids = []
-        gyro_guids = []
         # Get available sensors
         sensors = base.Scan_Callback()  
         print(f"Found {len(sensors)} sensors.")
@@ -146,25 +133,14 @@ if __name__ == "__main__":
                     info_socket.sendall(message2.encode())
                 except Exception as e:
                     print(f"Socket send error for {message2}: {e}")
+        # GUID -> (type, channel index, sample rate, target) for the acquisition loop
+        routes = build_routing_table(sensors, {"EMG": emg_socket, "ACC": acc_socket, "GYRO": gyro_socket})
+        for guid, route in routes.items():
+            recorded_data.add_channel(guid, route.dtype, route.sample_rate)
 
-                #to select only EMG channel for each sensor
-                if str(channel.Type) == 'EMG':
-                    emg_guids.append(guid)
-                if str(channel.Type) == 'SkinCheck':
-                    skin_guids.append(guid)
-                if str(channel.Type) == 'ACC':    
-                    acc_guids.append(guid)
-                if str(channel.Type) == 'GYRO':
-                    gyro_guids.append(guid)
-        emg_guids_str = [str(guid) for guid in emg_guids]
-        skin_guids_str = [str(guid) for guid in skin_guids]
-        acc_guids_str = [str(guid) for guid in acc_guids]
-        gyro_guids_str = [str(guid) for guid in gyro_guids]
         print(f"Component number: {component_ids}")
-        print(f"EMG GUIDs: {emg_guids_str}")
-        print(f"Skin GUIDs: {skin_guids_str}")
-        print(f"ACC GUIDs: {acc_guids_str}")
-        print(f"GYRO GUIDs: {gyro_guids_str}")
+        for dtype, guids in guids_by_type(routes).items():
+            print(f"{dtype} channels: {len(guids)}")
   
         # Close sockets info cleanly
         try:
@@ -185,6 +161,11 @@ if __name__ == "__main__":
         base.TrigBase.Start(ytdata = True)
         print("Data collection started...")
 
+        # Flush the buffers to disk every 200 ms, so memory stays flat and a crash loses at most ~1 s
+        writer = RecordingWriter(recording_path, recorded_data,
+                                 metadata={"sensors": [str(sensor.Id) for sensor in sensors]})
+        writer.start()
+
         # Now stream the data in a loop
         try:
             while True:
@@ -217,6 +198,9 @@ if __name__ == "__main__":
             base.TrigBase.ResetPipeline()
             print("Pipeline reset. Now back to Connected state.")
 
+            writer.close()
+            print(f"Recording stream closed: {recording_path}")
+
             # Close sockets cleanly
             try:
                 emg_socket.close()
@@ -240,15 +224,8 @@ if __name__ == "__main__":
                     
                     csv_file.write("\n")  # Add a blank line before the data section
 
-                    fieldnames = ["sensor_type", "channel_guid", "time_point", "value"]
-                    writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-
-                    # Write the header
-                    writer.writeheader()
-                    
-                    # Write the data
-                    for row in recorded_data:
-                        writer.writerow(row)
+                    # Write the header and the data, reading back the recording file
+                    RecordingReader(recording_path).write_csv(csv_file)
 
                 print(f"Data saved to {csv_file_path}")
             except Exception as e:
@@ -0,0 +1,86 @@
+"""
+Background acquisition helpers for the asyncio recorders (emg_sensor_flag.py, trigno_async_optimized.py).
+
+YTPoller polls the DelsysAPI YT queue from a dedicated thread and hands each batch to the event
+loop with loop.call_soon_threadsafe, so the event loop never spins on CheckYTDataQueue.
+KeyWatcher checks the keyboard at a low rate from its own thread instead of doing a thread hop
+on every iteration of the acquisition loop.
+"""
+import threading
+import time
+
+
+class YTPoller(threading.Thread):
+    """
+    Adaptive YT poller.
+
+    The expected packet period starts at samples_per_packet / sample_rate and follows the measured
+    time between packets. After a packet the thread sleeps for `lead` of that period; then, until
+    the next packet arrives, it polls every period / fine_divider. Poll-to-dispatch jitter is
+    bounded by that fine interval while the thread stays asleep most of the time.
+    """
+
+    def __init__(self, trig_base, loop, on_batch, sample_rate=2148.0, samples_per_packet=27,
+                 lead=0.75, fine_divider=10):
+        threading.Thread.__init__(self, name="YTPoller", daemon=True)
+        self.trig_base = trig_base
+        self.loop = loop
+        self.on_batch = on_batch
+        self.nominal_period = samples_per_packet / float(sample_rate)
+        self.period = self.nominal_period
+        self.lead = lead
+        self.fine_divider = fine_divider
+        self.polls = 0
+        self.batches = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last_batch = None
+        while not self._stop_event.is_set():
+            self.polls += 1
+            if self.trig_base.CheckYTDataQueue():
+                yt_data = self.trig_base.PollYTData()
+                t_poll = time.perf_counter()
+                self.batches += 1
+                self.loop.call_soon_threadsafe(self.on_batch, yt_data, t_poll)
+
+                # Follow the real packet rate, within a factor 4 of the configured one
+                if last_batch is not None:
+                    measured = t_poll - last_batch
+                    self.period = 0.9 * self.period + 0.1 * min(max(measured, self.nominal_period / 4),
+                                                                self.nominal_period * 4)
+                last_batch = t_poll
+                wait = self.period * self.lead
+            else:
+                wait = self.period / self.fine_divider
+            self._stop_event.wait(wait)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+
+class KeyWatcher(threading.Thread):
+    """Calls on_press (from the watcher thread) the first time `key` is pressed"""
+
+    def __init__(self, key, on_press, interval=0.05):
+        threading.Thread.__init__(self, name="KeyWatcher", daemon=True)
+        self.key = key
+        self.on_press = on_press
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        import keyboard
+
+        while not self._stop_event.is_set():
+            if keyboard.is_pressed(self.key):
+                self.on_press()
+                return
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
@@ -0,0 +1,38 @@
+"""
+GUID routing table for the acquisition loops.
+
+Built once after the sensors are configured, it maps every channel GUID to the data type,
+the index of the channel among the channels of that type, its sample rate and the target
+(queue, socket, ...) its samples go to. Dispatching a packet is then one dict lookup per
+GUID, whatever the number of sensors attached.
+"""
+from collections import namedtuple
+
+ChannelRoute = namedtuple("ChannelRoute", ["dtype", "index", "sample_rate", "target"])
+
+
+def build_routing_table(sensors, targets):
+    """
+    sensors : scanned sensors (Scan_Callback / GetScannedSensorsFound), after SetSampleMode
+    targets : {data type: target} - channels whose type is not in targets are not routed
+
+    Returns {GUID: ChannelRoute}
+    """
+    routes = {}
+    counts = {dtype: 0 for dtype in targets}
+    for sensor in sensors:
+        for channel in sensor.TrignoChannels:
+            dtype = str(channel.Type)
+            if dtype not in targets or channel.Id in routes:
+                continue
+            routes[channel.Id] = ChannelRoute(dtype, counts[dtype], channel.SampleRate, targets[dtype])
+            counts[dtype] += 1
+    return routes
+
+
+def guids_by_type(routes):
+    """{data type: [GUID, ...]} in channel index order"""
+    grouped = {}
+    for guid, route in routes.items():
+        grouped.setdefault(route.dtype, []).append(guid)
+    return grouped
@@ -0,0 +1,103 @@
+"""
+Conversion of DelsysAPI poll results (.NET collections through pythonnet) into float64 NumPy arrays.
+
+PollData channels (List<double>) are copied in one block: List.ToArray() on the .NET side, then
+Marshal.Copy straight into the memory of a preallocated NumPy array. PollYTData channels
+(List<(double, double)>) hold value tuples, which cannot be block-copied as they are: they are
+unzipped on the .NET side into two double[] (Enumerable.Select with compiled Item1 / Item2
+accessors, then ToArray), and each one is block-copied into a column of a preallocated array.
+
+If a .NET copy raises (e.g. an overload pythonnet does not resolve), the packet is converted
+with np.fromiter instead and the fast path is turned off for the rest of the run, so a packet is
+never lost to the conversion. With the simulated backend (Python lists) the same functions fall
+back to plain NumPy conversions.
+"""
+import numpy as np
+
+_block_copy = None
+_yt_unzip = None
+
+
+def _get_block_copy():
+    """Return a function copying a .NET double[] into a NumPy array, or False without .NET"""
+    global _block_copy
+    if _block_copy is None:
+        try:
+            from System import Int64, IntPtr
+            from System.Runtime.InteropServices import Marshal
+        except ImportError:  # simulated backend: no .NET runtime loaded
+            _block_copy = False
+        else:
+            def _block_copy(source, out):
+                Marshal.Copy(source, 0, IntPtr.__overloads__[Int64](out.ctypes.data), out.size)
+    return _block_copy
+
+
+def _get_yt_unzip():
+    """Return a function unzipping a .NET List<(double, double)> into two double[], or False"""
+    global _yt_unzip
+    if _yt_unzip is None:
+        try:
+            import clr
+            clr.AddReference("System.Linq")
+            clr.AddReference("System.Linq.Expressions")
+            from System import Double, Func, ValueTuple
+            from System.Linq import Enumerable
+            from System.Linq.Expressions import Expression
+
+            sample_type = ValueTuple[Double, Double]
+            sample = Expression.Parameter(sample_type, "sample")
+            item1, item2 = (Expression.Lambda[Func[sample_type, Double]](Expression.Field(sample, name), sample).Compile()
+                            for name in ("Item1", "Item2"))
+            select = Enumerable.Select[sample_type, Double]
+            to_array = Enumerable.ToArray[Double]
+        except Exception:  # simulated backend, or a runtime without LINQ expressions
+            _yt_unzip = False
+        else:
+            def _yt_unzip(data):
+                return to_array(select(data, item1)), to_array(select(data, item2))
+    return _yt_unzip
+
+
+def values_to_array(data):
+    """Return the values of one PollData channel as a float64 array"""
+    global _block_copy
+    if isinstance(data, np.ndarray):
+        return data.astype(np.float64, copy=False)
+    n = len(data)
+    if hasattr(data, "ToArray") and _get_block_copy():
+        out = np.empty(n, dtype=np.float64)
+        try:
+            if n:
+                _block_copy(data.ToArray(), out)
+            return out
+        except Exception:
+            _block_copy = False
+    return np.fromiter(data, dtype=np.float64, count=n)
+
+
+def yt_packet_to_samples(data):
+    """Return one PollYTData channel as an (n, 2) float64 array of (T, Y) rows"""
+    global _yt_unzip
+    if isinstance(data, np.ndarray):
+        return data.astype(np.float64, copy=False).reshape(-1, 2)
+    n = len(data)
+    if n and not hasattr(data[0], "Item1"):  # plain (T, Y) pairs
+        return np.asarray(data, dtype=np.float64).reshape(n, 2)
+    if n and hasattr(data, "ToArray") and _get_block_copy() and _get_yt_unzip():
+        # One contiguous row per column: the (n, 2) result is a transposed view of it
+        columns = np.empty((2, n), dtype=np.float64)
+        try:
+            for source, out in zip(_yt_unzip(data), columns):
+                _block_copy(source, out)
+            return columns.T
+        except Exception:
+            _yt_unzip = False
+    return np.fromiter((v for sample in data for v in (sample.Item1, sample.Item2)),
+                       dtype=np.float64, count=2 * n).reshape(n, 2)
+
+
+def yt_packet_to_arrays(data):
+    """Convert one channel of a PollYTData packet (List<(T, Y)>) into (times, values) float64 arrays"""
+    samples = yt_packet_to_samples(data)
+    return samples[:, 0], samples[:, 1]
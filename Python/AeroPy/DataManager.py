@@ -2,9 +2,15 @@
 This is the class that handles the data that is output from the Delsys Trigno Base.
 Create an instance of this and pass it a reference to the Trigno base for initialization.
 See CollectDataController.py for a usage example.
+
+Channel data is converted to float64 NumPy arrays once per packet (see Conversion.py):
+values arrays for PollData, (n, 2) (T, Y) arrays for PollYTData. allcollectiondata keeps
+one list of packet arrays per channel.
 """
 import numpy as np
 
+from .Conversion import values_to_array, yt_packet_to_samples
+
 
 class DataKernel():
     def __init__(self, trigno_base):
@@ -17,47 +23,38 @@ class DataKernel():
         self.channel_guids = []
 
     def processData(self, data_queue):
-        """Processes the data from the DelsysAPI and place it in the data_queue argument"""
+        """
+        Processes the data from the DelsysAPI and place it in the data_queue argument.
+        Returns True if a packet was available.
+        """
         outArr = self.GetData()
-        if outArr is not None:
-            for i in range(len(outArr)):
-                self.allcollectiondata[i].extend(outArr[i][0].tolist())
-            try:
-                for i in range(len(outArr[0])):
-                    if np.asarray(outArr[0]).ndim == 1:
-                        data_queue.append(list(np.asarray(outArr, dtype='object')[0]))
-                    else:
-                        data_queue.append(list(np.asarray(outArr, dtype='object')[:, i]))
-                try:
-                    self.packetCount += len(outArr[0])
-                    self.sampleCount += len(outArr[0][0])
-                except:
-                    pass
-            except IndexError:
-                pass
+        if outArr is None:
+            return False
+        for i in range(len(outArr)):
+            self.allcollectiondata[i].append(outArr[i][0])
+        if len(outArr) > 0:
+            # One entry per packet: the float64 values array of every channel
+            data_queue.append([chan[0] for chan in outArr])
+            self.packetCount += len(outArr[0])
+            self.sampleCount += len(outArr[0][0])
+        return True
 
     def processYTData(self, data_queue):
-        """Processes the data from the DelsysAPI and place it in the data_queue argument"""
+        """
+        Processes the data from the DelsysAPI and place it in the data_queue argument.
+        Returns True if a packet was available.
+        """
         outArr = self.GetYTData()
-        if outArr is not None:
-            for i in range(len(outArr)):
-                self.allcollectiondata[i].extend(outArr[i][0].tolist())
-            try:
-                yt_outArr = []
-                for i in range(len(outArr)):
-                    chan_yt = outArr[i]
-                    chan_ydata = np.asarray([k.Item2 for k in chan_yt[0]], dtype='object')
-                    yt_outArr.append(chan_ydata)
-
-                data_queue.append(list(yt_outArr))
-
-                try:
-                    self.packetCount += len(outArr[0])
-                    self.sampleCount += len(outArr[0][0])
-                except:
-                    pass
-            except IndexError:
-                pass
+        if outArr is None:
+            return False
+        for i in range(len(outArr)):
+            self.allcollectiondata[i].append(outArr[i][0])
+        if len(outArr) > 0:
+            # One entry per packet: the Y column of every channel (a view, no copy)
+            data_queue.append([chan[0][:, 1] for chan in outArr])
+            self.packetCount += len(outArr[0])
+            self.sampleCount += len(outArr[0][0])
+        return True
 
     def GetData(self):
         """ Check if data ready from DelsysAPI via Aero CheckDataQueue() - Return True if data is ready
@@ -76,7 +73,7 @@ class DataKernel():
 
                     for j in range(len(self.trigno_base.channel_guids)):            #Loop all channels set during configuration (default behavior is all channels unless updated)
                         chan_data = DataOut[self.trigno_base.channel_guids[j]]      # Index a single channels data from the dictionary based on unique channel GUID (key)
-                        outArr[j].append(np.asarray(chan_data, dtype='object'))     # Create a NumPy array of the channel data and add to the output array
+                        outArr[j].append(values_to_array(chan_data))                # Bulk copy the channel data into a float64 array and add to the output array
 
                     return outArr
             except Exception as e:
@@ -102,7 +99,7 @@ class DataKernel():
 
                     for j in range(len(self.trigno_base.channel_guids)):            #Loop all channels set during configuration (default behavior is all channels unless updated)
                         chan_yt_data = DataOut[self.trigno_base.channel_guids[j]]    # Index a single channels data from the dictionary based on unique channel GUID (key)
-                        outArr[j].append(np.asarray(chan_yt_data, dtype='object'))  # Create a NumPy array of the channel data and add to the output array
+                        outArr[j].append(yt_packet_to_samples(chan_yt_data))        # Convert the channel data into an (n, 2) float64 (T, Y) array and add to the output array
 
                     return outArr
 
@@ -0,0 +1,205 @@
+"""
+In-memory recording storage for the acquisition scripts (trigno_async_optimized.py, api_data.py,
+API_data_with_socket.py).
+
+Every channel keeps its samples in fixed-size NumPy chunks (float64 time, float32 value): a
+PollYTData packet is appended with a couple of slice copies, memory grows by one chunk at a time
+and nothing is ever reallocated or copied as the recording gets longer. An hour at 4000 Hz is
+about 170 MB for 16 channels instead of several GB of per-sample dicts.
+
+For long sessions a RecordingWriter (RecordingFile.py) drains the buffers to disk while recording,
+so only the samples of the last flush interval stay in memory.
+"""
+import threading
+
+import numpy as np
+
+from .Conversion import values_to_array, yt_packet_to_arrays, yt_packet_to_samples  # yt_packet_to_arrays re-exported
+
+CHUNK_SIZE = 65536  # samples per chunk (~768 kB per channel)
+CSV_FIELDS = ["sensor_type", "channel_guid", "time_point", "value"]
+
+
+def channel_to_arrays(chan_data, yt):
+    """
+    (times, values) float64 arrays of one channel of collected data (DataKernel.allcollectiondata):
+    a list of per-packet arrays ((n, 2) (T, Y) rows when yt is True, values otherwise), or a flat
+    list of samples. times is None when yt is False.
+    """
+    if len(chan_data) > 0 and isinstance(chan_data[0], np.ndarray):
+        chan_data = np.concatenate(chan_data)
+    if yt:
+        samples = yt_packet_to_samples(chan_data) if len(chan_data) > 0 else np.empty((0, 2))
+        return samples[:, 0], samples[:, 1]
+    return None, values_to_array(chan_data)
+
+
+def write_csv_rows(f, dtype, guid, times, values):
+    """Write samples of one channel as sensor_type,channel_guid,time_point,value rows"""
+    fmt = f"{dtype},{guid},%.12g,%.7g"  # values are float32: 7 significant digits
+    np.savetxt(f, np.column_stack((times, values)), fmt=fmt)
+
+
+class ChannelBuffer:
+    """
+    Append-only (time, value) buffer of a single channel.
+
+    append() and drain() may be called from different threads (acquisition and disk writer).
+    count is the number of samples held, total the number appended since creation.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._times = []
+        self._values = []
+        self._fill = chunk_size  # samples used in the last chunk (chunk_size: no room left)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return len(self._times) * self.chunk_size * (8 + 4)
+
+    def append(self, times, values):
+        times = np.asarray(times, dtype=np.float64).ravel()
+        values = np.asarray(values, dtype=np.float32).ravel()
+        n = times.size
+        if values.size != n:
+            raise ValueError("times and values must have the same length")
+
+        with self._lock:
+            self._append(times, values)
+
+    def _append(self, times, values):
+        n = times.size
+        start = 0
+        while start < n:
+            if self._fill == self.chunk_size:
+                self._times.append(np.empty(self.chunk_size, dtype=np.float64))
+                self._values.append(np.empty(self.chunk_size, dtype=np.float32))
+                self._fill = 0
+            k = min(n - start, self.chunk_size - self._fill)
+            self._times[-1][self._fill:self._fill + k] = times[start:start + k]
+            self._values[-1][self._fill:self._fill + k] = values[start:start + k]
+            self._fill += k
+            start += k
+        self.count += n
+        self.total += n
+
+    def append_packet(self, data):
+        """Append one channel of a PollYTData packet"""
+        self.append(*yt_packet_to_arrays(data))
+
+    def chunks(self):
+        """Yield (times, values) views of the stored samples, oldest first, without copying"""
+        for i, (times, values) in enumerate(zip(self._times, self._values)):
+            end = self._fill if i == len(self._times) - 1 else self.chunk_size
+            yield times[:end], values[:end]
+
+    def arrays(self):
+        """Return the whole channel as two contiguous arrays (a copy)"""
+        if self.count == 0:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+        parts = list(self.chunks())
+        return np.concatenate([t for t, _ in parts]), np.concatenate([v for _, v in parts])
+
+    def tail(self, n):
+        """Return the last n samples as (times, values) arrays (e.g. for the plot window)"""
+        n = min(n, self.count)
+        times = np.empty(n, dtype=np.float64)
+        values = np.empty(n, dtype=np.float32)
+        end = n
+        for chunk_times, chunk_values in reversed(list(self.chunks())):
+            if end == 0:
+                break
+            k = min(end, chunk_times.size)
+            times[end - k:end] = chunk_times[-k:]
+            values[end - k:end] = chunk_values[-k:]
+            end -= k
+        return times, values
+
+    def drain(self):
+        """
+        Remove and return the samples held so far as (times, values) arrays.
+        The last chunk is kept and reused, so a buffer drained regularly never grows.
+        """
+        with self._lock:
+            if self.count == 0:
+                return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+            times, values = self.arrays()
+            self._times = self._times[-1:]
+            self._values = self._values[-1:]
+            self._fill = 0
+            self.count = 0
+        return times, values
+
+    def clear(self):
+        with self._lock:
+            self._times = []
+            self._values = []
+            self._fill = self.chunk_size
+            self.count = 0
+
+
+class RecordingBuffer:
+    """The ChannelBuffers of a recording, keyed by channel GUID, with the data type of each channel"""
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.channels = {}      # GUID -> ChannelBuffer
+        self.dtypes = {}        # GUID -> data type ('EMG', 'ACC', ...)
+        self.sample_rates = {}  # GUID -> sample rate (Hz), when known
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self.channels.values())
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.channels.values())
+
+    def channel(self, guid, dtype=None):
+        """Return the buffer of a channel, creating it on first use"""
+        buffer = self.channels.get(guid)
+        if buffer is None:
+            # setdefault keeps this safe when several threads add channels at the same time
+            self.dtypes.setdefault(guid, dtype)
+            buffer = self.channels.setdefault(guid, ChannelBuffer(self.chunk_size))
+        return buffer
+
+    def add_channel(self, guid, dtype, sample_rate=None):
+        """Declare a channel up front (e.g. from the routing table) so its sample rate is recorded"""
+        if sample_rate is not None:
+            self.sample_rates[guid] = sample_rate
+        return self.channel(guid, dtype)
+
+    def append(self, guid, dtype, times, values):
+        self.channel(guid, dtype).append(times, values)
+
+    def append_packet(self, guid, dtype, data):
+        """Append one channel of a PollYTData packet"""
+        self.channel(guid, dtype).append_packet(data)
+
+    def items(self):
+        """Yield (guid, dtype, ChannelBuffer) for every channel, in order of first appearance"""
+        for guid, buffer in list(self.channels.items()):
+            yield guid, self.dtypes[guid], buffer
+
+    def clear(self):
+        self.channels = {}
+        self.dtypes = {}
+        self.sample_rates = {}
+
+    def write_csv(self, f, header=True):
+        """
+        Write the samples as sensor_type,channel_guid,time_point,value rows, channel after channel.
+        f is a text file opened for writing.
+        """
+        if header:
+            f.write(",".join(CSV_FIELDS) + "\n")
+        for guid, dtype, buffer in self.items():
+            for times, values in buffer.chunks():
+                write_csv_rows(f, dtype, guid, times, values)
@@ -0,0 +1,278 @@
+"""
+Append-only recording file written while the acquisition is running.
+
+A RecordingWriter thread drains the ChannelBuffers of a RecordingBuffer every `interval` seconds
+and appends one data block per channel to the file, with an fsync every `fsync_interval` seconds.
+Memory use therefore stays flat however long the session is, and a crash loses at most the
+last unsynced second. On close an index of all blocks is appended as a footer.
+
+RecordingReader reads complete files through the footer and falls back to a sequential scan
+for files that were never closed: every record carries a CRC32, so the scan stops at the first
+torn or missing record and everything before it is recovered.
+
+Layout (little endian):
+    header  : magic b"EMGR" (4s), version (H), reserved (H)
+    record  : kind (B), reserved (B), reserved (H), channel (I), payload length (I), payload, crc32 (I)
+              CHANNEL  payload = JSON {"guid", "dtype", "sample_rate"}
+              METADATA payload = JSON (free form, e.g. the sensor info lines)
+              DATA     payload = n float64 times + n float32 values
+              INDEX    payload = JSON length (I), JSON summary, (channel, offset, samples) entries
+    trailer : offset of the INDEX record (Q), magic b"EMGE" (4s)
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .Recording import CSV_FIELDS, write_csv_rows
+
+_MAGIC = b"EMGR"
+_END_MAGIC = b"EMGE"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_RECORD = struct.Struct("<BBHII")
+_CRC = struct.Struct("<I")
+_TRAILER = struct.Struct("<Q4s")
+_JSON_LENGTH = struct.Struct("<I")
+_INDEX_ENTRY = np.dtype([("channel", "<u4"), ("offset", "<u8"), ("samples", "<u4")])
+
+CHANNEL, METADATA, DATA, INDEX = 1, 2, 3, 4
+_SAMPLE_SIZE = 8 + 4  # float64 time + float32 value
+
+
+class RecordingWriter(threading.Thread):
+    """Background thread streaming a RecordingBuffer to an append-only file"""
+
+    def __init__(self, path, recording, interval=0.2, fsync_interval=1.0, metadata=None):
+        threading.Thread.__init__(self, name="RecordingWriter", daemon=True)
+        self.path = path
+        self.recording = recording
+        self.interval = interval
+        self.fsync_interval = fsync_interval
+        self.error = None
+        self._channels = {}  # GUID -> channel number in the file
+        self._index = []     # (channel, offset, samples) of every data block
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, 0))
+        if metadata is not None:
+            self._write_record(METADATA, 0, json.dumps(metadata).encode())
+        self._sync()
+
+    def _write_record(self, kind, channel, *payload):
+        offset = self._file.tell()
+        length = sum(len(part) for part in payload)
+        header = _RECORD.pack(kind, 0, 0, channel, length)
+        crc = zlib.crc32(header)
+        self._file.write(header)
+        for part in payload:
+            crc = zlib.crc32(part, crc)
+            self._file.write(part)
+        self._file.write(_CRC.pack(crc))
+        return offset
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def run(self):
+        try:
+            while not self._stop_event.wait(self.interval):
+                self.flush()
+        except Exception as e:
+            self.error = e
+            print(f"Recording writer stopped: {e}")
+
+    def flush(self):
+        """Write the samples buffered so far; fsync if the last one is older than fsync_interval"""
+        with self._lock:
+            if self._file is None:
+                return
+            for guid, dtype, buffer in self.recording.items():
+                channel = self._channels.get(guid)
+                if channel is None:
+                    channel = len(self._channels)
+                    self._channels[guid] = channel
+                    info = {"guid": str(guid), "dtype": dtype,
+                            "sample_rate": self.recording.sample_rates.get(guid)}
+                    self._write_record(CHANNEL, channel, json.dumps(info).encode())
+
+                times, values = buffer.drain()
+                if times.size:
+                    offset = self._write_record(DATA, channel, times.tobytes(), values.tobytes())
+                    self._index.append((channel, offset, times.size))
+
+            self._file.flush()
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def close(self):
+        """Stop the thread, write what is left, then the index footer"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.flush()
+        with self._lock:
+            if self._file is None:
+                return
+            index = np.array(self._index, dtype=_INDEX_ENTRY)
+            samples = np.bincount(index["channel"], weights=index["samples"],
+                                  minlength=len(self._channels)).astype(np.int64)
+            summary = {
+                "channels": [{"guid": str(guid), "dtype": self.recording.dtypes.get(guid),
+                              "sample_rate": self.recording.sample_rates.get(guid),
+                              "samples": int(samples[channel])}
+                             for guid, channel in self._channels.items()],
+                "blocks": int(index.size),
+            }
+            summary = json.dumps(summary).encode()
+            offset = self._write_record(INDEX, 0, _JSON_LENGTH.pack(len(summary)), summary, index.tobytes())
+            self._file.write(_TRAILER.pack(offset, _END_MAGIC))
+            self._sync()
+            self._file.close()
+            self._file = None
+
+
+class RecordingReader:
+    """
+    Reader for files written by RecordingWriter.
+
+    complete is False when the file had no valid footer (writer crashed or still running);
+    the channels and blocks are then those recovered by the sequential scan.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.metadata = None
+        self.channels = []  # [{"guid", "dtype", "sample_rate"}, ...] in file order
+        self.blocks = np.empty(0, dtype=_INDEX_ENTRY)
+        self.complete = False
+
+        with open(path, "rb") as f:
+            magic, version, _ = _HEADER.unpack(f.read(_HEADER.size).ljust(_HEADER.size, b"\0"))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{path} is not a recording file")
+            if not self._read_footer(f):
+                self._scan(f)
+
+    @staticmethod
+    def _read_record(f):
+        """Return (kind, channel, payload) of the record at the current position, or None if torn"""
+        header = f.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return None
+        kind, _, _, channel, length = _RECORD.unpack(header)
+        payload = f.read(length)
+        crc = f.read(_CRC.size)
+        if len(payload) < length or len(crc) < _CRC.size:
+            return None
+        if _CRC.unpack(crc)[0] != zlib.crc32(payload, zlib.crc32(header)):
+            return None
+        return kind, channel, payload
+
+    def _read_footer(self, f):
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < _HEADER.size + _TRAILER.size:
+            return False
+        f.seek(size - _TRAILER.size)
+        offset, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != _END_MAGIC or offset >= size:
+            return False
+        f.seek(offset)
+        record = self._read_record(f)
+        if record is None or record[0] != INDEX:
+            return False
+
+        payload = record[2]
+        length = _JSON_LENGTH.unpack_from(payload)[0]
+        summary = json.loads(payload[_JSON_LENGTH.size:_JSON_LENGTH.size + length])
+        self.channels = [{key: channel[key] for key in ("guid", "dtype", "sample_rate")}
+                         for channel in summary["channels"]]
+        self.blocks = np.frombuffer(payload, dtype=_INDEX_ENTRY, offset=_JSON_LENGTH.size + length)
+
+        # The metadata record, if any, is the first one after the header
+        f.seek(_HEADER.size)
+        record = self._read_record(f)
+        if record is not None and record[0] == METADATA:
+            self.metadata = json.loads(record[2])
+        self.complete = True
+        return True
+
+    def _scan(self, f):
+        f.seek(_HEADER.size)
+        blocks = []
+        while True:
+            offset = f.tell()
+            record = self._read_record(f)
+            if record is None:
+                break
+            kind, channel, payload = record
+            if kind == CHANNEL:
+                self.channels.append(json.loads(payload))
+            elif kind == METADATA:
+                self.metadata = json.loads(payload)
+            elif kind == DATA:
+                blocks.append((channel, offset, len(payload) // _SAMPLE_SIZE))
+            elif kind == INDEX:
+                break
+        self.blocks = np.array(blocks, dtype=_INDEX_ENTRY)
+
+    def samples(self, channel):
+        """Number of samples of a channel (index into self.channels)"""
+        return int(self.blocks["samples"][self.blocks["channel"] == channel].sum())
+
+    def iter_blocks(self):
+        """Yield (channel, times, values) for every data block, in the order they were written"""
+        with open(self.path, "rb") as f:
+            for channel, offset, n in self.blocks:
+                f.seek(int(offset) + _RECORD.size)
+                payload = f.read(int(n) * _SAMPLE_SIZE)
+                times = np.frombuffer(payload, dtype="<f8", count=n)
+                values = np.frombuffer(payload, dtype="<f4", count=n, offset=8 * int(n))
+                yield int(channel), times, values
+
+    def first_time(self, channel):
+        """Timestamp of the first sample of a channel, or None if it has no samples"""
+        blocks = self.blocks[(self.blocks["channel"] == channel) & (self.blocks["samples"] > 0)]
+        if blocks.size == 0:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(int(blocks[0]["offset"]) + _RECORD.size)
+            return float(np.frombuffer(f.read(8), dtype="<f8")[0])
+
+    def read_channel(self, channel):
+        """Return (times, values) of one channel, reading only its blocks"""
+        blocks = self.blocks[self.blocks["channel"] == channel]
+        total = int(blocks["samples"].sum())
+        times = np.empty(total, dtype=np.float64)
+        values = np.empty(total, dtype=np.float32)
+        pos = 0
+        with open(self.path, "rb") as f:
+            for _, offset, n in blocks:
+                n = int(n)
+                f.seek(int(offset) + _RECORD.size)
+                f.readinto(memoryview(times[pos:pos + n]).cast("B"))
+                f.readinto(memoryview(values[pos:pos + n]).cast("B"))
+                pos += n
+        return times, values
+
+    def load(self):
+        """Return {GUID string: (times, values)} for all channels"""
+        return {info["guid"]: self.read_channel(channel) for channel, info in enumerate(self.channels)}
+
+    def write_csv(self, f, header=True):
+        """Write the recording as sensor_type,channel_guid,time_point,value rows, in acquisition order"""
+        if header:
+            f.write(",".join(CSV_FIELDS) + "\n")
+        for channel, times, values in self.iter_blocks():
+            info = self.channels[channel]
+            write_csv_rows(f, info["dtype"], info["guid"], times, values)
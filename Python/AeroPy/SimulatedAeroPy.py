@@ -0,0 +1,376 @@
+"""
+Pure-Python stand-in for the DelsysAPI AeroPy layer (no pythonnet, no Trigno base needed).
+
+It implements the subset of AeroPy used by this project (see README.md - AeroPy Documentation)
+and generates synthetic EMG/skin check/ACC/GYRO data, or replays a recorded CSV, for a
+configurable number of sensors. Packets are emitted in real time, accelerated, or as fast
+as they are polled, so acquisition and processing can be benchmarked on any machine.
+
+Select it in TrignoBase by setting the environment variable AEROPY_BACKEND=simulated,
+or instantiate it directly:
+
+    sim = AeroPy(sensor_count=4, speed=10.0)
+    base = TrignoBase(None, aero=sim)
+"""
+import bisect
+import csv
+import itertools
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_MODE = 'EMG raw (2148 Hz), skin check (74 Hz), ACC 2g (74 Hz), GYRO 250 dps (74 Hz), +/-11mv, 10-850Hz'
+
+# Same attribute names as the .NET ValueTuple<double, double> returned by PollYTData
+YTSample = namedtuple("YTSample", ["Item1", "Item2"])
+
+# Mode string component -> (channel type, channel names, unit)
+_MODE_COMPONENTS = [
+    (re.compile(r"^EMG\b.*\(([\d.]+) Hz\)", re.IGNORECASE), "EMG", ["EMG {n}"], "Volts"),
+    (re.compile(r"^skin check\b.*\(([\d.]+) Hz\)", re.IGNORECASE), "SkinCheck", ["IMP {n}"], "Ohms"),
+    (re.compile(r"^ACC\b.*\(([\d.]+) Hz\)", re.IGNORECASE), "ACC", ["ACC X", "ACC Y", "ACC Z"], "G"),
+    (re.compile(r"^GYRO\b.*\(([\d.]+) Hz\)", re.IGNORECASE), "GYRO", ["GYRO X", "GYRO Y", "GYRO Z"], "Deg_S"),
+]
+
+Burst = namedtuple("Burst", ["start", "duration", "amplitude", "sensors"])
+
+
+def _burst_start(burst):
+    return burst.start
+
+
+class _Task:
+    """Completed stand-in for System.Threading.Tasks.Task (only .Result is used)"""
+
+    def __init__(self, result):
+        self.Result = result
+
+
+class PacketDict(dict):
+    """dict with the .Keys property of the .NET Dictionary returned by PollData/PollYTData"""
+
+    @property
+    def Keys(self):
+        return list(self.keys())
+
+
+class SimulatedChannel:
+    def __init__(self, name, ch_type, sample_rate, unit):
+        self.Id = uuid.uuid4()
+        self.Name = name
+        self.Type = ch_type
+        self.SampleRate = sample_rate
+        self.Unit = unit
+        self.IsEnabled = True
+
+
+class _Configuration:
+    def __init__(self, mode, sample_modes):
+        self.ModeString = mode
+        self.SampleModes = sample_modes
+
+
+class _Properties:
+    def __init__(self, sid):
+        self.Sid = sid
+
+
+class SimulatedSensor:
+    def __init__(self, index, mode, sample_modes):
+        self.Id = index + 1
+        self.PairNumber = index + 1
+        self.FriendlyName = "Simulated Avanti Sensor"
+        self.Properties = _Properties(100000 + index)
+        self.Configuration = _Configuration(mode, sample_modes)
+        self.TrignoChannels = []
+        self.set_mode(mode)
+
+    def set_mode(self, mode):
+        self.Configuration.ModeString = mode
+        self.TrignoChannels = []
+        for part in mode.split(","):
+            part = part.strip()
+            for pattern, ch_type, names, unit in _MODE_COMPONENTS:
+                match = pattern.match(part)
+                if match:
+                    rate = float(match.group(1))
+                    for name in names:
+                        self.TrignoChannels.append(SimulatedChannel(name.format(n=1), ch_type, rate, unit))
+                    break
+
+
+class AeroPy:
+    """
+    Drop-in replacement for Aero.AeroPy.
+
+    sensor_count    : number of sensors returned by ScanSensors
+    speed           : 1.0 = real time, 10.0 = ten times faster, None = one packet per poll
+    packet_interval : seconds of data per packet
+    emg_noise       : standard deviation of the resting EMG
+    burst_rate      : random contractions per second (0 disables them, use inject_burst instead)
+    burst_amplitude : standard deviation of the EMG during a contraction
+    burst_duration  : length of a random contraction (s)
+    replay_csv      : recording (recorded_data.csv format) whose EMG channels are replayed in a loop
+    """
+
+    def __init__(self, sensor_count=1, speed=1.0, packet_interval=0.0135, sample_mode=DEFAULT_MODE,
+                 emg_noise=0.005, burst_rate=0.5, burst_amplitude=0.5, burst_duration=0.3,
+                 replay_csv=None, seed=None):
+        self.sensor_count = sensor_count
+        self.speed = speed
+        self.packet_interval = packet_interval
+        self.sample_mode = sample_mode
+        self.emg_noise = emg_noise
+        self.burst_rate = burst_rate
+        self.burst_amplitude = burst_amplitude
+        self.burst_duration = burst_duration
+        self.sample_modes = [DEFAULT_MODE,
+                             'EMG raw (4000 Hz), skin check (74 Hz), ACC 2g (74 Hz), GYRO 250 dps (74 Hz), +/-11mv, 10-850Hz',
+                             'EMG raw (2148 Hz), skin check (74 Hz), +/-11mv, 10-850Hz']
+
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._state = "Off"
+        self._sensors = []
+        self._selected = set()
+        self._start_trigger = False
+        self._stop_trigger = False
+        self._ytdata = False
+        self._start_wall = None
+        self._packets_emitted = 0
+        self._emitted = {}
+        self._bursts = []
+        self._longest_burst = 0.0
+        self._replay = self._load_replay(replay_csv) if replay_csv else []
+        self._replay_map = {}
+
+    # -- Connection / sensor management
+    def ValidateBase(self, key, license):
+        self._state = "Connected"
+
+    def GetPipelineState(self):
+        return self._state
+
+    def ScanSensors(self):
+        self._sensors = [SimulatedSensor(i, self.sample_mode, self.sample_modes) for i in range(self.sensor_count)]
+        self._selected = set()
+        return _Task(True)
+
+    def GetScannedSensorsFound(self):
+        return list(self._sensors)
+
+    def PairSensor(self, pairnumber=None):
+        return _Task(True)
+
+    def CheckPairStatus(self):
+        return False
+
+    def CheckPairComponentAdded(self):
+        return False
+
+    def CancelPair(self):
+        pass
+
+    def SelectAllSensors(self):
+        self._selected = set(range(len(self._sensors)))
+        return True
+
+    def SelectSensor(self, sensorNum):
+        self._selected.add(sensorNum)
+
+    def GetSensorObject(self, sensorNo):
+        return self._sensors[sensorNo]
+
+    def GetSensorNames(self):
+        return [sensor.FriendlyName for sensor in self._sensors]
+
+    def GetAllSampleModes(self):
+        return [sensor.Configuration.ModeString for sensor in self._sensors]
+
+    def GetCurrentSensorMode(self, sensorNo):
+        return self._sensors[sensorNo].Configuration.ModeString
+
+    def AvailibleSensorModes(self, sensorSelected):
+        return list(self.sample_modes)
+
+    def SetSampleMode(self, componentNum, sampleMode):
+        self._sensors[componentNum].set_mode(sampleMode)
+
+    # -- Collection management
+    def Configure(self, start_trigger=False, stop_trigger=False):
+        self._start_trigger = start_trigger
+        self._stop_trigger = stop_trigger
+        self._state = "Armed"
+
+    def IsPipelineConfigured(self):
+        return self._state == "Armed"
+
+    def Start(self, ytdata=False):
+        with self._lock:
+            self._ytdata = ytdata
+            self._packets_emitted = 0
+            self._emitted = {channel.Id: 0 for channel in self._channels()}
+            self._map_replay()
+            self._bursts = self._random_bursts()
+            self._longest_burst = self.burst_duration if self._bursts else 0.0
+            self._start_wall = time.perf_counter()
+            self._state = "Running"
+
+    def Stop(self):
+        self._state = "Armed"
+
+    def ResetPipeline(self):
+        self._state = "Connected"
+
+    def IsWaitingForStartTrigger(self):
+        return False
+
+    def IsWaitingForStopTrigger(self):
+        return False
+
+    def GetTotalPackets(self):
+        return self._packets_emitted
+
+    def CheckDataQueue(self):
+        return not self._ytdata and self._packets_ready() > 0
+
+    def CheckYTDataQueue(self):
+        return self._ytdata and self._packets_ready() > 0
+
+    def PollData(self):
+        """Dictionary<Guid, List<double>>"""
+        return PacketDict((guid, list(values)) for guid, (_, values) in self._poll().items())
+
+    def PollYTData(self):
+        """Dictionary<Guid, List<(double, double)>>"""
+        return PacketDict((guid, [YTSample(t, y) for t, y in zip(times.tolist(), values.tolist())])
+                          for guid, (times, values) in self._poll().items())
+
+    # -- Simulation helpers
+    def sim_time(self):
+        """Seconds of data that the simulated base has produced so far"""
+        if self._state != "Running" or self._start_wall is None:
+            return 0.0
+        if self.speed is None:
+            return (self._packets_emitted + 1) * self.packet_interval
+        return (time.perf_counter() - self._start_wall) * self.speed
+
+    def wall_time_of(self, sim_t):
+        """perf_counter() value at which the sample at sim_t becomes available (real time / accelerated modes)"""
+        return self._start_wall + sim_t / self.speed
+
+    def inject_burst(self, start=None, duration=0.2, amplitude=None, sensors=None):
+        """
+        Schedule a contraction on the EMG of the given sensors (all if None).
+        start defaults to the next packet boundary; returns the burst start in sample time.
+        """
+        if start is None:
+            start = (int(self.sim_time() / self.packet_interval) + 1) * self.packet_interval
+        amplitude = self.burst_amplitude if amplitude is None else amplitude
+        with self._lock:
+            bisect.insort(self._bursts, Burst(start, duration, amplitude, None if sensors is None else set(sensors)),
+                          key=_burst_start)
+            self._longest_burst = max(self._longest_burst, duration)
+        return start
+
+    def _channels(self):
+        return [channel for i, sensor in enumerate(self._sensors) if i in self._selected for channel in sensor.TrignoChannels]
+
+    def _random_bursts(self, horizon=3600.0):
+        if not self.burst_rate:
+            return []
+        count = self._rng.poisson(self.burst_rate * horizon)
+        starts = np.sort(self._rng.uniform(0, horizon, count))
+        return [Burst(float(s), self.burst_duration, self.burst_amplitude, None) for s in starts]
+
+    def _packets_ready(self):
+        if self._state != "Running":
+            return 0
+        if self.speed is None:
+            return 1
+        return int(self.sim_time() / self.packet_interval) - self._packets_emitted
+
+    def _poll(self):
+        with self._lock:
+            ready = self._packets_ready()
+            if ready <= 0:
+                return {}
+            self._packets_emitted += ready
+            end_time = self._packets_emitted * self.packet_interval
+
+            out = {}
+            for sensor_index, sensor in enumerate(self._sensors):
+                if sensor_index not in self._selected:
+                    continue
+                for channel in sensor.TrignoChannels:
+                    first = self._emitted[channel.Id]
+                    last = int(end_time * channel.SampleRate)
+                    self._emitted[channel.Id] = last
+                    index = np.arange(first, last)
+                    times = index / channel.SampleRate
+                    out[channel.Id] = (times, self._generate(sensor_index, channel, index, times))
+            return out
+
+    def _generate(self, sensor_index, channel, index, times):
+        n = index.size
+        if channel.Type == "EMG":
+            replay = self._replay_map.get(channel.Id)
+            if replay is not None:
+                return replay[index % replay.size]
+            envelope = np.full(n, self.emg_noise)
+            if n:
+                first = bisect.bisect_left(self._bursts, times[0] - self._longest_burst, key=_burst_start)
+                for burst in itertools.islice(self._bursts, first, None):
+                    if burst.start > times[-1]:
+                        break
+                    if burst.start + burst.duration < times[0]:
+                        continue
+                    if burst.sensors is not None and sensor_index not in burst.sensors:
+                        continue
+                    active = (times >= burst.start) & (times < burst.start + burst.duration)
+                    envelope[active] += burst.amplitude
+            return self._rng.standard_normal(n) * envelope
+        if channel.Type == "SkinCheck":
+            return np.full(n, 1.0e4) + self._rng.standard_normal(n) * 10.0
+        if channel.Type == "ACC":
+            gravity = 1.0 if channel.Name.endswith("Z") else 0.0
+            return gravity + 0.05 * np.sin(2 * np.pi * 0.5 * times) + self._rng.standard_normal(n) * 0.01
+        return self._rng.standard_normal(n) * 2.0
+
+    # -- CSV replay
+    @staticmethod
+    def _load_replay(path):
+        """Return the EMG channels of a recorded_data.csv style file as a list of value arrays"""
+        emg_guids = set()
+        series = {}
+        with open(path, newline="") as f:
+            for line in f:
+                fields = [x.strip() for x in line.split(",")]
+                if "channel_guid" in fields:
+                    header = fields
+                    break
+                # Metadata block: "Channel Name,Channel GUID,Channel Type"
+                if len(fields) == 3 and fields[2] == "EMG":
+                    emg_guids.add(fields[1])
+            else:
+                return []
+
+            reader = csv.DictReader(f, fieldnames=header)
+            for row in reader:
+                guid = row["channel_guid"]
+                if row.get("sensor_type") == "EMG":
+                    emg_guids.add(guid)
+                series.setdefault(guid, []).append(float(row["value"]))
+
+        return [np.asarray(values) for guid, values in series.items() if guid in emg_guids and values]
+
+    def _map_replay(self):
+        emg_channels = [channel for channel in self._channels() if channel.Type == "EMG"]
+        self._replay_map = {}
+        if self._replay:
+            for i, channel in enumerate(emg_channels):
+                self._replay_map[channel.Id] = self._replay[i % len(self._replay)]
@@ -3,21 +3,30 @@ This class creates an instance of the Trigno base. Put your key and license here
 """
 import threading
 import time
-from pythonnet import load
+import os
+import csv
 
 import sys
-sys.path.append(r'C:\Users\Elisa\Downloads\notte_ricerca_emg\Python')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Export.CsvWriter import CsvWriter
+from Export.BinaryWriter import BinaryWriter
 
-load("coreclr")
-import clr
-import csv
+# AEROPY_BACKEND=simulated replaces the DelsysAPI with a pure-Python simulator (see SimulatedAeroPy.py)
+SIMULATED = os.environ.get("AEROPY_BACKEND", "").lower() == "simulated"
+
+if SIMULATED:
+    from AeroPy.SimulatedAeroPy import AeroPy
+else:
+    from pythonnet import load
+
+    load("coreclr")
+    import clr
 
-clr.AddReference(r"resources\DelsysAPI")
-clr.AddReference("System.Collections")
+    clr.AddReference(r"resources\DelsysAPI")
+    clr.AddReference("System.Collections")
 
-from Aero import AeroPy
+    from Aero import AeroPy
 
 key = "MIIBKjCB4wYHKoZIzj0CATCB1wIBATAsBgcqhkjOPQEBAiEA/////wAAAAEAAAAAAAAAAAAAAAD///////////////8wWwQg/////wAAAAEAAAAAAAAAAAAAAAD///////////////wEIFrGNdiqOpPns+u9VXaYhrxlHQawzFOw9jvOPD4n0mBLAxUAxJ02CIbnBJNqZnjhE50mt4GffpAEIQNrF9Hy4SxCR/i85uVjpEDydwN9gS3rM6D0oTlF2JjClgIhAP////8AAAAA//////////+85vqtpxeehPO5ysL8YyVRAgEBA0IABN8jEklk8tvUS6fclnYlwgxodZhAPpZP+i3C5GbLXE+sJ3uPAb0UBTheWeCky8Lf6iRDwjpfUPbYdn2RD5ifkhs="
 license = "<License>  <Id>cef8c32e-144f-4022-bac2-129a2d5d5c56</Id>  <Type>Standard</Type>  <Quantity>10</Quantity>  <LicenseAttributes>    <Attribute name='Software'></Attribute>  </LicenseAttributes>  <ProductFeatures>    <Feature name='Sales'>True</Feature>    <Feature name='Billing'>False</Feature>  </ProductFeatures>  <Customer>    <Name>Sciences and Methods for Engineering</Name>    <Email>227687@studenti.unimore.it</Email>  </Customer>  <Expiration>Thu, 19 Feb 2026 00:00:00 GMT</Expiration>  <Signature>MEQCIFC8ftgGmmQ948LjB+MmOnMAelEeq4ePG/H2Xx8cYuR+AiAhjOdQDY233Cd4nqakBMn2c3matFjsaGLHtNWmycqa8A==</Signature></License>"
@@ -29,13 +38,14 @@ class TrignoBase():
     All references to TrigBase. call an AeroPy method (See AeroPy documentation for details)
     """
 
-    def __init__(self, collection_data_handler):
-        self.TrigBase = AeroPy()
+    def __init__(self, collection_data_handler, aero=None):
+        self.TrigBase = AeroPy() if aero is None else aero
         self.collection_data_handler = collection_data_handler
         self.channel_guids = []
         self.channelcount = 0
         self.pairnumber = 0
         self.csv_writer = CsvWriter()
+        self.binary_writer = BinaryWriter()
 
     # -- AeroPy Methods --
     def PipelineState_Callback(self):
@@ -101,6 +111,7 @@ class TrignoBase():
         # Reset output data structure before starting data stream again
         if self.TrigBase.GetPipelineState() == 'Armed': #ready for streaming
             self.csv_writer.cleardata()
+            self.binary_writer.cleardata()
             for i in range(len(self.channelobjects)):
                 self.collection_data_handler.DataHandler.allcollectiondata.append([])
             return True 
@@ -110,6 +121,7 @@ class TrignoBase():
         # Configure output data using TrigBase.Configure and pass args if you are using a start and/or stop trigger
         elif self.TrigBase.GetPipelineState() == 'Connected': #needs configuration
             self.csv_writer.clearall()
+            self.binary_writer.clearall()
             self.channelcount = 0
             self.TrigBase.Configure(self.start_trigger, self.stop_trigger)
             configured = self.TrigBase.IsPipelineConfigured()
@@ -142,6 +154,7 @@ class TrignoBase():
                             get_all_channels = True
                             if get_all_channels:
                                 self.channel_guids.append(ch_guid)
+                                self.binary_writer.appendChannel(selectedSensor, ch_object)
                                 globalChannelIdx += 1
 
                                 #CSV Export Config
@@ -165,6 +178,7 @@ class TrignoBase():
                             if not get_all_channels:
                                 if ch_type == 'EMG':
                                     self.channel_guids.append(ch_guid)
+                                    self.binary_writer.appendChannel(selectedSensor, ch_object)
                                     self.csv_writer.h2_channels.append(
                                         ch_object.Name + " (" + str(ch_object.SampleRate) + ")")
                                     if channel > 0:
@@ -205,6 +219,7 @@ class TrignoBase():
         self.TrigBase.Stop() #stop the data stream
         print("Data Collection Complete")
         self.csv_writer.data = self.collection_data_handler.DataHandler.allcollectiondata
+        self.binary_writer.data = self.collection_data_handler.DataHandler.allcollectiondata
 
     # ---------------------------------------------------------------------------------
     # ---- Helper Functions
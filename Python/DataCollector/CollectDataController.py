@@ -3,24 +3,35 @@ Controller class for the Data Collector GUI
 This is the controller for the GUI that lets you connect to a base, scan via rf for sensors, and stream data from them in real time.
 """
 
-from collections import deque
+import threading
+import time
 
 from Plotter.GenericPlot import *
+from Plotter.PlotRingBuffer import PlotRingBuffer
 from AeroPy.TrignoBase import *
 from AeroPy.DataManager import *
 
-clr.AddReference("System.Collections")
+if not SIMULATED:
+    clr.AddReference("System.Collections")
 
 app.use_app('PySide6')
 
 
 class PlottingManagement():
+    poll_interval = 0.002          # data thread sleep when the DelsysAPI queue is empty (s)
+    trigger_poll_interval = 0.01   # trigger state polling period (s)
+    plot_wait_timeout = 0.1        # plot thread wake-up period to notice a stop (s)
+    plot_buffer_capacity = 8192    # samples per plotted channel between the data and plot threads
+    plot_overflow_policy = 'drop-oldest'  # 'drop-oldest', 'decimate' or 'block' (see PlotRingBuffer)
+
     def __init__(self, collect_data_window, metrics, emgplot=None):
         self.base = TrignoBase(self)
         self.collect_data_window = collect_data_window
         self.EMGplot = emgplot
         self.metrics = metrics
         self.packetCount = 0  # Number of packets received from base
+        self.collecting = threading.Event()  # Set while collecting and plotting
+        self.paused = threading.Event()      # Complement of collecting, used for interruptible waits
         self.pauseFlag = True  # Flag to start/stop collection and plotting
         self.DataHandler = DataKernel(self.base)  # Data handler for receiving data from base
         self.base.DataHandler = self.DataHandler
@@ -30,39 +41,54 @@ class PlottingManagement():
 
         self.streamYTData = False # set to True to stream data in (T, Y) format (T = time stamp in seconds Y = sample value)
 
+    @property
+    def pauseFlag(self):
+        return not self.collecting.is_set()
+
+    @pauseFlag.setter
+    def pauseFlag(self, value):
+        # Waking the waiting threads is what replaces the old spin loops on this flag
+        if value:
+            self.collecting.clear()
+            self.paused.set()
+            emg_plot = getattr(self, 'emg_plot', None)
+            if emg_plot is not None:
+                emg_plot.close()  # releases a data thread blocked by the 'block' policy
+        else:
+            self.paused.clear()
+            self.collecting.set()
+
     def streaming(self):
         """This is the data processing thread"""
-        self.emg_queue = deque()
-        while self.pauseFlag is True:
-            continue
-        while self.pauseFlag is False:
-            self.DataHandler.processData(self.emg_plot)
-            self.updatemetrics()
+        self._stream(self.DataHandler.processData)
 
     def streamingYT(self):
         """This is the data processing thread"""
-        self.emg_queue = deque()
-        while self.pauseFlag is True:
-            continue
-        while self.pauseFlag is False:
-            self.DataHandler.processYTData(self.emg_plot)
-            self.updatemetrics()
+        self._stream(self.DataHandler.processYTData)
+
+    def _stream(self, process):
+        self.collecting.wait()
+        while not self.pauseFlag:
+            if process(self.emg_plot):
+                self.updatemetrics()
+            else:
+                # Nothing ready yet: sleep until the next poll, or until collection stops
+                self.paused.wait(self.poll_interval)
 
     def vispyPlot(self):
         """Plot Thread - Only Plotting EMG Channels"""
-        while self.pauseFlag is False:
-            if len(self.emg_plot) >= 2:
-                incData = self.emg_plot.popleft()  # Data at time T-1
+        while not self.pauseFlag:
+            # Views on the ring buffer: every EMG sample not plotted yet, minus the newest one
+            # which comes back as next_val (first sample of the next frame)
+            frame = self.emg_plot.read(timeout=self.plot_wait_timeout)
+            if frame is None:
+                continue
+            self.outData, next_val = frame
+            if self.base.emgChannelsIdx and len(self.outData[0]) > 0:
                 try:
-                    self.outData = list(np.asarray(incData, dtype='object')[tuple([self.base.emgChannelsIdx])])
+                    self.EMGplot.plot_new_data(self.outData, next_val)
                 except IndexError:
                     print("Index Error Occurred: vispyPlot()")
-                if self.base.emgChannelsIdx and len(self.outData[0]) > 0:
-                    try:
-                        self.EMGplot.plot_new_data(self.outData,
-                                                   [self.emg_plot[0][i][0] for i in self.base.emgChannelsIdx])
-                    except IndexError:
-                        print("Index Error Occurred: vispyPlot()")
 
     def updatemetrics(self):
         self.metrics.framescollected.setText(str(self.DataHandler.packetCount))
@@ -73,47 +99,52 @@ class PlottingManagement():
 
     def threadManager(self, start_trigger, stop_trigger):
         """Handles the threads for the DataCollector gui"""
-        self.emg_plot = deque()
+        # Only the EMG channels are plotted, so only those are kept for the plot thread.
+        # Without a plot nothing reads the buffer: never let it block acquisition then
+        policy = self.plot_overflow_policy if self.EMGplot else 'drop-oldest'
+        self.emg_plot = PlotRingBuffer(self.base.emgChannelsIdx, self.plot_buffer_capacity, policy)
 
         # Start standard data stream (only channel data, no time values)
         if not self.streamYTData:
-            self.t1 = threading.Thread(target=self.streaming)
+            self.t1 = threading.Thread(target=self.streaming, daemon=True)
             self.t1.start()
 
         # Start YT data stream (with time values)
         else:
-            self.t1 = threading.Thread(target=self.streamingYT)
+            self.t1 = threading.Thread(target=self.streamingYT, daemon=True)
             self.t1.start()
 
         if self.EMGplot:
-            self.t2 = threading.Thread(target=self.vispyPlot)
+            self.t2 = threading.Thread(target=self.vispyPlot, daemon=True)
             if not start_trigger:
                 self.t2.start()
 
         if start_trigger:
-            self.t3 = threading.Thread(target=self.waiting_for_start_trigger)
+            self.t3 = threading.Thread(target=self.waiting_for_start_trigger, daemon=True)
             self.t3.start()
 
         if stop_trigger:
-            self.t4 = threading.Thread(target=self.waiting_for_stop_trigger)
+            self.t4 = threading.Thread(target=self.waiting_for_stop_trigger, daemon=True)
             self.t4.start()
 
     def waiting_for_start_trigger(self):
         while self.base.TrigBase.IsWaitingForStartTrigger():
-            continue
+            time.sleep(self.trigger_poll_interval)
         self.pauseFlag = False
         if self.EMGplot:
             self.t2.start()
         print("Trigger Start - Collection Started")
 
     def waiting_for_stop_trigger(self):
-        while self.base.TrigBase.IsWaitingForStartTrigger():
-            continue
+        self.collecting.wait()
         while self.base.TrigBase.IsWaitingForStopTrigger():
-            continue
+            if self.paused.wait(self.trigger_poll_interval):
+                return  # Stopped from the GUI before the trigger
         self.pauseFlag = True
         self.metrics.pipelinestatelabel.setText(self.base.PipelineState_Callback())
         self.collect_data_window.exportcsv_button.setEnabled(True)
         self.collect_data_window.exportcsv_button.setStyleSheet("color : white")
+        self.collect_data_window.exportbinary_button.setEnabled(True)
+        self.collect_data_window.exportbinary_button.setStyleSheet("color : white")
         print("Trigger Stop - Data Collection Complete")
         self.DataHandler.processData(self.emg_plot)
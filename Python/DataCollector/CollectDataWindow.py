@@ -141,6 +141,17 @@ class CollectDataWindow(QWidget):
         self.exportcsv_button.setFixedHeight(50)
         buttonLayout.addWidget(self.exportcsv_button)
 
+        # ---- Export Binary Button
+        self.exportbinary_button = QPushButton('Export Binary', self)
+        self.exportbinary_button.setToolTip('Export collected data to project root - data.emgx (columnar, memory-mappable)')
+        self.exportbinary_button.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.exportbinary_button.objectName = 'ExportBinary'
+        self.exportbinary_button.clicked.connect(self.exportbinary_callback)
+        self.exportbinary_button.setStyleSheet('QPushButton {color: grey;}')
+        self.exportbinary_button.setEnabled(False)
+        self.exportbinary_button.setFixedHeight(50)
+        buttonLayout.addWidget(self.exportbinary_button)
+
         # ---- Drop-down menu of sensor modes
         self.SensorModeList = QComboBox(self)
         self.SensorModeList.setToolTip('Sensor Modes')
@@ -233,6 +244,8 @@ class CollectDataWindow(QWidget):
         self.getpipelinestate()
         self.exportcsv_button.setEnabled(False)
         self.exportcsv_button.setStyleSheet("color : gray")
+        self.exportbinary_button.setEnabled(False)
+        self.exportbinary_button.setStyleSheet("color : gray")
 
     def Pair_Window(self):
         """Open pair sensor window to set pair number and begin pairing process"""
@@ -333,6 +346,8 @@ class CollectDataWindow(QWidget):
         self.getpipelinestate()
         self.exportcsv_button.setEnabled(False)
         self.exportcsv_button.setStyleSheet("color : gray")
+        self.exportbinary_button.setEnabled(False)
+        self.exportbinary_button.setStyleSheet("color : gray")
 
     def set_sensor_list_box(self, sensorList):
         self.SensorListBox.clear()
@@ -356,6 +371,8 @@ class CollectDataWindow(QWidget):
         self.stop_button.setEnabled(True)
         self.exportcsv_button.setEnabled(False)
         self.exportcsv_button.setStyleSheet("color : gray")
+        self.exportbinary_button.setEnabled(False)
+        self.exportbinary_button.setStyleSheet("color : gray")
         self.getpipelinestate()
 
     def stop_callback(self):
@@ -363,6 +380,8 @@ class CollectDataWindow(QWidget):
         self.getpipelinestate()
         self.exportcsv_button.setEnabled(True)
         self.exportcsv_button.setStyleSheet("color : white")
+        self.exportbinary_button.setEnabled(True)
+        self.exportbinary_button.setStyleSheet("color : white")
 
     def exportcsv_callback(self):
         export = None
@@ -373,6 +392,15 @@ class CollectDataWindow(QWidget):
         self.getpipelinestate()
         print("CSV Export: " + str(export))
 
+    def exportbinary_callback(self):
+        export = None
+        if self.CallbackConnector.streamYTData:
+            export = self.CallbackConnector.base.binary_writer.exportYTBinary()
+        else:
+            export = self.CallbackConnector.base.binary_writer.exportBinary()
+        self.getpipelinestate()
+        print("Binary Export: " + str(export))
+
     def sensorList_callback(self):
         current_selected = self.SensorListBox.currentRow()
         if self.selectedSensor is None or self.selectedSensor != current_selected:
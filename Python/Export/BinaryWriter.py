@@ -0,0 +1,131 @@
+"""
+Columnar binary export of a data collection, next to CsvWriter.
+
+Every channel is stored as its own contiguous little-endian array (float64 values, plus a
+float64 time array for YT data), with the channel name, GUID, type and sample rate in a JSON
+header. Channels keep their own length, so multi-rate collections need no padding, and
+load() memory-maps the file instead of parsing it.
+
+Layout:
+    magic b"EMGX" (4s), version (H), reserved (H), header length (I), JSON header,
+    padding, then the arrays, each starting on a 64-byte boundary
+"""
+import json
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from AeroPy.Recording import channel_to_arrays
+
+_MAGIC = b"EMGX"
+_VERSION = 1
+_PREAMBLE = struct.Struct("<4sHHI")
+_ALIGN = 64
+
+# One channel of a loaded file; times is None for non-YT exports
+ExportedChannel = namedtuple("ExportedChannel", ["name", "guid", "type", "sensor", "sample_rate", "times", "values"])
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class BinaryWriter:
+    filename = "data.emgx"
+
+    def __init__(self):
+        self.channels = []
+        self.data = [[]]
+
+    def appendChannel(self, sensor, channel):
+        """Record the metadata of a channel, in the same order as the collected data"""
+        self.channels.append({
+            "name": str(channel.Name),
+            "guid": str(channel.Id),
+            "type": str(channel.Type),
+            "sensor": "(" + str(sensor.PairNumber) + ")" + str(sensor.FriendlyName),
+            "sample_rate": float(channel.SampleRate),
+        })
+
+    def exportBinary(self):
+        return self._export(yt=False)
+
+    def exportYTBinary(self):
+        return self._export(yt=True)
+
+    def _export(self, yt):
+        try:
+            arrays = [channel_to_arrays(chan_data, yt) for chan_data in self.data]
+
+            # Lay the arrays out after the header; the header holds their offsets, so the
+            # offsets are computed against the size of a header with placeholder offsets
+            entries = []
+            for i, (times, values) in enumerate(arrays):
+                info = dict(self.channels[i]) if i < len(self.channels) else {"name": "Channel " + str(i)}
+                info.update(length=int(values.size), times_offset=0 if yt else None, values_offset=0)
+                entries.append(info)
+            header = {"version": _VERSION, "yt": yt, "channels": entries}
+            placeholder = json.dumps(header).encode()
+            data_start = _aligned(_PREAMBLE.size + len(placeholder) + 32 * len(entries))
+            offset = data_start
+            for info, (times, values) in zip(entries, arrays):
+                if yt:
+                    info["times_offset"] = offset
+                    offset = _aligned(offset + times.nbytes)
+                info["values_offset"] = offset
+                offset = _aligned(offset + values.nbytes)
+            header = json.dumps(header).encode()
+            if _PREAMBLE.size + len(header) > data_start:
+                raise ValueError("header larger than the space reserved for it")
+
+            with open(self.filename, 'wb') as f:
+                f.write(_PREAMBLE.pack(_MAGIC, _VERSION, 0, len(header)))
+                f.write(header)
+                for info, (times, values) in zip(entries, arrays):
+                    for key, array in (("times_offset", times), ("values_offset", values)):
+                        if array is None:
+                            continue
+                        f.write(b"\0" * (info[key] - f.tell()))
+                        f.write(np.ascontiguousarray(array, dtype='<f8'))
+
+        except PermissionError:
+            print("ERROR: Binary Export failed because the file is being used by another program")
+            return False
+
+        except Exception as e:
+            print("Binary Export Failed: " + str(e))
+            return False
+
+        return True
+
+    def clearall(self):
+        self.channels = []
+        self.data = [[]]
+
+    def cleardata(self):
+        self.data = [[]]
+
+
+def load(filename=BinaryWriter.filename):
+    """
+    Memory-map a file written by BinaryWriter and return its list of ExportedChannel.
+    The arrays are read-only views on the file; nothing is read until they are used.
+    """
+    with open(filename, 'rb') as f:
+        magic, version, _, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(filename + " is not a binary export")
+        header = json.loads(f.read(header_length))
+
+    buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+    channels = []
+    for info in header["channels"]:
+        n = info["length"]
+        values = buffer[info["values_offset"]:info["values_offset"] + 8 * n].view('<f8')
+        times = None
+        if info.get("times_offset") is not None:
+            times = buffer[info["times_offset"]:info["times_offset"] + 8 * n].view('<f8')
+        channels.append(ExportedChannel(info["name"], info.get("guid"), info.get("type"), info.get("sensor"),
+                                        info.get("sample_rate"), times, values))
+    return channels
@@ -1,8 +1,69 @@
 import csv
+import gzip
+import io
+
+import numpy as np
+
+from AeroPy.Recording import channel_to_arrays
+
+MAX_FIXED_DIGITS = 15  # mantissas stay exact float64 integers, so the digit pass is exact
+FIXED_BLOCK_CELLS = 1 << 16  # cells formatted per NumPy pass: small enough to stay in the CPU cache
+
+
+def _fixed_cells(block, digits):
+    """
+    Format a (rows, k) float64 block as '%+.{digits - 1}e' cells, all of the same width, with
+    NumPy operations on the whole block. Returns a (rows, k, width) uint8 ASCII array, or None if
+    the block holds values this formatter does not handle (nan, inf, subnormal-range values) or
+    digits is above MAX_FIXED_DIGITS: those go through printf one cell at a time. The mantissa
+    is scaled in float64, so the last digit can be one off printf's correctly rounded digit.
+    """
+    if not 0 < digits <= MAX_FIXED_DIGITS:
+        return None
+    a = np.abs(block)
+    nonzero = a > 0
+    if not np.isfinite(a).all() or (nonzero & (a < 1e-290)).any():
+        return None
+
+    #---- Mantissa as a `digits`-digit integer (held in float64) and decimal exponent
+    exp = np.floor(np.log10(np.where(nonzero, a, 1.0)))
+    mant = np.rint(a * 10.0 ** (digits - 1 - exp))
+    for fix, step in (((mant >= 10.0 ** digits), 1), (nonzero & (mant < 10.0 ** (digits - 1)), -1)):
+        # log10 off by one at a power of ten, or the mantissa rounded up to the next decade
+        exp[fix] += step
+        mant[fix] = np.rint(a[fix] * 10.0 ** (digits - 1 - exp[fix]))
+    exp_digits = 3 if (np.abs(exp) >= 100).any() else 2
+
+    #---- One plane per character: sign, d[.ddd], e, exponent sign, exponent
+    point = 1 if digits > 1 else 0
+    width = 2 + point + (digits - 1) + 2 + exp_digits
+    planes = np.empty((width,) + block.shape, dtype=np.uint8)
+    planes[0] = np.where(np.signbit(block), ord('-'), ord('+'))
+    if point:
+        planes[2] = ord('.')
+    exp_pos = 2 + point + (digits - 1)
+    planes[exp_pos] = ord('e')
+    planes[exp_pos + 1] = np.where(exp < 0, ord('-'), ord('+'))
+
+    # Digits from the last one: x - 10 * floor(x * 0.1) is exact for integers below 2**53
+    mantissa_pos = [1] + list(range(2 + point, exp_pos))
+    quotient = np.empty_like(mant)
+    for value, positions in ((mant, mantissa_pos), (np.abs(exp), range(exp_pos + 2, width))):
+        for pos in reversed(positions):
+            np.multiply(value, 0.1, out=quotient)
+            np.floor(quotient, out=quotient)
+            value -= 10.0 * quotient
+            value += ord('0')
+            planes[pos] = value
+            value, quotient = quotient, value
+    return np.moveaxis(planes, 0, -1)
 
 
 class CsvWriter:
     filename = "data.csv"
+    compression = None  # None, 'gzip' or 'zstd' (needs the zstandard package)
+    block_rows = 65536  # rows formatted and written per write() call
+    precision = 10      # significant digits per cell, formatted a whole block at a time; None = repr (exact round trip)
 
     def __init__(self):
         self.h1_sensors = []
@@ -27,85 +88,98 @@ class CsvWriter:
         self.h2_channels.append(channel.Name + " (" + str(round(channel.SampleRate, 3)) + ")")
 
     def exportCSV(self):
-        try:
-            with open(self.filename, 'w', newline='') as csvfile:
-                csvwriter = csv.writer(csvfile, delimiter=',')
-                maxlen = 0
-
-                csvwriter.writerow(self.h1_sensors)
-                csvwriter.writerow(self.h2_channels)
-
-                for chan_data in self.data:
-                    length = len(chan_data)
-                    if length > maxlen:
-                        maxlen = length
-
-                for i in range(maxlen):
-                    row = []
-                    for chan_data in self.data:
-                        try:
-                            if chan_data[i] == "":
-                                row.append("")
-                            else:
-                                row.append(chan_data[i])
-                        except IndexError:
-                            row.append("")
-
-                    csvwriter.writerow(row)
-
-        except PermissionError:
-            print("ERROR: CSV Export failed because the file is being used by another program")
-            return False
-
-        except Exception as e:
-            print("CSV Export Failed: " + e)
-            return False
-
-        return True
+        return self._export(yt=False)
 
     def exportYTCSV(self):
+        return self._export(yt=True)
+
+    def _export(self, yt):
+        """
+        Convert every channel to NumPy once, then write the rows in large blocks.
+        Channels shorter than the longest one are padded with empty cells.
+        """
         try:
-            with open(self.filename, 'w', newline='') as csvfile:
+            columns = []
+            for chan_data in self.data:
+                times, values = channel_to_arrays(chan_data, yt)
+                if yt:
+                    columns.append(times)
+                columns.append(values)
+
+            with self._open() as csvfile:
                 csvwriter = csv.writer(csvfile, delimiter=',')
-                maxlen = 0
-
                 csvwriter.writerow(self.h1_sensors)
                 csvwriter.writerow(self.h2_channels)
+                self._write_columns(csvfile, columns)
 
-                for chan_data in self.data:
-                    length = len(chan_data)
-                    if length > maxlen:
-                        maxlen = length
-
-                for i in range(maxlen):
-                    row = []
-                    if i == 100:
-                        print()
-                    for chan_data in self.data:
-                        try:
-                            timeval = chan_data[i].Item1
-                            cdata = chan_data[i].Item2
-                            if chan_data[i] == "":
-                                row.append("")
-                                row.append("")
-                            else:
-                                row.append(timeval)
-                                row.append(cdata)
-                        except IndexError:
-                            row.append("")
-                            row.append("")
-
-                    csvwriter.writerow(row)
         except PermissionError:
             print("ERROR: CSV Export failed because the file is being used by another program")
             return False
 
-        except Exception:
-            print("CSV Export Failed")
+        except Exception as e:
+            print("CSV Export Failed: " + str(e))
             return False
 
         return True
 
+    def _open(self):
+        """Open the output file for text writing, compressed when self.compression is set"""
+        if self.compression is None:
+            return open(self.filename, 'w', newline='')
+        if self.compression == 'gzip':
+            name = self.filename if self.filename.endswith('.gz') else self.filename + '.gz'
+            return gzip.open(name, 'wt', newline='', compresslevel=6)
+        if self.compression == 'zstd':
+            import zstandard  # optional dependency, only needed for zstd output
+
+            name = self.filename if self.filename.endswith('.zst') else self.filename + '.zst'
+            stream = zstandard.ZstdCompressor().stream_writer(open(name, 'wb'))
+            return io.TextIOWrapper(stream, newline='')
+        raise ValueError("unknown compression: " + str(self.compression))
+
+    def _write_columns(self, csvfile, columns):
+        lengths = [column.size for column in columns]
+        maxlen = max(lengths, default=0)
+        cellformat = "%r" if self.precision is None else "%+." + str(self.precision - 1) + "e"
+
+        # Between two consecutive channel lengths the set of non-empty cells is the same for
+        # every row, so each of those segments is written with a single row format
+        bounds = sorted(set(lengths) | {0, maxlen})
+        for seg_start, seg_end in zip(bounds[:-1], bounds[1:]):
+            present = [i for i, length in enumerate(lengths) if length >= seg_end]
+            rowformat = ",".join(cellformat if length >= seg_end else "" for length in lengths) + "\r\n"
+
+            block_rows = self.block_rows
+            if self.precision is not None:
+                block_rows = min(block_rows, max(1, FIXED_BLOCK_CELLS // len(present)))
+            for start in range(seg_start, seg_end, block_rows):
+                stop = min(start + block_rows, seg_end)
+                block = np.column_stack([columns[i][start:stop] for i in present])
+                cells = None if self.precision is None else _fixed_cells(block, self.precision)
+                if cells is None:
+                    csvfile.write("".join([rowformat % tuple(row) for row in block.tolist()]))
+                else:
+                    csvfile.write(self._fixed_rows(lengths, seg_end, cells))
+
+    @staticmethod
+    def _fixed_rows(lengths, seg_end, cells):
+        """Lay the fixed-width cells of a block out as CSV rows, one column slice at a time"""
+        rows, _, width = cells.shape
+        starts, length = [], 0
+        for i, channel_length in enumerate(lengths):
+            if i:
+                length += 1
+            if channel_length >= seg_end:
+                starts.append(length)
+                length += width
+
+        out = np.empty((rows, length + 2), dtype=np.uint8)
+        out[:] = ord(',')
+        out[:, -2:] = (ord('\r'), ord('\n'))
+        for j, start in enumerate(starts):
+            out[:, start:start + width] = cells[:, j]
+        return out.tobytes().decode('ascii')
+
     def clearall(self):
         self.h1_sensors = []
         self.h2_channels = []
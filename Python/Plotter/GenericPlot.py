@@ -16,15 +16,84 @@ plotCanvas = PlottingCanvas()
 plotCanvas.initiateCanvas(None,None,1, 1,numSamples)
 """
 
+import threading
+import time
+from functools import lru_cache
+
 from vispy import gloo
 from vispy import app
 import numpy as np
 import math
-import random
+
+
+@lru_cache(maxsize=64)
+def _resample_grid(src_len, dst_len):
+    """
+    Linear interpolation grid taking a channel of src_len samples (followed by next_val at
+    index src_len) to dst_len samples: returns (i0, i1, w) with out = fp[i0] * (1 - w) + fp[i1] * w.
+
+    Upsampling places sample j at round(j * dst_len / src_len) and interpolates linearly in
+    between, the last sample being interpolated towards next_val at dst_len - 1. Downsampling
+    interpolates the source at dst_len evenly spaced positions.
+    """
+    x = np.arange(dst_len, dtype=np.float64)
+    if src_len < dst_len:
+        xp = np.round(np.arange(src_len) * (dst_len / src_len))
+        src = np.arange(src_len)
+        if xp[-1] < dst_len - 1:
+            xp = np.append(xp, dst_len - 1)
+            src = np.append(src, src_len)  # next_val
+        k1 = np.minimum(np.searchsorted(xp, x, side='right'), xp.size - 1)
+        k0 = np.maximum(k1 - 1, 0)
+        k0 = np.where(xp[k1] <= x, k1, k0)
+        span = xp[k1] - xp[k0]
+        w = np.divide(x - xp[k0], span, out=np.zeros(dst_len), where=span > 0)
+        i0, i1 = src[k0], src[k1]
+    else:
+        pos = x * ((src_len - 1) / (dst_len - 1)) if dst_len > 1 else np.zeros(dst_len)
+        i0 = np.floor(pos).astype(np.intp)
+        i1 = np.minimum(i0 + 1, src_len - 1)
+        w = pos - i0
+    for a in (i0, i1, w):
+        a.setflags(write=False)
+    return i0, i1, w
+
+
+def resample_frame(data_frame, next_val):
+    """
+    Bring every channel of a (possibly jagged) frame to the length of the longest one.
+    Channels of the same length are resampled together with one gather per grid.
+    Returns a (channels, length) float32 array.
+    """
+    lengths = np.array([len(x) for x in data_frame])
+    dst_len = int(lengths.max()) if lengths.size else 0
+    out = np.empty((len(data_frame), dst_len), dtype=np.float32)
+    for src_len in np.unique(lengths):
+        rows = np.flatnonzero(lengths == src_len)
+        if src_len == dst_len:
+            out[rows] = [data_frame[i] for i in rows]
+            continue
+        fp = np.empty((rows.size, src_len + 1), dtype=np.float64)
+        if src_len:
+            fp[:, :src_len] = [data_frame[i] for i in rows]
+        fp[:, src_len] = [next_val[i] for i in rows]
+        if src_len == 0:
+            out[rows] = fp[:, :1]  # nothing but next_val
+            continue
+        i0, i1, w = _resample_grid(int(src_len), dst_len)
+        out[rows] = fp[:, i0] * (1.0 - w) + fp[:, i1] * w
+    return out
 
 
 class GenericPlot(app.Canvas):
-    def __init__(self, plot_mode: str = 'windowed'):
+    stats_interval = 1.0  # seconds between two reports to stats_hook
+
+    def __init__(self, plot_mode: str = 'windowed', target_fps=60):
+        """
+        target_fps : redraws per second at most; new data is only marked dirty and a timer uploads
+                     everything pending in one go. None redraws at the display refresh rate instead
+                     (the upload happens when Qt paints, which it does at most once per vsync).
+        """
         app.use_app('PySide6')
         app.Canvas.__init__(self, title='Use your wheel to zoom!',
                             keys='interactive', app='PySide6')
@@ -36,6 +105,24 @@ class GenericPlot(app.Canvas):
         self.y = None
         self.plot_mode = plot_mode
         self.last_plotted_column = -1
+        self.head = 0
+        self.bucket = 1
+        self._stale = False
+        self._pending = False
+        self._dirty = None  # Vertices of each signal to upload on the next flush
+        self._lock = threading.Lock()
+
+        #---- Instrumentation: stats_hook(stats) is called every stats_interval with the achieved
+        #---- frame rate and upload rate, which are also kept in self.stats
+        self.stats_hook = None
+        self.stats = {'fps': 0., 'uploads_per_s': 0., 'upload_bytes_per_s': 0.}
+        self._frames = self._uploads = self._upload_bytes = 0
+        self._stats_start = time.perf_counter()
+
+        self.target_fps = target_fps
+        self._timer = None
+        if target_fps:
+            self._timer = app.Timer(1. / target_fps, connect=self._on_timer, start=True)
 
     def initiateCanvas(self, color, index, nrows=1, ncols=1, plot_window_sample_count=10000):
         #---- Define subplot dimensions and plot granularity
@@ -49,20 +136,29 @@ class GenericPlot(app.Canvas):
         #---- Number of samples per signal
         self.n = int(self.plot_window_sample_count)
 
+        #---- Scrolling mode keeps the samples in a ring buffer on the GPU: only the new columns are
+        #---- uploaded and the write head (u_head) tells the shader where the oldest sample is.
+        self.ring = self.plot_mode.lower() == 'scrolling'
+
         #---- Generate the signals as a (m, n) array
         self._reset_data_plot_buffer()
 
-        #---- Color of each vertex (TODO: make it more efficient by using a GLSL-based color map and the index).
+        #---- Color of each signal (per-vertex arrays are accepted, their first vertex gives the color)
         if color is None:
-            color = np.repeat(np.random.uniform(size=(self.m, 3), low=.5, high=.9), self.n, axis=0).astype(np.float32)
+            color = np.random.uniform(size=(self.m, 3), low=.5, high=.9)
+        self.colors = np.asarray(color, dtype=np.float32).reshape(self.m, -1, 3)[:, 0]
 
+        #---- Subplot (col, row) of each signal
         if index is None:
-            index = np.c_[np.repeat(np.repeat(np.arange(self.ncols), self.nrows), self.n),
-                          np.repeat(np.tile(np.arange(self.nrows), self.ncols), self.n),
-                          np.tile(np.arange(self.n), self.m)].astype(np.float32)
+            self.cells = np.c_[np.repeat(np.arange(self.ncols), self.nrows),
+                               np.tile(np.arange(self.nrows), self.ncols)].astype(np.float32)
+        else:
+            self.cells = np.asarray(index, dtype=np.float32).reshape(self.m, -1, 3)[:, 0, :2]
 
-        # Signal 2D index of each vertex (row and col) and x-index (sample index
-        # within each signal).
+        # The vertices themselves are built by _build_lod(): each signal is drawn as min/max pairs
+        # of buckets of samples, one bucket per pixel column, so the vertex count follows the canvas
+        # width and not plot_window_sample_count. a_index holds the subplot (col, row) and the
+        # sample index of each vertex within its signal.
 
         #---- Define GLSL shaders for the VisPy plot
         VERT_SHADER = """
@@ -78,6 +174,9 @@ class GenericPlot(app.Canvas):
         uniform vec2 u_size;
         // Number of samples per signal.
         uniform float u_n;
+        // Ring buffer write head: slot of the oldest sample (always 0 in windowed mode).
+        uniform float u_head;
+        varying float v_wrapped;
         // Color.
         attribute vec3 a_color;
         varying vec4 v_color;
@@ -87,8 +186,12 @@ class GenericPlot(app.Canvas):
         void main() {
             float nrows = u_size.x;
             float ncols = u_size.y;
+            // Slots before the head hold the newest samples and are drawn after the others.
+            float wrapped = a_index.z < u_head ? 1. : 0.;
+            float t = a_index.z - u_head + wrapped * u_n;
+            v_wrapped = wrapped;
             // Compute the x coordinate from the time index.
-            float x = -1 + 2*a_index.z / (u_n-1);
+            float x = -1 + 2*t / (u_n-1);
             vec2 position = vec2(x - (1 - 1 / u_scale.x), a_position);
             // Find the affine transformation for the subplots.
             vec2 a = vec2(1./ncols, 1./nrows)*1;
@@ -110,10 +213,12 @@ class GenericPlot(app.Canvas):
         varying vec3 v_index;
         varying vec2 v_position;
         varying vec4 v_ab;
+        varying float v_wrapped;
         void main() {
             gl_FragColor = v_color;
-            // Discard the fragments between the signals (emulate glMultiDrawArrays).
-            if ((fract(v_index.x) > 0.) || (fract(v_index.y) > 0.))
+            // Discard the fragments between the signals (emulate glMultiDrawArrays)
+            // and the segment joining the newest sample to the oldest one at the ring head.
+            if ((fract(v_index.x) > 0.) || (fract(v_index.y) > 0.) || (fract(v_wrapped) > 0.))
                 discard;
             // Clipping test.
             vec2 test = abs((v_position.xy-v_ab.zw)/v_ab.xy);
@@ -124,14 +229,13 @@ class GenericPlot(app.Canvas):
 
         #---- Configure the rendering
         self.program = gloo.Program(VERT_SHADER, FRAG_SHADER)
-        self.program['a_position'] = self.y.reshape(-1, 1)
-        self.program['a_color'] = color
-        self.program['a_index'] = index
         self.program['u_scale'] = (1., 1.)
         self.program['u_size'] = (nrows, ncols)
         self.program['u_n'] = self.n
+        self.program['u_head'] = 0.
 
         self.pause = False
+        self._build_lod()
         self.is_initialized = True
 
         # self.show()
@@ -141,6 +245,7 @@ class GenericPlot(app.Canvas):
     def on_resize(self, event):
         if self.plot_interact_flag:
             gloo.set_viewport(0, 0, event.physical_size[0], event.physical_size[1])
+            self._check_lod()
             self.update()
 
     def on_mouse_wheel(self, event):
@@ -150,6 +255,7 @@ class GenericPlot(app.Canvas):
             scale_x_new, scale_y_new = (scale_x * math.exp(0.0 * dx),
                                         scale_y * math.exp(2.5 * dx))
             self.program['u_scale'] = (max(1, scale_x_new), max(1, scale_y_new))
+            self._check_lod()
             self.update()
 
     def on_pause(self):
@@ -163,42 +269,8 @@ class GenericPlot(app.Canvas):
     #---- Plotting Functions
     def plot_new_data(self, data_frame, next_val):
         #---- Process possibly jagged array into rectangular array
-        emgLen = max(len(x) for x in data_frame)                 # All processing is normalized to the fastest EMG rate
-        for i in range(len(data_frame)):
-            #--- Spread out / interpolate data 
-            if len(data_frame[i]) < emgLen:
-                #-- Generate Index Vector 
-                indexVector = []
-                for j in range(len(data_frame[i])):
-                    indexVector.append(emgLen/len(data_frame[i]) * j)
-                #-- Quantize Index Vector 
-                quantIndexVector = []
-                for j in range(len(indexVector)):
-                    quantIndexVector.append(round(indexVector[j]))
-                #-- Copy data values to quantized indices
-                quantData = [None] * emgLen
-                dataInd = 0
-                for j in quantIndexVector:
-                    quantData[j] = data_frame[i][dataInd]
-                    dataInd += 1
-                #-- Piecewise linearly interpolate any empty points
-                for j in range(len(quantIndexVector)):
-                    if j == len(quantIndexVector)-1:
-                        #- Interpolate the last recorded point of time T to the first point of time T+1
-                        arrToInsert = np.linspace(quantData[quantIndexVector[j]], next_val[i], len(quantData)-quantIndexVector[j], endpoint=True)
-                        quantData[quantIndexVector[j]:] = arrToInsert
-                    else:
-                        #- Interpolate between points of time T
-                        arrToInsert = np.linspace(quantData[quantIndexVector[j]], quantData[quantIndexVector[j+1]], quantIndexVector[j+1]-quantIndexVector[j], endpoint=False)
-                        quantData[quantIndexVector[j]:quantIndexVector[j+1]] = arrToInsert
-                #-- Overwrite data_frame[i]
-                data_frame[i] = quantData
-            #--- Shrink data (shouldn't happen, but kept just in case)
-            elif len(data_frame[i]) > emgLen:
-                #-- Randomly delete data until length matches
-                while len(data_frame[i]) != emgLen:
-                    randIndex = random.randint(1, len(data_frame[i])-2)
-                    data_frame[i] = np.delete(data_frame[i], randIndex)
+        # All processing is normalized to the fastest EMG rate (see resample_frame)
+        data_frame = resample_frame(data_frame, next_val)
 
         #---- Plot according to mode defined in Plotter() in CollectDataWindow.py
         if self.plot_mode.lower() == 'scrolling':
@@ -209,14 +281,25 @@ class GenericPlot(app.Canvas):
             raise Exception('Plot mode not defined')
 
     def plot_scrolling_data(self, data_frame):
-        new = np.asarray(data_frame, dtype='object')
-        sp = np.shape(new)
-        self.y[:, :-sp[1]] = self.y[:, sp[1]:]
-        self.y[:, -sp[1]:] = new
-        self._update_data()
+        new = np.asarray(data_frame, dtype=np.float32).reshape(self.m, -1)
+        if new.shape[1] > self.n:
+            new = new[:, -self.n:]
+        k = new.shape[1]
+        if k == 0:
+            return
+
+        #---- Write the new columns at the head, wrapping around the end of the ring
+        first = min(k, self.n - self.head)
+        runs = [(self.head, self.head + first)]
+        self.y[:, self.head:self.head + first] = new[:, :first]
+        if first < k:
+            runs.append((0, k - first))
+            self.y[:, :k - first] = new[:, first:]
+        self.head = (self.head + k) % self.n
+        self._update_data(runs)
 
     def plot_windowed_data(self, data_frame):
-        new_data = np.asarray(data_frame, dtype='object')
+        new_data = np.asarray(data_frame, dtype=np.float32)
 
         try: 
             new_data_count = np.size(new_data, 1)
@@ -233,7 +316,7 @@ class GenericPlot(app.Canvas):
             plot_data_indexes = range(start_index, end_index)
             self.y[:, plot_data_indexes] = new_data
             self.last_plotted_column = plot_data_indexes[-1]
-            self._update_data()
+            self._update_data([(start_index, end_index)])
         else:
             #---- Visualize in the remaining plot space and cache leftover data
             plot_data_indexes = range(start_index, self.plot_window_sample_count)
@@ -243,7 +326,7 @@ class GenericPlot(app.Canvas):
                 self.y[:, plot_data_indexes] = new_data[:, from_data_index]
             except:
                 self.y[:, plot_data_indexes] = new_data[from_data_index]
-            self._update_data()
+            self._update_data([(start_index, self.plot_window_sample_count)])
 
             #---- Wrap the graph to the next window
             self._reset_data_plot_buffer()
@@ -258,27 +341,153 @@ class GenericPlot(app.Canvas):
                 except:
                     self.y[:, plot_data_indexes] = new_data[from_data_index]
                 self.last_plotted_column = plot_data_indexes[-1]
-                self._update_data()
+                self._update_data([(0, remaining_data_count)])
 
     #-----------------------------------------------------------------------
     #---- Helper Functions
     def _reset_data_plot_buffer(self):
         self.y = np.nan * np.zeros((self.m, self.n)).astype(np.float32)
         self.last_plotted_column = -1
+        self.head = 0
+        self._stale = True  # Every bucket changed: recompute them all on the next update
 
-    def _update_data(self):
-        if not self.pause:
-            self.program['a_position'].set_data(self.y.ravel().astype(np.float32))
+    def _lod_bucket(self):
+        """Samples per pixel column of a subplot, for the current canvas width and horizontal zoom"""
+        scale_x = float(self.program['u_scale'][0])
+        columns = max(1., self.physical_size[0] / self.ncols * scale_x)
+        return max(1, int(self.n // columns))
+
+    def _check_lod(self):
+        if self.is_initialized and self._lod_bucket() != self.bucket:
+            self._build_lod()
+
+    def _build_lod(self):
+        """
+        Rebuild the vertex buffers for the current bucket size.
+
+        Bucket j covers samples [j * bucket, (j + 1) * bucket) of a signal and is drawn as two
+        vertices, its min and max in the order they occurred, so spikes shorter than a pixel stay
+        visible. With one sample per bucket the samples are drawn as they are. In scrolling mode
+        a copy of bucket 0 is added at sample index n, which joins the end of the ring to its start.
+        """
+        with self._lock:
+            self.bucket = self._lod_bucket()
+            self.per_bucket = 1 if self.bucket == 1 else 2
+            self.buckets = -(-self.n // self.bucket)
+            starts = np.arange(self.buckets) * self.bucket
+            if self.ring:
+                starts = np.append(starts, self.n)
+            x = starts.astype(np.float32)
+            if self.per_bucket == 2:
+                lengths = np.minimum(self.bucket, self.n - starts % self.n)
+                x = np.c_[x, x + lengths / 2].ravel()
+            self.vertices = x.size  # per signal
+
+            self.lod = np.full((self.m, self.vertices), np.nan, dtype=np.float32)
+            self.program['a_position'] = self.lod.reshape(-1, 1)
+            self.program['a_color'] = np.repeat(self.colors, self.vertices, axis=0)
+            self.program['a_index'] = np.c_[np.repeat(self.cells, self.vertices, axis=0),
+                                            np.tile(x, self.m)].astype(np.float32)
+            self._dirty = np.zeros(self.vertices, dtype=bool)
+            self._stale = True
+            self._request_flush()
+
+    def _reduce(self, j0, j1):
+        """Vertex values of buckets j0 to j1 of every signal"""
+        b = self.bucket
+        seg = self.y[:, j0 * b:min(j1 * b, self.n)]
+        if b == 1:
+            return seg
+        pad = (j1 - j0) * b - seg.shape[1]
+        if pad:
+            seg = np.concatenate((seg, np.full((self.m, pad), np.nan, dtype=np.float32)), axis=1)
+        seg = seg.reshape(self.m, j1 - j0, b)
+        missing = np.isnan(seg)
+        lo = np.where(missing, np.inf, seg).argmin(axis=2)
+        hi = np.where(missing, -np.inf, seg).argmax(axis=2)
+        order = np.stack((np.minimum(lo, hi), np.maximum(lo, hi)), axis=2)
+        return np.take_along_axis(seg, order, axis=2).reshape(self.m, -1)
+
+    def _update_data(self, runs=None):
+        """Recompute the buckets holding the (start, stop) sample ranges in runs (None: all) and schedule their upload"""
+        with self._lock:
+            if self.pause:
+                self._stale = True  # Catch up once the plot resumes
+                return
+            if runs is None:
+                self._stale = True
+            if not self._stale:
+                per = self.per_bucket
+                for start, stop in runs:
+                    j0, j1 = start // self.bucket, -(-stop // self.bucket)
+                    self.lod[:, j0 * per:j1 * per] = self._reduce(j0, j1)
+                    self._dirty[j0 * per:j1 * per] = True
+                    if self.ring and j0 == 0:
+                        self.lod[:, -per:] = self.lod[:, :per]
+                        self._dirty[-per:] = True
+            self._request_flush()
+
+    def _request_flush(self):
+        self._pending = True
+        if not self.target_fps:
+            self.update()  # Qt merges the requests into one paint, which flushes
+
+    def _flush(self):
+        """Upload everything changed since the last flush in one go; return False if nothing was pending"""
+        with self._lock:
+            if not self._pending:
+                return False
+            self._pending = False
+            buffer = self.program['a_position']
+            if self._stale:
+                self._stale = False
+                self.lod[:, :self.buckets * self.per_bucket] = self._reduce(0, self.buckets)
+                if self.ring:
+                    self.lod[:, -self.per_bucket:] = self.lod[:, :self.per_bucket]
+                buffer.set_data(self.lod.reshape(-1, 1))
+                self._uploads += 1
+                self._upload_bytes += self.lod.nbytes
+            else:
+                #-- Contiguous runs of dirty vertices, the same for every signal
+                edges = np.flatnonzero(np.diff(np.r_[False, self._dirty, False]))
+                for start, stop in zip(edges[::2], edges[1::2]):
+                    for i in range(self.m):
+                        buffer.set_subdata(self.lod[i, start:stop].reshape(-1, 1), offset=i * self.vertices + start, copy=True)
+                    self._uploads += self.m
+                    self._upload_bytes += self.lod[:, start:stop].nbytes
+            self._dirty[:] = False
+            self.program['u_head'] = float(self.head)
+            return True
+
+    def _on_timer(self, event):
+        if self.is_initialized and self._flush():
             self.update()
 
+    def _count_frame(self):
+        self._frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._stats_start
+        if elapsed >= self.stats_interval:
+            self.stats = {'fps': self._frames / elapsed,
+                          'uploads_per_s': self._uploads / elapsed,
+                          'upload_bytes_per_s': self._upload_bytes / elapsed}
+            self._frames = self._uploads = self._upload_bytes = 0
+            self._stats_start = now
+            if self.stats_hook is not None:
+                self.stats_hook(self.stats)
+
     def on_draw(self, event):
         if self.is_initialized:
+            if not self.target_fps:
+                self._flush()
             gloo.clear()
             self.program.draw('line_strip')
+            self._count_frame()
 
     def set_scaling(self, x_int, y_int):
         if self.is_initialized:
             self.program['u_scale'] = (float(x_int), float(y_int))
+            self._check_lod()
 
     def set_interactive(self, flag):
         self.plot_interact_flag = flag
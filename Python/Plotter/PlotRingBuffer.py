@@ -0,0 +1,158 @@
+"""
+Fixed-capacity ring buffer between the data thread (DataKernel.processData) and the plot thread.
+
+Every plotted channel gets a preallocated float32 ring of `capacity` samples. Each sample is
+stored twice, at slot and slot + capacity, so the newest n samples of a channel (n <= capacity)
+are always one contiguous slice: read() and latest() return views into the ring, never copies.
+Views stay valid until the writer wraps around the ring, i.e. for `capacity` more samples.
+
+When the plot thread falls behind, the overflow policy decides what happens:
+    'drop-oldest' : unread samples are overwritten (counted in dropped_samples / dropped_frames)
+    'decimate'    : once a channel is more than half full, incoming packets are decimated by
+                    `decimation` so the plot keeps up; if the ring still overflows, drop-oldest
+    'block'       : append() waits until the plot thread has made room (until close())
+"""
+import threading
+
+import numpy as np
+
+POLICIES = ('drop-oldest', 'decimate', 'block')
+
+
+class PlotRingBuffer:
+    def __init__(self, channels, capacity=8192, policy='drop-oldest', decimation=2):
+        """
+        channels : indices of the packet channels to keep (e.g. TrignoBase.emgChannelsIdx)
+        capacity : samples held per channel
+        """
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of " + ", ".join(POLICIES))
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self.policy = policy
+        self.decimation = int(decimation)
+
+        m = len(self.channels)
+        self._data = np.zeros((m, 2 * self.capacity), dtype=np.float32)
+        self._written = np.zeros(m, dtype=np.int64)  # samples written per channel since creation
+        self._read = np.zeros(m, dtype=np.int64)     # samples handed to the reader per channel
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Counters
+        self.frames_written = 0
+        self.frames_read = 0
+        self.dropped_frames = 0      # packets that overwrote unread samples (or were discarded)
+        self.dropped_samples = 0
+        self.decimated_frames = 0
+        self.max_lag = 0
+
+    # -- Writer side (data thread) --
+    def append(self, packet):
+        """Store one packet (a list with one array per channel, as built by DataKernel)"""
+        with self._cond:
+            if self._closed:
+                return
+            values = [np.asarray(packet[i]) for i in self.channels]
+
+            if self.policy == 'block':
+                self._cond.wait_for(lambda: self._closed or self._has_room(values))
+                if self._closed:
+                    return
+            elif self.policy == 'decimate' and self._over_half(values):
+                values = [v[::self.decimation] for v in values]
+                self.decimated_frames += 1
+
+            dropped = 0
+            for c, v in enumerate(values):
+                dropped += self._write(c, v)
+            if dropped:
+                self.dropped_frames += 1
+                self.dropped_samples += dropped
+
+            self.frames_written += 1
+            self.max_lag = max(self.max_lag, self.lag)
+            self._cond.notify_all()
+
+    def _has_room(self, values):
+        # A packet larger than the ring fits once the reader is left with its held-back sample
+        return all(self._written[c] - self._read[c] + min(v.size, self.capacity - 1) <= self.capacity
+                   for c, v in enumerate(values))
+
+    def _over_half(self, values):
+        return any(2 * (self._written[c] - self._read[c] + v.size) > self.capacity for c, v in enumerate(values))
+
+    def _write(self, c, v):
+        """Write samples of channel c (both copies); return the number of unread samples overwritten"""
+        cap = self.capacity
+        n = v.size
+        if n > cap:
+            v = v[-cap:]
+        w = int(self._written[c])
+        k = v.size
+        p = (w + n - k) % cap
+        first = min(k, cap - p)
+        row = self._data[c]
+        row[p:p + first] = v[:first]
+        row[p + cap:p + cap + first] = v[:first]
+        rest = k - first
+        if rest:
+            row[:rest] = v[first:]
+            row[cap:cap + rest] = v[first:]
+
+        self._written[c] = w + n
+        # Samples older than the ring are gone: move the reader past them
+        overwritten = int(self._written[c] - cap - self._read[c])
+        if overwritten > 0:
+            self._read[c] += overwritten
+            return overwritten
+        return 0
+
+    def close(self):
+        """Stop accepting packets and release a writer blocked by the 'block' policy"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # -- Reader side (plot thread) --
+    @property
+    def lag(self):
+        """Unread samples of the most delayed channel"""
+        if self._written.size == 0:
+            return 0
+        return int((self._written - self._read).max())
+
+    def _view(self, c, end, n):
+        """Contiguous view of the n samples of channel c that end at sample number end"""
+        e = end % self.capacity + self.capacity
+        return self._data[c, e - n:e]
+
+    def read(self, timeout=None):
+        """
+        Wait for new samples and return (frame, next_values), or None on timeout.
+
+        frame holds, for every channel, a view of the samples not read yet except the newest one,
+        which is returned in next_values (it is the first sample of the next frame, used by
+        GenericPlot.plot_new_data to interpolate the slower channels).
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or (self._written - self._read > 1).any(), timeout):
+                return None
+            frame = []
+            next_values = []
+            for c in range(len(self.channels)):
+                end = int(self._written[c])
+                n = max(end - int(self._read[c]) - 1, 0)
+                frame.append(self._view(c, end - 1, n) if end > 0 else self._data[c, :0])
+                next_values.append(self._data[c, (end - 1) % self.capacity] if end > 0 else np.nan)
+                self._read[c] += n
+            self.frames_read += 1
+            self._cond.notify_all()
+            return frame, next_values
+
+    def latest(self, channel, n):
+        """View of the newest n samples (at most capacity) of a channel, whether read or not"""
+        with self._cond:
+            end = int(self._written[channel])
+            n = min(n, end, self.capacity)
+            return self._view(channel, end, n)
@@ -4,6 +4,9 @@ import keyboard
 
 from AeroPy.TrignoBase import TrignoBase
 from AeroPy.DataManager import DataKernel
+from AeroPy.ChannelRouting import build_routing_table, guids_by_type
+from AeroPy.Recording import RecordingBuffer
+from AeroPy.RecordingFile import RecordingReader, RecordingWriter
 from Export import CsvWriter
 
 import threading
@@ -12,8 +15,10 @@ import csv
 # Define the desired mode for the sensors
 desired_mode = 'EMG raw (4000 Hz), skin check (74 Hz), ACC 2g (74 Hz), GYRO 250 dps (74 Hz), +/-11mv, 10-850Hz'
 
-# Initialize a dictionary to store data for each channel
-recorded_data = []
+# Initialize the per-channel sample buffers (NumPy chunks, one packet appended at a time)
+recorded_data = RecordingBuffer()
+# Streamed to disk during the acquisition, converted to CSV at the end
+recording_path = "recorded_data.emgrec"
 
 # Initialize Trigno Base connection
 def initialize_trigno_base():
@@ -32,31 +37,20 @@ def initialize_trigno_base():
         return None
 
 def process_channel_data(channel_guid, data):
-    sensor_type = None
-
-    if channel_guid in emg_guids:
-        sensor_type = "EMG"
-    elif channel_guid in acc_guids:
-        sensor_type = "ACC"
-    elif channel_guid in gyro_guids:
-        sensor_type = "GYRO"
-
-    if sensor_type is None:
+    # One lookup in the routing table built after SetSampleMode
+    route = routes.get(channel_guid)
+    if route is None:
         # Skip if not a recognized sensor type
         return
+    sensor_type = route.dtype
+
+    recorded_data.append_packet(channel_guid, sensor_type, data)
 
     for sample in data:
         time_point = sample.Item1
         value = sample.Item2
         print(f"[{sensor_type}] Channel GUID: {channel_guid}, Time: {time_point}, Value: {value}")
 
-        recorded_data.append({
-            "sensor_type": sensor_type,
-            "channel_guid": channel_guid,
-            "time_point": time_point,
-            "value": value
-        })
-
 # Main function
 if __name__ == "__main__":
     base = initialize_trigno_base()
@@ -67,10 +61,6 @@ if __name__ == "__main__":
         base.Connect_Callback() 
         print("Connected to Trigno Base Station")
 
-        emg_guids = []
-        skin_guids = []
-        acc_guids = []
-        gyro_guids = []
         # Get available sensors
         sensors = base.Scan_Callback()  
         print(f"Found {len(sensors)} sensors.")
@@ -94,31 +84,14 @@ if __name__ == "__main__":
             # current_mode = base.TrigBase.GetCurrentSensorMode(i)
             # print(f"Current mode for sensor {i}: {current_mode}")
 
-        for sensor in sensors:
-            # print(f"Component Number: {sensor.Id}")
-            for channel in sensor.TrignoChannels:
-                name_ch = channel.Name
-                guid = channel.Id
-                type_ch = channel.Type
-                # print(f"  Channel Name: {channel.Name}, GUID: {channel.Id}, Type: {channel.Type}")
-                #to select only EMG channel for each sensor
-                if str(channel.Type) == 'EMG':
-                    emg_guids.append(guid)
-                if str(channel.Type) == 'SkinCheck':
-                    skin_guids.append(guid)
-                if str(channel.Type) == 'ACC':    
-                    acc_guids.append(guid)
-                if str(channel.Type) == 'GYRO':
-                    gyro_guids.append(guid)
-        emg_guids_str = [str(guid) for guid in emg_guids]
-        skin_guids_str = [str(guid) for guid in skin_guids]
-        acc_guids_str = [str(guid) for guid in acc_guids]
-        gyro_guids_str = [str(guid) for guid in gyro_guids]
+        # GUID -> (type, channel index, sample rate, target) for the acquisition loop
+        routes = build_routing_table(sensors, {"EMG": None, "ACC": None, "GYRO": None})
+        for guid, route in routes.items():
+            recorded_data.add_channel(guid, route.dtype, route.sample_rate)
+
         print(f"Component number: {component_ids}")
-        print(f"EMG GUIDs: {emg_guids_str}")
-        print(f"Skin GUIDs: {skin_guids_str}")
-        print(f"ACC GUIDs: {acc_guids_str}")
-        print(f"GYRO GUIDs: {gyro_guids_str}")
+        for dtype, guids in guids_by_type(routes).items():
+            print(f"{dtype} channels: {len(guids)}")
 
         #verify pipeline state 
         if base.TrigBase.GetPipelineState() == 'Connected':
@@ -133,6 +106,11 @@ if __name__ == "__main__":
         base.TrigBase.Start(ytdata = True)
         print("Data collection started...")
 
+        # Flush the buffers to disk every 200 ms, so memory stays flat and a crash loses at most ~1 s
+        writer = RecordingWriter(recording_path, recorded_data,
+                                 metadata={"sensors": [str(sensor.Id) for sensor in sensors]})
+        writer.start()
+
         # Now stream the data in a loop
         try:
             while True:
@@ -165,6 +143,9 @@ if __name__ == "__main__":
             base.TrigBase.ResetPipeline()
             print("Pipeline reset. Now back to Connected state.")
 
+            writer.close()
+            print(f"Recording stream closed: {recording_path}")
+
             # Save the recorded data to a CSV file
             csv_file_path = "recorded_data.csv"
             try:
@@ -179,15 +160,8 @@ if __name__ == "__main__":
                     
                     csv_file.write("\n")  # Add a blank line before the data section
 
-                    fieldnames = ["sensor_type", "channel_guid", "time_point", "value"]
-                    writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-
-                    # Write the header
-                    writer.writeheader()
-                    
-                    # Write the data
-                    for row in recorded_data:
-                        writer.writerow(row)
+                    # Write the header and the data, reading back the recording file
+                    RecordingReader(recording_path).write_csv(csv_file)
 
                 print(f"Data saved to {csv_file_path}")
             except Exception as e:
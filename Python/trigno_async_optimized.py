@@ -2,13 +2,16 @@
 import asyncio  # For asynchronous operations
 import time     # For time tracking
 import socket   # For low-level network operations (not directly used here)
-import csv      # For writing data to CSV
 from collections import defaultdict  # For dictionary with default list
 import keyboard  # For keyboard input detection
 
 # Import Trigno-related interfaces from AeroPy library
 from AeroPy.TrignoBase import TrignoBase
 from AeroPy.DataManager import DataKernel
+from AeroPy.Acquisition import KeyWatcher, YTPoller
+from AeroPy.ChannelRouting import build_routing_table, guids_by_type
+from AeroPy.Recording import RecordingBuffer
+from AeroPy.RecordingFile import RecordingReader, RecordingWriter
 
 # -----------------------------------
 # Class to handle socket communication
@@ -51,13 +54,16 @@ class TrignoRecorder:
         self.desired_mode = 'EMG raw (4000 Hz), skin check (74 Hz), ACC 2g (74 Hz), GYRO 250 dps (74 Hz), +/-11mv, 10-850Hz'
 
         self.global_start_time = None
-        self.recorded_data = [] # Stores data for CSV
+        self.recorded_data = RecordingBuffer() # Per-channel NumPy buffers, drained to disk by the writer
+        self.recording_path = "recorded_data.emgrec" # Streamed while recording, converted to CSV at the end
+        self.writer = None
 
          # Initialize socket connections for each data type
         self.sockets = {dtype: SensorSocket(self.HOST, port) for dtype, port in self.PORTS.items()}
 
         self.base = None # TrignoBase instance (will be initialized)
         self.guids = defaultdict(list) # Store GUIDs for each sensor type
+        self.routes = {} # GUID -> ChannelRoute (type, channel index, sample rate, queue)
         self.queues = {dtype: asyncio.Queue() for dtype in ['EMG', 'ACC', 'GYRO']} # Queues for async processing
 
         self.sensor_info_lines = []  # Store sensor info for CSV header
@@ -83,15 +89,15 @@ class TrignoRecorder:
                 info_line = f"Sensor {sensor.Id}, Channel {channel.Name}, GUID {channel.Id}, Type {channel.Type}"
                 self.sensor_info_lines.append(info_line) # Store sensor metadata
 
-                # Store channel GUIDs for each data type
-                if ch_type in self.guids:
-                    self.guids[ch_type].append(channel.Id)
-                if ch_type in self.queues:
-                    self.guids[ch_type].append(channel.Id)
-
                 # Optionally send sensor metadata via INFO socket
                 self.sockets['INFO'].writer.write((info_line + "\n").encode())
 
+        # Route every channel GUID to its queue once, instead of scanning GUID lists per packet
+        self.routes = build_routing_table(sensors, self.queues)
+        self.guids.update(guids_by_type(self.routes))
+        for guid, route in self.routes.items():
+            self.recorded_data.add_channel(guid, route.dtype, route.sample_rate)
+
         return sensors
 
     # Process a queue for a specific sensor type (EMG, ACC, GYRO)
@@ -105,38 +111,44 @@ class TrignoRecorder:
                 message = f"{dtype},{guid},{sample.Item1},{sample.Item2}\n"
                 await sock.send(message) # Send to socket
 
-                # Also store in memory for later CSV export
-                self.recorded_data.append({
-                    "sensor_type": dtype,
-                    "channel_guid": guid,
-                    "time_point": sample.Item1,
-                    "value": sample.Item2
-                })
+            # Also store the whole packet in memory for later CSV export
+            self.recorded_data.append_packet(guid, dtype, data)
+
+    # Route one PollYTData batch to the queues (called on the event loop by the poller thread)
+    def dispatch(self, yt_data, t_poll):
+        routes = self.routes
+        for guid, data in yt_data.items():
+            # Route data to appropriate queue
+            route = routes.get(guid)
+            if route is not None:
+                route.target.put_nowait((guid, data))
 
     # Start recording sensor data for a given duration 
     # duration could be change
     async def record(self, duration=60):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+
         self.global_start_time = time.time()
         self.base.TrigBase.Start(ytdata=True)
+
+        # Acquisition runs in its own thread; 'q' is checked by a low-rate watcher thread.
+        # The packet period follows the fastest routed channel (4000 Hz EMG in desired_mode)
+        sample_rate = max((route.sample_rate for route in self.routes.values()), default=4000.0)
+        poller = YTPoller(self.base.TrigBase, loop, self.dispatch, sample_rate)
+        watcher = KeyWatcher('q', lambda: loop.call_soon_threadsafe(stop.set))
+        poller.start()
+        watcher.start()
         print("Recording started. Press 'q' to stop.")
 
-        while True:
-            elapsed = time.time() - self.global_start_time
-            # Stop if time is up or user presses 'q'
-            if elapsed > duration or await asyncio.to_thread(keyboard.is_pressed, 'q'):
-                print("Stopping recording.")
-                break
-
-            # If new data is available
-            if self.base.TrigBase.CheckYTDataQueue():
-                yt_data = self.base.TrigBase.PollYTData()
-                for guid, data in yt_data.items():
-                    # Route data to appropriate queue
-                    for dtype, guids in self.guids.items():
-                        if guid in guids:
-                            await self.queues[dtype].put((guid, data))
-
-            await asyncio.sleep(0.001) # Prevent busy-waiting
+        # Stop if time is up or user presses 'q'
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=duration)
+        except asyncio.TimeoutError:
+            pass
+        print("Stopping recording.")
+        watcher.stop()
+        poller.stop()
 
         # Stop data collection and reset system
         self.base.TrigBase.Stop()
@@ -151,10 +163,8 @@ class TrignoRecorder:
                 f.write(line + "\n")
             f.write("\n")  # Empty line before data block
             
-            # Write data block
-            writer = csv.DictWriter(f, fieldnames=["sensor_type", "channel_guid", "time_point", "value"])
-            writer.writeheader()
-            writer.writerows(self.recorded_data)
+            # Write data block from the streamed recording file (constant memory)
+            RecordingReader(self.recording_path).write_csv(f)
 
     # Full process: setup → wait → record → save
     async def run(self):
@@ -167,17 +177,24 @@ class TrignoRecorder:
         print("Press 's' to start recording...")
         await asyncio.to_thread(keyboard.wait, 's') # Wait for user to press 's'
 
+        # Samples are flushed to disk every 200 ms while recording
+        self.writer = RecordingWriter(self.recording_path, self.recorded_data,
+                                      metadata={"sensors": self.sensor_info_lines})
+        self.writer.start()
+
         # Start background tasks for processing each sensor data type
         workers = [asyncio.create_task(self.process_queue(dtype)) for dtype in self.queues.keys()]
-        await self.record()  # Run main recording loop
-
-        # Cancel background tasks after recording ends
-        for w in workers:
-            w.cancel()
-            try:
-                await w
-            except asyncio.CancelledError:
-                pass
+        try:
+            await self.record()  # Run main recording loop
+        finally:
+            # Cancel background tasks after recording ends
+            for w in workers:
+                w.cancel()
+                try:
+                    await w
+                except asyncio.CancelledError:
+                    pass
+            self.writer.close() # Write the last samples and the index footer
 
         self.save_to_csv(sensors) # Save data to file
 
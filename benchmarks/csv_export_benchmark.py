@@ -0,0 +1,148 @@
+"""
+CSV export benchmark: CsvWriter.exportYTCSV against the per-cell loop it replaced.
+
+The channel data is built like DataKernel.allcollectiondata on the simulated backend, with the
+fast EMG channels next to the slow ones so most rows are padded. The per-cell loop gets what the
+kernel used to store, one flat list of SimulatedAeroPy.YTSample (Item1 = time, Item2 = value)
+per channel; CsvWriter gets what it stores now, one (n, 2) float64 array per packet (converted
+at acquisition time, see Python/AeroPy/Conversion.py). CsvWriter runs twice:
+
+    repr    : precision = None, the same file as the per-cell loop (checked byte for byte);
+              the time Python needs just to repr() every cell is the floor of this path
+    fixed   : precision = CsvWriter.precision significant digits, formatted a block at a time;
+              the report gives the largest relative error of the cells read back
+
+Usage:
+    python benchmarks/csv_export_benchmark.py --channels 16 --seconds 60
+"""
+import argparse
+import csv
+import filecmp
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Python"))
+
+import numpy as np
+
+from AeroPy.SimulatedAeroPy import YTSample
+from Export.CsvWriter import CsvWriter
+
+
+def per_cell_export(filename, h1_sensors, h2_channels, data):
+    """The exportYTCSV loop before the vectorized writer: one .Item1/.Item2 lookup per cell"""
+    with open(filename, 'w', newline='') as csvfile:
+        csvwriter = csv.writer(csvfile, delimiter=',')
+        csvwriter.writerow(h1_sensors)
+        csvwriter.writerow(h2_channels)
+        maxlen = max((len(chan_data) for chan_data in data), default=0)
+        for i in range(maxlen):
+            row = []
+            for chan_data in data:
+                try:
+                    row.append(chan_data[i].Item1)
+                    row.append(chan_data[i].Item2)
+                except IndexError:
+                    row.append("")
+                    row.append("")
+            csvwriter.writerow(row)
+
+
+def export(filename, h1_sensors, h2_channels, data, precision):
+    """Run CsvWriter.exportYTCSV and return the seconds it took"""
+    writer = CsvWriter()
+    writer.filename = filename
+    writer.precision = precision
+    writer.h1_sensors, writer.h2_channels, writer.data = h1_sensors, h2_channels, data
+    t0 = time.perf_counter()
+    if not writer.exportYTCSV():
+        sys.exit("CsvWriter export failed")
+    return time.perf_counter() - t0
+
+
+def max_relative_error(filename, data):
+    """Largest relative difference between the cells of a CSV export and the channel data"""
+    exact = [np.array([v for sample in chan_data for v in sample]) for chan_data in data]
+    worst = 0.0
+    with open(filename, newline='') as f:
+        rows = csv.reader(f)
+        next(rows), next(rows)
+        columns = [[] for _ in exact]
+        for row in rows:
+            for c, (t, y) in enumerate(zip(row[0::2], row[1::2])):
+                if t:
+                    columns[c].extend((float(t), float(y)))
+    for written, values in zip(columns, exact):
+        written = np.asarray(written)
+        scale = np.maximum(np.abs(values), np.finfo(float).tiny)
+        worst = max(worst, float((np.abs(written - values) / scale).max(initial=0.0)))
+    return worst
+
+
+def build_data(channels, seconds, fast_rate, slow_rate, packet_interval=0.0135, seed=0):
+    """
+    (samples, packets): per channel, a YTSample list and the same samples as a list of (n, 2)
+    packet arrays; every fourth channel is sampled at fast_rate
+    """
+    rng = np.random.default_rng(seed)
+    samples, packets = [], []
+    for c in range(channels):
+        rate = fast_rate if c % 4 == 0 else slow_rate
+        n = int(seconds * rate)
+        times = np.arange(n) / rate
+        values = rng.normal(0.0, 1e-4, n)
+        samples.append([YTSample(t, y) for t, y in zip(times.tolist(), values.tolist())])
+        bounds = np.searchsorted(times, np.arange(packet_interval, seconds, packet_interval))
+        packets.append(np.split(np.column_stack((times, values)), bounds))
+    return samples, packets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV export benchmark (YTSample channel data)")
+    parser.add_argument("--channels", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--fast-rate", type=float, default=2148.0)
+    parser.add_argument("--slow-rate", type=float, default=74.0)
+    args = parser.parse_args()
+
+    data, packets = build_data(args.channels, args.seconds, args.fast_rate, args.slow_rate)
+    h1_sensors = [f"({c // 4 + 1})Sensor" if c % 4 == 0 else "" for c in range(args.channels) for _ in "TY"]
+    h2_channels = [f"Channel {c}" + suffix for c in range(args.channels) for suffix in (" Time Series", "")]
+    cells = 2 * sum(len(chan_data) for chan_data in data)
+    print(f"{args.channels} channels, {args.seconds:g} s: {cells} cells, {max(map(len, data))} rows")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        old_file = os.path.join(scratch, "per_cell.csv")
+        t0 = time.perf_counter()
+        per_cell_export(old_file, h1_sensors, h2_channels, data)
+        per_cell = time.perf_counter() - t0
+
+        repr_file = os.path.join(scratch, "repr.csv")
+        repr_seconds = export(repr_file, h1_sensors, h2_channels, packets, None)
+        identical = filecmp.cmp(old_file, repr_file, shallow=False)
+
+        fixed_file = os.path.join(scratch, "fixed.csv")
+        fixed_seconds = export(fixed_file, h1_sensors, h2_channels, packets, CsvWriter.precision)
+        error = max_relative_error(fixed_file, data)
+        sizes = [os.path.getsize(name) / 1e6 for name in (repr_file, fixed_file)]
+
+    # Shortest round-trip repr of every cell: what any byte-identical writer has to spend
+    values = list(itertools.chain.from_iterable(itertools.chain.from_iterable(data)))
+    t0 = time.perf_counter()
+    for v in values:
+        repr(v)
+    repr_floor = time.perf_counter() - t0
+
+    print(f"per-cell loop      {per_cell:8.2f} s")
+    print(f"CsvWriter repr     {repr_seconds:8.2f} s   ({per_cell / repr_seconds:.2f}x, identical output: {identical}, {sizes[0]:.1f} MB)")
+    print(f"  repr() of cells  {repr_floor:8.2f} s   ({repr_floor / repr_seconds:.0%} of the repr export)")
+    print(f"CsvWriter fixed    {fixed_seconds:8.2f} s   ({per_cell / fixed_seconds:.2f}x, {CsvWriter.precision} digits, "
+          f"max relative error {error:.1e}, {sizes[1]:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+End-to-end latency benchmark: from a muscle contraction to the bird jump in my_flappy.py.
+
+Runs the real TrignoRecorder pipeline (emg_sensor_flag.py) on the simulated AeroPy backend,
+injects timestamped EMG bursts and follows each one through the stages
+
+    onset    : first sample of the burst is available from the (simulated) base
+    poll     : PollYTData returned the packet that triggered the jump
+    put      : packet put on queues['EMG']
+    process  : process_queue got the packet and detected the SWITCH ON
+    publish  : edge written into the shared-memory channel
+    read     : game loop (separate process) read the edge -> bird_movement -= 6
+    render   : frame with the jump drawn and displayed
+
+The same edges also go through the event server (emg_socket.py), which my_flappy.py reads by
+default (--input socket); the game loop polls an EmgEventClient next to the channel reader:
+
+    socket_publish : EmgEventServer.publish sent the datagram to the subscribers
+    socket_read    : the game loop received it
+
+Latency stages are reported as p50/p95/p99 in milliseconds for every sensor count, together
+with the pipeline throughput measured with packets emitted as fast as they are processed.
+
+Usage:
+    python benchmarks/latency_benchmark.py --sensors 1 4 8 16 --output latency_results.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("AEROPY_BACKEND", "simulated")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Python"))
+
+import numpy as np
+
+from AeroPy.SimulatedAeroPy import AeroPy
+from Python.AeroPy.TrignoBase import TrignoBase
+from Python.AeroPy.DataManager import DataKernel
+from emg_channel import ACTION_JUMP, EmgEventReader, EmgEventWriter
+from emg_sensor_flag import TrignoRecorder
+from emg_socket import EmgEventClient, EmgEventServer
+
+STAGES = ["poll", "put", "process", "publish", "read", "render"]
+SOCKET_STAGES = ["socket_publish", "socket_read"]
+CHANNEL_FILE = "benchmark_state.bin"
+SOCKET_ADDRESS = "benchmark_events.sock" if os.name == "posix" else ("127.0.0.1", 47801)
+
+
+# -----------------------------------
+# Instrumented pipeline
+# -----------------------------------
+class TracedQueue(asyncio.Queue):
+    """asyncio.Queue that timestamps every (guid, data) item on put and get"""
+
+    def __init__(self):
+        super().__init__()
+        self.t_poll = 0.0
+        self.last = None
+        self.samples = 0
+        self._stamps = {}
+
+    def put_nowait(self, item):
+        self._stamps[id(item[1])] = (self.t_poll, time.perf_counter())
+        super().put_nowait(item)
+
+    async def get(self):
+        item = await super().get()
+        t_poll, t_put = self._stamps.pop(id(item[1]))
+        self.last = (t_poll, t_put, time.perf_counter())
+        self.samples += len(item[1])
+        return item
+
+
+class TracedWriter:
+    """Wraps a publisher of the recorder (EmgEventWriter, EmgEventServer) and timestamps every SWITCH ON"""
+
+    def __init__(self, writer, queue):
+        self.writer = writer
+        self.queue = queue
+        self.edges = []
+
+    def publish(self, state, timestamp=None, channel=0, action=ACTION_JUMP):
+        t_detect = time.perf_counter()
+        seq = self.writer.publish(state, timestamp, channel, action)
+        if state and action == ACTION_JUMP and self.queue.last is not None:
+            t_poll, t_put, t_get = self.queue.last
+            self.edges.append({"seq": seq, "poll": t_poll, "put": t_put, "get": t_get,
+                               "process": t_detect, "publish": time.perf_counter()})
+        return seq
+
+    def close(self):
+        self.writer.close()
+
+
+class BenchmarkRecorder(TrignoRecorder):
+    """TrignoRecorder on a simulated base, with recording stopped by time instead of by keyboard"""
+
+    def __init__(self, sim, max_amp):
+        super().__init__("localhost", max_amp)
+        self.sim = sim
+        self.queues = {dtype: TracedQueue() for dtype in self.queues}
+        # Both publishers get the same publish() calls, so their edge lists line up
+        self.state_channel.close()
+        self.state_channel = TracedWriter(EmgEventWriter(CHANNEL_FILE), self.queues["EMG"])
+        self.event_server.close()
+        self.event_server = TracedWriter(EmgEventServer(SOCKET_ADDRESS), self.queues["EMG"])
+        self.poll_seconds = 0.0
+        self.bursts = []
+
+    def setup_base(self):
+        self.base = TrignoBase(None, aero=self.sim)
+        self.base.collection_data_handler = DataKernel(self.base)
+
+    def dispatch(self, yt_data, t_poll):
+        for queue in self.queues.values():
+            queue.t_poll = t_poll
+        super().dispatch(yt_data, t_poll)
+
+    async def record(self, duration=None, packets=None, burst_times=()):
+        trig = self.base.TrigBase
+        trig.Start(ytdata=True)
+        self.bursts = [trig.inject_burst(start=t, duration=self.burst_duration) for t in burst_times]
+
+        if duration is not None:
+            # Same acquisition thread as TrignoRecorder.record, stopped by time instead of by keyboard
+            poller = self.start_poller(self.dispatch)
+            await asyncio.sleep(duration / self.sim.speed)
+            poller.stop()
+        else:
+            # Throughput: packets are polled back to back, the workers run between two packets
+            for _ in range(packets):
+                t0 = time.perf_counter()
+                yt_data = trig.PollYTData()
+                t_poll = time.perf_counter()
+                self.poll_seconds += t_poll - t0
+                self.dispatch(yt_data, t_poll)
+                await asyncio.sleep(0)
+
+        # Let the workers drain what has already been polled
+        while any(not q.empty() for q in self.queues.values()):
+            await asyncio.sleep(0.001)
+        trig.Stop()
+        trig.ResetPipeline()
+
+
+async def _run_pipeline(recorder, **record_args):
+    recorder.setup_base()
+    recorder.base.Connect_Callback()
+    recorder.configure_sensors()
+    recorder.base.TrigBase.Configure(start_trigger=False, stop_trigger=False)
+
+    workers = [asyncio.create_task(recorder.process_queue(dtype)) for dtype in recorder.queues.keys()]
+    start = time.perf_counter()
+    await recorder.record(**record_args)
+    elapsed = time.perf_counter() - start
+    for w in workers:
+        w.cancel()
+        try:
+            await w
+        except asyncio.CancelledError:
+            pass
+    return elapsed
+
+
+# -----------------------------------
+# Game side (separate process, like my_flappy.py)
+# -----------------------------------
+def game_loop(fps, render, ready, stop, results):
+    reader = EmgEventReader(CHANNEL_FILE)
+    reader.poll()
+    client = EmgEventClient(SOCKET_ADDRESS)
+    client.poll()
+
+    screen = None
+    if render:
+        try:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            import pygame
+            pygame.init()
+            screen = pygame.display.set_mode((576, 1024))
+            bg_surface = pygame.transform.scale2x(pygame.image.load(os.path.join(ROOT, "assets/background-day.png")).convert())
+            bird_surface = pygame.transform.scale2x(pygame.image.load(os.path.join(ROOT, "assets/bluebird-midflap.png")).convert_alpha())
+            bird_rect = bird_surface.get_rect(center=(100, 512))
+        except Exception as e:
+            print(f"Rendering disabled: {e}")
+            screen = None
+
+    reads = []
+    socket_reads = []
+    frame = 1.0 / fps
+    next_frame = time.perf_counter()
+    ready.set()
+    while not stop.is_set():
+        socket_events = client.poll()
+        t_socket = time.perf_counter()
+        socket_reads.extend((event.seq, t_socket) for event in socket_events if event.state)
+
+        events = reader.poll()
+        t_read = time.perf_counter()
+        jumps = [event.seq for event in events if event.state]
+
+        if screen is not None:
+            screen.blit(bg_surface, (0, 0))
+            screen.blit(bird_surface, bird_rect)
+            pygame.display.update()
+        t_render = time.perf_counter()
+
+        for seq in jumps:
+            reads.append((seq, t_read, t_render))
+
+        next_frame += frame
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_frame = time.perf_counter()
+
+    reader.close()
+    client.close()
+    results.put((reads, socket_reads))
+
+
+# -----------------------------------
+# Benchmark cases
+# -----------------------------------
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000.0
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+            "p99": float(np.percentile(values, 99)), "mean": float(values.mean()), "n": int(values.size)}
+
+
+def latency_case(sensors, bursts, burst_gap, burst_duration, fps, render, max_amp):
+    sim = AeroPy(sensor_count=sensors, speed=1.0, burst_rate=0, seed=sensors)
+    recorder = BenchmarkRecorder(sim, max_amp)
+    recorder.burst_duration = burst_duration
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop, results = ctx.Event(), ctx.Event(), ctx.Queue()
+    game = ctx.Process(target=game_loop, args=(fps, render, ready, stop, results))
+    game.start()
+    ready.wait(30)
+
+    burst_times = [0.5 + k * burst_gap for k in range(bursts)]
+    asyncio.run(_run_pipeline(recorder, duration=burst_times[-1] + burst_gap, burst_times=burst_times))
+
+    time.sleep(3.0 / fps)
+    stop.set()
+    reads, socket_reads = results.get(timeout=30)
+    reads = {seq: (t_read, t_render) for seq, t_read, t_render in reads}
+    socket_reads = dict(socket_reads)
+    game.join()
+    recorder.state_channel.close()
+    recorder.event_server.close()
+
+    # Match each SWITCH ON with the last burst whose onset was available before the poll
+    onsets = np.asarray([sim.wall_time_of(t) for t in recorder.bursts])
+    stages = {name: [] for name in STAGES + SOCKET_STAGES + ["total"]}
+    matched = set()
+    for edge, socket_edge in zip(recorder.state_channel.edges, recorder.event_server.edges):
+        k = int(np.searchsorted(onsets, edge["poll"], side="right")) - 1
+        if k < 0 or k in matched or edge["seq"] not in reads:
+            continue
+        matched.add(k)
+        t_read, t_render = reads[edge["seq"]]
+        timeline = [onsets[k], edge["poll"], edge["put"], edge["process"], edge["publish"], t_read, t_render]
+        for name, t0, t1 in zip(STAGES, timeline[:-1], timeline[1:]):
+            stages[name].append(t1 - t0)
+        stages["total"].append(t_render - onsets[k])
+        if socket_edge["seq"] in socket_reads:
+            stages["socket_publish"].append(socket_edge["publish"] - socket_edge["process"])
+            stages["socket_read"].append(socket_reads[socket_edge["seq"]] - socket_edge["publish"])
+
+    return {
+        "bursts": bursts,
+        "detected": len(matched),
+        "latency_ms": {name: percentiles(values) for name, values in stages.items()},
+    }
+
+
+def throughput_case(sensors, packets, max_amp):
+    sim = AeroPy(sensor_count=sensors, speed=None, burst_rate=2.0, seed=sensors)
+    recorder = BenchmarkRecorder(sim, max_amp)
+    recorder.burst_duration = 0.2
+    elapsed = asyncio.run(_run_pipeline(recorder, packets=packets))
+    recorder.state_channel.close()
+    recorder.event_server.close()
+
+    samples = sum(q.samples for q in recorder.queues.values())
+    pipeline_seconds = max(elapsed - recorder.poll_seconds, 1e-9)
+    return {
+        "packets": packets,
+        "samples": samples,
+        "seconds": elapsed,
+        "packets_per_s": packets / elapsed,
+        "samples_per_s": samples / elapsed,
+        # Excluding the time spent generating data inside the simulator
+        "pipeline_samples_per_s": samples / pipeline_seconds,
+        "realtime_factor": packets * sim.packet_interval / pipeline_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EMG -> bird jump latency benchmark (simulated base)")
+    parser.add_argument("--sensors", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--bursts", type=int, default=30, help="contractions per sensor count")
+    parser.add_argument("--burst-gap", type=float, default=0.5, help="seconds between contractions")
+    parser.add_argument("--burst-duration", type=float, default=0.2)
+    parser.add_argument("--packets", type=int, default=2000, help="packets for the throughput run")
+    parser.add_argument("--fps", type=float, default=60.0, help="game frame rate (my_flappy.py: 120 * 0.5)")
+    parser.add_argument("--no-render", action="store_true", help="skip the pygame frame")
+    parser.add_argument("--max-amp", type=float, default=0.25)
+    parser.add_argument("--output", default="latency_results.json")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": [],
+    }
+
+    # Channel and profiles are created in a scratch directory, never over the live emg_state.bin
+    with tempfile.TemporaryDirectory() as scratch:
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            for sensors in args.sensors:
+                print(f"--- {sensors} sensor(s)")
+                result = {"sensors": sensors}
+                result.update(latency_case(sensors, args.bursts, args.burst_gap, args.burst_duration,
+                                           args.fps, not args.no_render, args.max_amp))
+                result["throughput"] = throughput_case(sensors, args.packets, args.max_amp)
+                report["results"].append(result)
+        finally:
+            os.chdir(cwd)
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    missing = {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+    print(f"{'sensors':>8} {'detected':>9} {'total p50':>10} {'p95':>8} {'p99':>8} "
+          f"{'shm read p50':>13} {'socket p50':>11} {'samples/s':>12}")
+    for result in report["results"]:
+        latency = result["latency_ms"]
+        total = latency["total"] or missing
+        read = latency["read"] or missing
+        socket_read = latency["socket_read"] or missing
+        print(f"{result['sensors']:>8} {result['detected']:>5}/{result['bursts']:<3} {total['p50']:>10.2f} "
+              f"{total['p95']:>8.2f} {total['p99']:>8.2f} {read['p50']:>13.3f} {socket_read['p50']:>11.3f} "
+              f"{result['throughput']['pipeline_samples_per_s']:>12.0f}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
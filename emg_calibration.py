@@ -0,0 +1,68 @@
+"""
+Per-subject MVC (maximum voluntary contraction) threshold profiles.
+
+TrignoRecorder.calibrate() feeds the EMG envelope of each channel into a QuantileSketch
+while the subject holds a maximum contraction; the resulting profile is saved as JSON in
+PROFILE_DIR and loaded again at start-up by later sessions of the same subject.
+"""
+import json
+import os
+import time
+
+PROFILE_DIR = "profiles"
+PROFILE_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def profile_path(subject, profile_dir=PROFILE_DIR):
+    return os.path.join(profile_dir, f"{subject}.json")
+
+
+def channel_key(sensor, channel):
+    """Key that identifies a channel across sessions (GUIDs change every time the pipeline is configured)"""
+    return f"{sensor.Id}/{channel.Name}"
+
+
+def build_profile(subject, sketches, duration, threshold_fraction):
+    """
+    Build a profile from {channel_key: QuantileSketch}.
+    The reference MVC of a channel is the 99th percentile of its envelope, which is robust to
+    isolated spikes; the jump threshold is threshold_fraction of that value.
+    """
+    channels = {}
+    for key, sketch in sketches.items():
+        if sketch.count == 0:
+            continue
+        entry = {f"p{round(q * 100)}": sketch.quantile(q) for q in PROFILE_QUANTILES}
+        entry["peak"] = sketch.max
+        entry["samples"] = sketch.count
+        entry["mvc"] = entry["p99"]
+        entry["threshold"] = threshold_fraction * entry["mvc"]
+        channels[key] = entry
+
+    return {
+        "subject": subject,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "duration": duration,
+        "threshold_fraction": threshold_fraction,
+        "channels": channels,
+    }
+
+
+def save_profile(profile, profile_dir=PROFILE_DIR):
+    os.makedirs(profile_dir, exist_ok=True)
+    path = profile_path(profile["subject"], profile_dir)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+def load_profile(subject, profile_dir=PROFILE_DIR):
+    """Return the saved profile of the subject, or None if it has never been calibrated"""
+    try:
+        with open(profile_path(subject, profile_dir), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Errore nel caricamento del profilo {subject}: {e}")
+        return None
@@ -0,0 +1,221 @@
+"""
+Shared-memory event channel between emg_sensor_flag.py (writer) and my_flappy.py (reader).
+
+The channel is a small memory-mapped file holding a ring of trigger edges. Every edge gets
+a sequence number and a timestamp, so the game can read all the edges published since its
+last frame with a single read of the sequence counter, without missing short ON pulses.
+
+Layout (little endian):
+    header  : magic (4s), version (H), reserved (H), capacity (I), game seed (I) @12,
+              write_seq (Q) @16, current state (B) @24, padding up to 32 bytes
+    slot[i] : seq (Q), timestamp (d), channel (i), state (B), action (B), padding -> 24 bytes
+
+The game seed (0 = none) lets the writer choose the pipe layout of the games played on its
+edges, so a recorded session (emg_session.py) can be replayed on the same pipes.
+
+The action of an edge is the game command it belongs to (emg_control.py maps channel
+combinations to actions). ACTION_JUMP is a level, like the single flag of the first version:
+ON while the contraction is held, then OFF; the current state byte is its level. ACTION_PAUSE
+and ACTION_RESTART are single ON pulses. ACTION_JUMP is 0, so slots written without an
+action read as jumps.
+"""
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+CHANNEL_FILE = "emg_state.bin"
+CAPACITY = 256
+
+_MAGIC = b"EMGC"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+_HEADER_SIZE = 32
+_SEQ = struct.Struct("<Q")
+_SEQ_OFFSET = 16
+_SEED = struct.Struct("<I")
+_SEED_OFFSET = 12
+_STATE = struct.Struct("<B")
+_STATE_OFFSET = 24
+_SLOT = struct.Struct("<QdiBB2x")
+
+ACTION_JUMP, ACTION_PAUSE, ACTION_RESTART = 0, 1, 2
+
+# A single trigger edge: state is True for SWITCH ON, False for SWITCH OFF
+EmgEvent = namedtuple("EmgEvent", ["seq", "timestamp", "channel", "state", "action"], defaults=[ACTION_JUMP])
+
+
+def _channel_size(capacity):
+    return _HEADER_SIZE + capacity * _SLOT.size
+
+
+class EmgEventWriter:
+    """Publishes trigger edges into the shared-memory ring (one writer per channel file)."""
+
+    def __init__(self, path=CHANNEL_FILE, capacity=CAPACITY, seed=0):
+        self.path = path
+        self.capacity = capacity
+        self.seed = seed
+        size = _channel_size(capacity)
+
+        # Reuse an existing channel of the right shape, so a game that is already running
+        # keeps its mapping and simply sees the sequence counter move on
+        reuse = os.path.exists(path) and os.path.getsize(path) == size
+        if not reuse:
+            # A channel of another shape is built aside and renamed over the path: truncating the
+            # old file in place would crash (SIGBUS) a game that still maps it. The game keeps
+            # reading the old file until its reader notices the new one and reopens.
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, 0, capacity, seed))
+                f.write(b"\x00" * (size - _HEADER.size))
+            os.replace(tmp, path)
+
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+        if reuse and self._read_header_ok():
+            self._seq = _SEQ.unpack_from(self._mm, _SEQ_OFFSET)[0]
+        else:
+            self._mm[:] = b"\x00" * size
+            _HEADER.pack_into(self._mm, 0, _MAGIC, _VERSION, 0, capacity, 0)
+            self._seq = 0
+        _SEED.pack_into(self._mm, _SEED_OFFSET, seed)
+
+    def _read_header_ok(self):
+        magic, version, _, capacity, _ = _HEADER.unpack_from(self._mm, 0)
+        return magic == _MAGIC and version == _VERSION and capacity == self.capacity
+
+    def publish(self, state, timestamp=None, channel=0, action=ACTION_JUMP):
+        """Append an edge to the ring and return its sequence number"""
+        if timestamp is None:
+            timestamp = time.time()
+        seq = self._seq + 1
+        offset = _HEADER_SIZE + ((seq - 1) % self.capacity) * _SLOT.size
+
+        # Slot first, then the level and finally the counter: a reader that sees the new
+        # counter always finds a complete slot behind it
+        _SLOT.pack_into(self._mm, offset, seq, float(timestamp), int(channel), 1 if state else 0, action)
+        if action == ACTION_JUMP:
+            _STATE.pack_into(self._mm, _STATE_OFFSET, 1 if state else 0)
+        _SEQ.pack_into(self._mm, _SEQ_OFFSET, seq)
+        self._seq = seq
+        return seq
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+
+
+class EmgEventReader:
+    """Non-blocking reader used once per frame by the game loop"""
+
+    RETRY_INTERVAL = 1.0  # seconds between attempts to open a channel that does not exist yet,
+                          # and between checks that the mapped channel is still the current one
+
+    def __init__(self, path=CHANNEL_FILE):
+        self.path = path
+        self.capacity = 0
+        self._file = None
+        self._mm = None
+        self._last_seq = 0
+        self._next_retry = 0.0
+        self._next_check = 0.0
+        self.lost = 0           # edges overwritten in the ring before they were read
+
+    def _replaced(self):
+        """True when the writer has renamed a new channel file over the mapped one"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.RETRY_INTERVAL
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return False
+
+    def _open(self):
+        now = time.monotonic()
+        if now < self._next_retry:
+            return False
+        self._next_retry = now + self.RETRY_INTERVAL
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return False
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            f.close()
+            return False
+
+        if len(mm) < _HEADER_SIZE:
+            mm.close()
+            f.close()
+            return False
+        magic, version, _, capacity, _ = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _VERSION or len(mm) < _channel_size(capacity):
+            mm.close()
+            f.close()
+            return False
+
+        self._file, self._mm, self.capacity = f, mm, capacity
+        # Edges published before the game started are history, not input
+        self._last_seq = _SEQ.unpack_from(mm, _SEQ_OFFSET)[0]
+        return True
+
+    def poll(self):
+        """Return the list of EmgEvent published since the previous call (usually empty)"""
+        if self._mm is not None and self._replaced():
+            self.close()
+            self._next_retry = 0.0
+            if self._open():
+                # Every edge of the new channel came after the old one stopped
+                self._last_seq = 0
+        if self._mm is None and not self._open():
+            return []
+
+        seq = _SEQ.unpack_from(self._mm, _SEQ_OFFSET)[0]
+        if seq == self._last_seq:
+            return []
+        if seq < self._last_seq:
+            # The writer restarted with a fresh channel
+            self._last_seq = 0
+
+        events = []
+        first = max(self._last_seq + 1, seq - self.capacity + 1)
+        # The reader fell behind by more than the ring: the oldest edges are gone
+        self.lost += first - self._last_seq - 1
+        for s in range(first, seq + 1):
+            offset = _HEADER_SIZE + ((s - 1) % self.capacity) * _SLOT.size
+            slot_seq, timestamp, channel, state, action = _SLOT.unpack_from(self._mm, offset)
+            if slot_seq != s:
+                # Overwritten by the writer while we were reading: the ring overflowed
+                self.lost += 1
+                continue
+            events.append(EmgEvent(slot_seq, timestamp, channel, bool(state), action))
+        self._last_seq = seq
+        return events
+
+    @property
+    def seed(self):
+        """Game seed published by the writer, or None"""
+        if self._mm is None and not self._open():
+            return None
+        return _SEED.unpack_from(self._mm, _SEED_OFFSET)[0] or None
+
+    @property
+    def state(self):
+        """Current level of the jump command (True while its contraction is above threshold)"""
+        if self._mm is None and not self._open():
+            return False
+        return bool(self._mm[_STATE_OFFSET])
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
@@ -0,0 +1,85 @@
+"""
+Mapping from combinations of EMG channels to game actions.
+
+Every action is bound to one or more channel combinations, e.g. with three sensors:
+    jump=0        jump while channel 0 is contracted
+    pause=0+1     channels 0 and 1 together toggle the pause
+    restart=2     channel 2 starts a new game
+The active combination is the bitmask of the channels currently ON (DetectorBank.mask).
+It selects the most specific bound combination it contains, so holding 0 jumps and adding
+1 switches to pause; between equally specific combinations the later binding wins. The
+choice is a lookup in a table of 2**channels entries built once with NumPy, so the per-edge
+cost does not grow with the number of combinations.
+
+Without bindings every channel jumps, as the single EMG flag did.
+"""
+import numpy as np
+
+from emg_channel import ACTION_JUMP, ACTION_PAUSE, ACTION_RESTART
+
+ACTIONS = {"jump": ACTION_JUMP, "pause": ACTION_PAUSE, "restart": ACTION_RESTART}
+NO_ACTION = -1
+MAX_CHANNELS = 16
+
+
+def parse_binding(text):
+    """'pause=0+1' -> (ACTION_PAUSE, [0, 1])"""
+    try:
+        name, channels = text.split("=", 1)
+        return ACTIONS[name.strip().lower()], [int(c) for c in channels.split("+")]
+    except (ValueError, KeyError):
+        raise ValueError(f"invalid binding {text!r}: expected <{'|'.join(ACTIONS)}>=<channel>[+<channel>...]")
+
+
+class ControlMap:
+    def __init__(self, channels, bindings=None):
+        """
+        channels : number of EMG channels (bits of the mask)
+        bindings : [(action, [channel, ...]), ...] or 'action=c+c' strings; None = every channel jumps
+        """
+        if not 0 < channels <= MAX_CHANNELS:
+            raise ValueError(f"channels must be between 1 and {MAX_CHANNELS}")
+        self.channels = channels
+        if bindings is None:
+            bindings = [(ACTION_JUMP, [c]) for c in range(channels)]
+        self.bindings = [parse_binding(b) if isinstance(b, str) else (b[0], list(b[1])) for b in bindings]
+
+        masks = np.arange(1 << channels, dtype=np.int64)
+        self.table = np.full(masks.size, NO_ACTION, dtype=np.int8)
+        # Fewer channels first: a more specific combination overwrites the ones it contains
+        for action, combination in sorted(self.bindings, key=lambda b: len(set(b[1]))):
+            if not all(0 <= c < channels for c in combination):
+                raise ValueError(f"channel out of range in {combination}")
+            bits = sum(1 << c for c in set(combination))
+            self.table[(masks & bits) == bits] = action
+        self.reset()
+
+    def reset(self):
+        self.mask = 0
+        self.action = NO_ACTION
+
+    def specs(self):
+        """Bindings as 'action=c+c' strings (for the session metadata)"""
+        names = {action: name for name, action in ACTIONS.items()}
+        return [f"{names[action]}={'+'.join(map(str, combination))}" for action, combination in self.bindings]
+
+    def feed(self, channel, state):
+        """
+        Apply an edge of one channel; return the (action, state) edges to publish (usually one).
+        The jump is a level (ON, then OFF when the combination changes), the others ON pulses.
+        """
+        if state:
+            self.mask |= 1 << channel
+        else:
+            self.mask &= ~(1 << channel)
+        action = int(self.table[self.mask])
+        if action == self.action:
+            return []
+
+        edges = []
+        if self.action == ACTION_JUMP:
+            edges.append((ACTION_JUMP, False))
+        if action != NO_ACTION:
+            edges.append((action, True))
+        self.action = action
+        return edges
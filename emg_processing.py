@@ -0,0 +1,230 @@
+"""
+Packet-level EMG processing used by emg_sensor_flag.py.
+
+Everything here works on whole PollYTData packets turned into NumPy arrays, so the cost
+per packet is a handful of vectorized operations instead of a Python loop per sample.
+"""
+import numpy as np
+from scipy import signal
+
+from Python.AeroPy.Recording import yt_packet_to_arrays  # re-exported for emg_sensor_flag.py
+
+
+class EnvelopeFilter:
+    """
+    Streaming EMG envelope for a single channel: band-pass -> full-wave rectification -> sliding window.
+
+    The IIR filter state and the tail of the sliding window are carried from one packet to the
+    next, so feeding a recording packet by packet gives the same envelope as filtering it in
+    one go. Cost is O(1) per sample (second-order sections plus a running sum).
+    """
+
+    def __init__(self, sample_rate, band=(20.0, 450.0), window=0.05, mode='rms', order=4):
+        nyquist = sample_rate / 2.0
+        high = min(band[1], 0.95 * nyquist)
+        self.sos = signal.butter(order, [band[0], high], btype='bandpass', fs=sample_rate, output='sos')
+        self.window = max(1, int(round(window * sample_rate)))
+        if mode not in ('rms', 'mean'):
+            raise ValueError("mode must be 'rms' or 'mean'")
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        self._zi = None
+        self._tail = np.zeros(self.window - 1)
+
+    def process(self, values):
+        """Return the envelope of one packet (same length as values)"""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return values.copy()
+
+        if self._zi is None:
+            # Start the filter in steady state on the first sample to avoid a start-up transient
+            self._zi = signal.sosfilt_zi(self.sos) * values[0]
+        filtered, self._zi = signal.sosfilt(self.sos, values, zi=self._zi)
+
+        rectified = np.abs(filtered)
+        x = rectified * rectified if self.mode == 'rms' else rectified
+
+        #---- Sliding window mean over the tail of the previous packet + this packet
+        extended = np.concatenate((self._tail, x))
+        csum = np.empty(extended.size + 1)
+        csum[0] = 0.0
+        np.cumsum(extended, out=csum[1:])
+        mean = (csum[self.window:] - csum[:-self.window]) / self.window
+        if self.window > 1:
+            self._tail = extended[-(self.window - 1):]
+
+        if self.mode == 'rms':
+            return np.sqrt(np.maximum(mean, 0.0))
+        return mean
+
+
+def _detect_edges(times, values, on_threshold, off_threshold, refractory, state, last_edge_time):
+    """
+    Hysteresis + refractory pass over one packet of one channel, with the semantics of the
+    per-sample loop: a sample switches ON if it is above on_threshold, OFF if it is at or below
+    off_threshold, and only once more than `refractory` seconds have passed since the last edge.
+    Returns (indices, state, last_edge_time): the accepted edges alternate from `state`.
+    """
+    n = values.size
+
+    #---- Samples that would switch each way; the refractory pass only walks those
+    candidates = (np.flatnonzero(values > on_threshold), np.flatnonzero(values <= off_threshold))
+    edges = []
+    while True:
+        start = int(np.searchsorted(times, last_edge_time + refractory, side='right'))
+        if start >= n:
+            break
+        switching = candidates[1 if state else 0]
+        k = np.searchsorted(switching, start)
+        if k >= switching.size:
+            break
+        i = int(switching[k])
+        state = not state
+        last_edge_time = times[i]
+        edges.append(i)
+
+    return np.asarray(edges, dtype=np.intp), state, last_edge_time
+
+
+def _edge_states(first_state, count):
+    """States of `count` alternating edges, the first one switching away from first_state"""
+    return (np.arange(count) % 2 == 0) != bool(first_state)
+
+
+class ThresholdDetector:
+    """
+    Hysteresis threshold with a refractory period, evaluated one packet at a time.
+
+    The output switches ON when a sample goes above on_threshold and OFF when a sample goes
+    back to off_threshold or below. After every switch no sample can switch for `refractory`
+    seconds of sample time; a crossing inside that window is dropped, and the next switch is
+    the first sample after it that is beyond the opposite threshold. If the signal is still
+    beyond it when the window ends, that first sample switches, so the edge timestamp can be
+    up to `refractory` later than the crossing. State is carried across packets.
+    """
+
+    def __init__(self, on_threshold, off_threshold=None, refractory=0.05):
+        self.on_threshold = on_threshold
+        self.off_threshold = on_threshold if off_threshold is None else off_threshold
+        self.refractory = refractory
+        self.reset()
+
+    def reset(self):
+        self.state = False
+        self.last_edge_time = -np.inf
+
+    def process(self, times, values):
+        """
+        Run the detector over one packet.
+        Returns (indices, timestamps, states) of the accepted edges; states are True for ON.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0), np.empty(0, dtype=bool)
+
+        first_state = self.state
+        indices, self.state, self.last_edge_time = _detect_edges(
+            times, values, self.on_threshold, self.off_threshold, self.refractory, self.state, self.last_edge_time)
+        return indices, times[indices], _edge_states(first_state, indices.size)
+
+
+class DetectorBank:
+    """
+    ThresholdDetectors of all EMG channels in one table.
+
+    Each channel (row c) has its own ON/OFF thresholds, refractory period, state and last edge
+    time, held in NumPy arrays, so channels never share a state or race on the refractory
+    timer. process(c, ...) runs the same vectorized pass as ThresholdDetector on row c.
+    mask is the bitmask of the channels currently ON (bit c = channel c).
+    """
+
+    def __init__(self, on_thresholds, hysteresis=0.1, refractory=0.05):
+        """
+        on_thresholds : ON threshold of every channel (envelope units)
+        hysteresis    : the OFF threshold is (1 - hysteresis) * ON; scalar or per channel
+        refractory    : seconds; scalar or per channel
+        """
+        self.on_thresholds = np.asarray(on_thresholds, dtype=np.float64).copy()
+        n = self.on_thresholds.size
+        self.off_thresholds = self.on_thresholds * (1.0 - np.broadcast_to(np.asarray(hysteresis, dtype=np.float64), n))
+        self.refractory = np.broadcast_to(np.asarray(refractory, dtype=np.float64), n).copy()
+        self.reset()
+
+    def __len__(self):
+        return self.on_thresholds.size
+
+    def reset(self):
+        self.states = np.zeros(len(self), dtype=bool)
+        self.last_edge_times = np.full(len(self), -np.inf)
+
+    @property
+    def mask(self):
+        return int(np.dot(self.states, 1 << np.arange(len(self), dtype=np.int64)))
+
+    def process(self, c, times, values):
+        """
+        Run the detector of channel c over one of its packets.
+        Returns (indices, timestamps, states) of the accepted edges; states are True for ON.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0), np.empty(0, dtype=bool)
+
+        first_state = self.states[c]
+        indices, state, last_edge_time = _detect_edges(
+            times, values, self.on_thresholds[c], self.off_thresholds[c], self.refractory[c],
+            bool(first_state), self.last_edge_times[c])
+        self.states[c] = state
+        self.last_edge_times[c] = last_edge_time
+        return indices, times[indices], _edge_states(first_state, indices.size)
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles with a bounded relative error (log-spaced histogram, DDSketch style).
+
+    Memory is a fixed array of bucket counters regardless of how many samples are added,
+    and a whole packet is added with one bincount. Values at or below min_value share a
+    single bucket; values above max_value are clamped into the last one.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6, max_value=1e3):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.min_value = min_value
+        self._offset = int(np.floor(np.log(min_value) / self._log_gamma)) - 1
+        n_buckets = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._offset + 1
+        self.counts = np.zeros(n_buckets, dtype=np.int64)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        index = np.zeros(values.size, dtype=np.intp)
+        positive = values > self.min_value
+        index[positive] = np.ceil(np.log(values[positive]) / self._log_gamma).astype(np.intp) - self._offset
+        np.clip(index, 0, self.counts.size - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.counts.size)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank, side='right'))
+        if bucket == 0:
+            return self.min
+        # Bucket i holds (gamma^(i-1), gamma^i]; its centre has relative error <= relative_accuracy
+        value = 2.0 * self.gamma ** (bucket + self._offset) / (self.gamma + 1.0)
+        return min(max(value, self.min), self.max)
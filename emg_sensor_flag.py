@@ -1,28 +1,26 @@
 # Import necessary modules
 import asyncio
-import csv
 from collections import defaultdict
+import argparse
 import keyboard
-import os
 import time
 
 from Python.AeroPy.TrignoBase import TrignoBase
 from Python.AeroPy.DataManager import DataKernel
-import matplotlib as mpl
-
-def write_state_to_file(state):
-    file_path = "emg_state.txt"
-    try:
-        with open(file_path, "w") as f:
-            f.write(str(state))
-    except IOError as e:
-        print(f"Errore nella scrittura del file: {e}")
+from Python.AeroPy.Acquisition import KeyWatcher, YTPoller
+from Python.AeroPy.ChannelRouting import build_routing_table, guids_by_type
+from emg_channel import EmgEventWriter
+from emg_session import SessionRecorder, new_seed
+from emg_socket import EmgEventServer
+from emg_control import ControlMap, parse_binding
+from emg_processing import DetectorBank, EnvelopeFilter, QuantileSketch, yt_packet_to_arrays
+import emg_calibration
 
 # -----------------------------------
 # Main class for managing Trigno sensors
 # -----------------------------------
 class TrignoRecorder:
-    def __init__(self, host, max_amp):
+    def __init__(self, host, max_amp, subject=None, calibration_seconds=5.0, recalibrate=False, record_path=None, bindings=None):
         self.HOST = host
 
         # Desired configuration for sensors
@@ -30,16 +28,39 @@ class TrignoRecorder:
 
         self.base = None
         self.guids = defaultdict(list)
+        self.routes = {}            # GUID -> ChannelRoute (tipo, indice, frequenza, coda)
         self.queues = {dtype: asyncio.Queue() for dtype in ['EMG', 'IMP']}
 
         self.recorded_data_dicts = []
         self.sensor_info_dicts = []
+        self.envelopes = {}         # GUID -> EnvelopeFilter (stato dei filtri tra un pacchetto e l'altro)
+        self.channel_keys = {}      # GUID -> chiave stabile del canale usata nei profili di calibrazione
+        self.thresholds = {}        # GUID -> soglia assoluta sull'inviluppo (dal profilo del soggetto)
 
         # --- Variabili nuove ---
-        self.max_amp = max_amp      # valore massimo globale calcolato da script 2
-        self.switch = False         # variabile di stato
-        self.last_switch_time = 0   # timestamp ultimo switch
-        self.switch_delay = 0.05    # 50 ms minimo tra switch
+        self.max_amp = max_amp      # valore massimo dell'inviluppo usato per i canali non calibrati
+        self.switch_delay = 0.05    # 50 ms minimo tra due switch dello stesso canale
+        self.hysteresis = 0.1       # lo switch OFF scatta sotto il 90% della soglia
+        self.envelope_band = (20.0, 450.0)  # passa-banda prima della rettificazione (Hz)
+        self.envelope_window = 0.05         # finestra RMS dell'inviluppo (s)
+        self.threshold_fraction = 0.6       # soglia = 60% dell'MVC (o di max_amp)
+
+        # --- Detector per canale e comandi del gioco ---
+        self.detectors = None       # DetectorBank: soglie, isteresi, refrattarieta' e stato di ogni canale EMG
+        self.bindings = bindings    # combinazioni di canali -> azioni ('pause=0+1'); None = ogni canale salta
+        self.controls = None        # ControlMap costruita sulle combinazioni
+
+        # --- Calibrazione MVC ---
+        self.subject = subject                          # profilo caricato/salvato in profiles/<subject>.json
+        self.calibration_seconds = calibration_seconds  # durata della contrazione massima
+        self.recalibrate = recalibrate                  # ignora il profilo salvato e ricalibra
+
+        # --- Registrazione della sessione (emg_session.py) ---
+        self.seed = new_seed()          # seed dei tubi pubblicato sul canale: partite riproducibili
+        self.record_path = record_path  # file di log di inviluppi e fronti (None = nessuna registrazione)
+        self.session = None
+        self.state_channel = EmgEventWriter(seed=self.seed)  # canale in memoria condivisa (emg_channel.py)
+        self.event_server = EmgEventServer(seed=self.seed)   # fronti inviati a my_flappy.py e agli altri iscritti
 
     # Set up Trigno base interface
     def setup_base(self):
@@ -57,69 +78,173 @@ class TrignoRecorder:
                 ch_type = str(channel.Type)
                 info_dict = {"Sensor": str(sensor.Id), "Channel": str(channel.Name), "GUID": str(channel.Id), "DataType": ch_type}
                 self.sensor_info_dicts.append(info_dict)
+                self.channel_keys[channel.Id] = emg_calibration.channel_key(sensor, channel)
 
-                if ch_type in self.guids:
-                    self.guids[ch_type].append(channel.Id)
-                if ch_type in self.queues:
-                    self.guids[ch_type].append(channel.Id)
+        # Routing table built once: dispatch is a single lookup per GUID
+        self.routes = build_routing_table(sensors, self.queues)
+        self.guids.update(guids_by_type(self.routes))
 
         return sensors
 
+    # Streaming envelope filter of an EMG channel, created on its first packet
+    def envelope_filter(self, guid):
+        envelope = self.envelopes.get(guid)
+        if envelope is None:
+            envelope = EnvelopeFilter(self.routes[guid].sample_rate, self.envelope_band, self.envelope_window)
+            self.envelopes[guid] = envelope
+        return envelope
+
+    # Absolute envelope threshold of a channel: from the subject profile, else from max_amp
+    def channel_threshold(self, guid):
+        return self.thresholds.get(guid, self.threshold_fraction * self.max_amp)
+
+    # Per-channel detector table (row = channel index) and channel combinations -> game actions
+    def setup_detectors(self):
+        emg_guids = self.guids["EMG"]
+        if self.detectors is not None or not emg_guids:
+            return
+        self.detectors = DetectorBank([self.channel_threshold(guid) for guid in emg_guids],
+                                      self.hysteresis, self.switch_delay)
+        self.controls = ControlMap(len(emg_guids), self.bindings)
+        print("Comandi: " + ", ".join(self.controls.specs()))
+
+    # Record a maximum contraction and build the subject threshold profile
+    async def calibrate(self):
+        print(f"Calibrazione MVC: premi 'c' e contrai al massimo per {self.calibration_seconds:.0f} secondi...")
+        await asyncio.to_thread(keyboard.wait, 'c')
+
+        emg_guids = set(self.guids["EMG"])
+        sketches = {guid: QuantileSketch() for guid in emg_guids}
+
+        def add_batch(yt_data, t_poll):
+            for guid, data in yt_data.items():
+                if guid in emg_guids:
+                    times, values = yt_packet_to_arrays(data)
+                    sketches[guid].add(self.envelope_filter(guid).process(values))
+
+        self.base.TrigBase.Start(ytdata=True)
+        poller = self.start_poller(add_batch)
+        await asyncio.sleep(self.calibration_seconds)
+        poller.stop()
+        self.base.TrigBase.Stop()
+
+        # The recording starts from a fresh filter state
+        for envelope in self.envelopes.values():
+            envelope.reset()
+
+        profile = emg_calibration.build_profile(
+            self.subject,
+            {self.channel_keys[guid]: sketch for guid, sketch in sketches.items()},
+            self.calibration_seconds,
+            self.threshold_fraction)
+        path = emg_calibration.save_profile(profile)
+        print(f"Profilo di calibrazione salvato in {path}")
+        return profile
+
+    # Load the subject profile (calibrating first if needed) into self.thresholds
+    async def load_thresholds(self):
+        if self.subject is None:
+            print(f"Nessun soggetto indicato: soglia {self.threshold_fraction} * max_amp = {self.threshold_fraction * self.max_amp:.4f}")
+            return
+
+        profile = None if self.recalibrate else emg_calibration.load_profile(self.subject)
+        if profile is None:
+            profile = await self.calibrate()
+
+        channels = profile["channels"]
+        for guid in self.guids["EMG"]:
+            entry = channels.get(self.channel_keys[guid])
+            if entry is None:
+                print(f"Canale {self.channel_keys[guid]} non calibrato: uso max_amp")
+                continue
+            self.thresholds[guid] = entry["threshold"]
+            print(f"Soglia {self.channel_keys[guid]}: {entry['threshold']:.4f} (MVC {entry['mvc']:.4f})")
+
     # Process a queue for a specific sensor type
     async def process_queue(self, dtype):
         queue = self.queues[dtype]
-        self.switch = False
-        self.last_switch_time = time.time()
-        write_state_to_file(self.switch)
+        if dtype == "EMG":
+            self.setup_detectors()
+            self.state_channel.publish(False)
+            self.event_server.publish(False)
 
         while True:
             guid, data = await queue.get()
+            if dtype != "EMG":
+                continue
+
+            # Un pacchetto intero alla volta: inviluppo, soglia, isteresi e refrattarieta' vettorizzate,
+            # con la riga del canale nella tabella dei detector
+            times, values = yt_packet_to_arrays(data)
+            channel = self.routes[guid].index
+            envelope = self.envelope_filter(guid).process(values)
+            if self.session is not None:
+                self.session.envelope(guid, times, envelope, self.routes[guid].sample_rate)
+            indices, edge_times, edge_states = self.detectors.process(channel, times, envelope)
+            if indices.size == 0:
+                continue
+
             current_time = time.time()
-            soglia = 0.6 * self.max_amp
-
-            for sample in data:
-                record = {
-                    "sensor_type": dtype,
-                    "channel_guid": guid,
-                    "time_stamp": sample.Item1,
-                    "value": sample.Item2
-                }
-                if dtype == "EMG":
-                    value = float(record["value"])
-                    
-                    # SWITCH ON
-                    if value > soglia and not self.switch and (current_time - self.last_switch_time > self.switch_delay):
-                        self.switch = True
-                        self.last_switch_time = current_time
-                        write_state_to_file(self.switch) # Aggiorna il file
-                        print(f"[SWITCH ON] EMG {guid} ha superato soglia {soglia:.4f}")
-
-                    # SWITCH OFF
-                    elif value <= soglia and self.switch and (current_time - self.last_switch_time > self.switch_delay):
-                        self.switch = False
-                        self.last_switch_time = current_time
-                        write_state_to_file(self.switch) # Aggiorna il file
-                        print(f"[SWITCH OFF]")
+            for edge_time, state in zip(edge_times, edge_states):
+                # La combinazione dei canali attivi decide l'azione pubblicata per il gioco
+                for action, level in self.controls.feed(channel, state):
+                    self.state_channel.publish(level, current_time, channel, action)
+                    self.event_server.publish(level, current_time, channel, action)
+                if self.session is not None:
+                    self.session.edge(edge_time, channel, bool(state))
+                if state:
+                    print(f"[SWITCH ON] EMG {channel} ha superato soglia {self.detectors.on_thresholds[channel]:.4f} (t = {edge_time:.4f} s)")
+                else:
+                    print(f"[SWITCH OFF] EMG {channel} (t = {edge_time:.4f} s)")
+
+
+    # Acquisition thread that delivers every PollYTData batch to on_batch on the event loop
+    def start_poller(self, on_batch):
+        sample_rate = max((route.sample_rate for route in self.routes.values()), default=2148.0)
+        poller = YTPoller(self.base.TrigBase, asyncio.get_running_loop(), on_batch, sample_rate)
+        poller.start()
+        return poller
+
+    # Route one PollYTData batch to the queues (runs on the event loop)
+    def dispatch(self, yt_data, t_poll):
+        routes = self.routes
+        for guid, data in yt_data.items():
+            route = routes.get(guid)
+            if route is not None:
+                route.target.put_nowait((guid, data))
 
+    # Open the session log: envelopes and edges, with what is needed to replay the games
+    def start_session(self):
+        if self.record_path is None:
+            return
+        metadata = {
+            "subject": self.subject,
+            "host": self.HOST,
+            "channels": {str(guid): self.routes[guid].index for guid in self.guids["EMG"]},
+            "thresholds": {str(guid): self.channel_threshold(guid) for guid in self.guids["EMG"]},
+            "hysteresis": self.hysteresis,
+            "switch_delay": self.switch_delay,
+            "bindings": self.controls.specs() if self.controls is not None else None,
+            "sensors": self.sensor_info_dicts,
+        }
+        self.session = SessionRecorder(self.record_path, self.seed, metadata)
+        print(f"Sessione registrata in {self.record_path} (seed {self.seed})")
 
     # Start recording sensor data
     async def record(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+
         self.base.TrigBase.Start(ytdata=True)
+        poller = self.start_poller(self.dispatch)
+        watcher = KeyWatcher('q', lambda: loop.call_soon_threadsafe(stop.set))
+        watcher.start()
         print("Recording started. Press 'q' to stop.")
 
-        while True:
-            if await asyncio.to_thread(keyboard.is_pressed, 'q'):
-                print("Stopping recording.")
-                break
-
-            if self.base.TrigBase.CheckYTDataQueue():
-                yt_data = self.base.TrigBase.PollYTData()
-                for guid, data in yt_data.items():
-                    for dtype, guids in self.guids.items():
-                        if guid in guids:
-                            await self.queues[dtype].put((guid, data))
-
-            await asyncio.sleep(0.001)
+        await stop.wait()
+        print("Stopping recording.")
+        watcher.stop()
+        poller.stop()
 
         self.base.TrigBase.Stop()
         self.base.TrigBase.ResetPipeline()
@@ -131,10 +256,14 @@ class TrignoRecorder:
         self.base.Connect_Callback()
         self.configure_sensors()
         self.base.TrigBase.Configure(start_trigger=False, stop_trigger=False)
+        await self.load_thresholds()
+        self.setup_detectors()
 
         print("Press 's' to start recording...")
         await asyncio.to_thread(keyboard.wait, 's')
 
+        self.start_session()
+
         # Start background tasks
         workers = [asyncio.create_task(self.process_queue(dtype)) for dtype in self.queues.keys()]
         await self.record()
@@ -146,15 +275,30 @@ class TrignoRecorder:
                 await w
             except asyncio.CancelledError:
                 pass
-        
-    
+
+        self.state_channel.publish(False)
+        self.state_channel.close()
+        self.event_server.publish(False)
+        self.event_server.close()
+        if self.session is not None:
+            self.session.close()
+
 
 # -----------------------------------
 # Entry point
 # -----------------------------------
 
 if __name__ == "__main__":
-    max_amp_calcolato = 0.4
+    parser = argparse.ArgumentParser(description="Flag EMG per my_flappy.py")
+    parser.add_argument("--subject", help="soggetto: carica (o crea) profiles/<subject>.json")
+    parser.add_argument("--calibrate", action="store_true", help="ripete la calibrazione MVC anche se il profilo esiste")
+    parser.add_argument("--mvc-seconds", type=float, default=5.0, help="durata della contrazione massima (s)")
+    parser.add_argument("--max-amp", type=float, default=0.4, help="valore massimo dell'inviluppo senza profilo")
+    parser.add_argument("--record", metavar="FILE", help="registra inviluppi e fronti per il replay (emg_session.py)")
+    parser.add_argument("--bind", metavar="AZIONE=CANALI", action="append", type=parse_binding,
+                        help="combinazione di canali per un'azione del gioco (jump, pause, restart), es. --bind pause=0+1; ripetibile")
+    args = parser.parse_args()
 
-    asyncio.run(TrignoRecorder("192.168.0.156", max_amp_calcolato).run())
+    asyncio.run(TrignoRecorder("192.168.0.156", args.max_amp, args.subject, args.mvc_seconds, args.calibrate,
+                               args.record, args.bind).run())
 
@@ -0,0 +1,259 @@
+"""
+Record and replay of EMG sessions.
+
+emg_sensor_flag.py --record <file> logs, while the game is being played:
+    - the envelope of every EMG channel, in the units the detector compares with the thresholds,
+      with its sample timestamps
+    - every trigger edge of every channel, at the timestamp of the sample that triggered it
+    - the session metadata: subject, ON threshold of every channel (by GUID), hysteresis,
+      refractory period (switch_delay), channel indices, the channel combination ->
+      action bindings (emg_control.py) and the game seed, which the sensor also publishes on
+      the channel so my_flappy.py plays on a reproducible pipe layout
+
+The log is a recording file (Python/AeroPy/RecordingFile.py: CRC-checked blocks, readable even
+if the sensor crashed). Envelopes are stored as channels of type ENV keyed by GUID, edges as one
+EDGE channel per EMG channel (value 1.0 = ON, 0.0 = OFF). Both are on the sample clock of the
+base station, so the edges line up with the envelopes that caused them and the spacing between
+edges is the one in the signal, without the jitter of the acquisition loop; the session starts
+at the first envelope sample. On replay the channel edges go through the recorded bindings
+again, giving the same game actions.
+
+Replay, through the same input interface as the live sensor:
+    python emg_session.py replay session.emgrec              publish the edges as the sensor does (real time)
+    python my_flappy.py --replay session.emgrec              read the edges in-process (real time)
+    python emg_session.py run session.emgrec                 headless game, as fast as possible
+    python emg_session.py edges session.emgrec > edges.csv   jump timestamp,state lines (flappy_sim.py --edges)
+
+The game seed makes the sequence of pipe heights of every game the same as in the recorded
+session. The live games are not reproduced exactly: the log does not hold when the game process
+started or restarted, so the phase of the pipe spawn timer and the frame each edge fell in can
+differ, and so can the scores. The headless run is deterministic (step 0 is the session start,
+the same log always gives the same result), which makes it a benchmark of a recorded input,
+not a replay of the recorded scores.
+"""
+import argparse
+import random
+import sys
+import time
+
+from Python.AeroPy.Recording import RecordingBuffer
+from Python.AeroPy.RecordingFile import RecordingReader, RecordingWriter
+import numpy as np
+
+from emg_channel import ACTION_JUMP, ACTION_PAUSE, ACTION_RESTART, EmgEvent, EmgEventWriter
+from emg_control import ControlMap
+from emg_socket import EmgEventServer
+import flappy_sim
+
+ENVELOPE = "ENV"
+EDGE = "EDGE"
+
+
+def new_seed():
+    """Game seed for a new session (never 0, which means "no seed" on the channel)"""
+    return random.SystemRandom().randrange(1, 2 ** 32)
+
+
+class SessionRecorder:
+    """Logs envelopes and trigger edges of a live session; the file is written in the background"""
+
+    def __init__(self, path, seed, metadata=None):
+        self.path = path
+        self.seed = seed
+        self.created = time.time()
+        self.recording = RecordingBuffer()
+        info = dict(metadata or {})
+        info.update(seed=seed, created=self.created)
+        self.writer = RecordingWriter(path, self.recording, metadata=info)
+        self.writer.start()
+
+    def envelope(self, guid, times, values, sample_rate=None):
+        """Append one packet of the envelope of a channel (raw: the thresholds are in the metadata)"""
+        key = str(guid)
+        if sample_rate is not None and key not in self.recording.channels:
+            self.recording.add_channel(key, ENVELOPE, sample_rate)
+        self.recording.append(key, ENVELOPE, times, values)
+
+    def edge(self, timestamp, channel, state):
+        """Log an edge of a channel at the sample time it was detected at (DetectorBank.process)"""
+        self.recording.append(f"edges/{channel}", EDGE, [timestamp], [1.0 if state else 0.0])
+
+    def close(self):
+        self.writer.close()
+
+
+class SessionLog:
+    """
+    A recorded session: metadata, envelopes, channel edges (edges) and the game actions they
+    map to with the recorded bindings (events, as published on the channel)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = RecordingReader(path)
+        self.metadata = self.reader.metadata or {}
+        self.seed = self.metadata.get("seed")
+        self.complete = self.reader.complete
+
+        edges = []
+        for index, info in enumerate(self.reader.channels):
+            if info["dtype"] == EDGE:
+                channel = int(info["guid"].split("/", 1)[1])
+                times, values = self.reader.read_channel(index)
+                edges.extend((float(t), channel, bool(v)) for t, v in zip(times, values))
+        edges.sort(key=lambda edge: edge[0])
+        self.edges = [EmgEvent(seq, t, channel, state) for seq, (t, channel, state) in enumerate(edges, 1)]
+        # Session start on the sample clock: the first envelope sample (the first edge without envelopes)
+        starts = [self.reader.first_time(index) for index, info in enumerate(self.reader.channels)
+                  if info["dtype"] == ENVELOPE]
+        starts = [t for t in starts if t is not None]
+        self.start = min(starts) if starts else (self.edges[0].timestamp if self.edges else 0.)
+
+        channels = len(self.metadata.get("channels") or {}) or max((e.channel for e in self.edges), default=0) + 1
+        controls = ControlMap(channels, self.metadata.get("bindings"))
+        self.events = []
+        for edge in self.edges:
+            for action, state in controls.feed(edge.channel, edge.state):
+                self.events.append(EmgEvent(len(self.events) + 1, edge.timestamp, edge.channel, state, action))
+
+    def jumps(self):
+        """(timestamp, state) of the jump level edges"""
+        return [(e.timestamp, e.state) for e in self.events if e.action == ACTION_JUMP]
+
+    @property
+    def duration(self):
+        return self.edges[-1].timestamp - self.start if self.edges else 0.
+
+    def envelopes(self):
+        """Return {GUID string: (times, values)} of the recorded envelopes"""
+        return {info["guid"]: self.reader.read_channel(index)
+                for index, info in enumerate(self.reader.channels) if info["dtype"] == ENVELOPE}
+
+
+class ReplayReader:
+    """
+    Drop-in replacement of EmgEventReader that plays the events of a SessionLog in real time
+    from the first poll() on, with timestamps moved to the current clock.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.seed = log.seed
+        self._next = 0
+        self._t0 = None
+        self._state = False
+
+    def poll(self):
+        now = time.time()
+        if self._t0 is None:
+            self._t0 = now
+        events = []
+        recorded = self.log.events
+        while self._next < len(recorded):
+            event = recorded[self._next]
+            t = self._t0 + (event.timestamp - self.log.start)
+            if t > now:
+                break
+            events.append(event._replace(timestamp=t))
+            if event.action == ACTION_JUMP:
+                self._state = event.state
+            self._next += 1
+        return events
+
+    @property
+    def finished(self):
+        return self._next >= len(self.log.events)
+
+    @property
+    def state(self):
+        return self._state
+
+    def close(self):
+        pass
+
+
+def publish_replay(log, writers=None):
+    """
+    Publish the events of a session as the live sensor would: on the shared-memory channel and
+    to the subscribers of the event server
+    """
+    writers = writers or [EmgEventWriter(seed=log.seed or 0), EmgEventServer(seed=log.seed or 0)]
+    reader = ReplayReader(log)
+    try:
+        for writer in writers:
+            writer.publish(False)
+        while not reader.finished:
+            for event in reader.poll():
+                for writer in writers:
+                    writer.publish(event.state, event.timestamp, event.channel, event.action)
+            time.sleep(0.001)
+    finally:
+        for writer in writers:
+            writer.publish(False)
+            writer.close()
+
+
+def run_headless(log, difficulty=None):
+    """
+    Play the session events in FlappySim as fast as possible, step 0 being the session start.
+    As in my_flappy.py, the game does not step while paused and a restart applies before the
+    step it falls in. The pipe heights follow the recorded seed, but the spawn timer is not
+    aligned to the live game, so the scores are those of this run, not of the session.
+    Returns (scores of the finished games, steps, seconds taken).
+    """
+    sim = flappy_sim.FlappySim(seed=log.seed, difficulty=difficulty)
+    step_rate = sim.difficulty.step_rate
+    steps = int(log.duration * step_rate) + 1
+    flaps = flappy_sim.triggers_from_edges(log.jumps(), steps, step_rate, log.start)
+
+    pulses = {ACTION_PAUSE: np.zeros(steps, dtype=np.int64), ACTION_RESTART: np.zeros(steps, dtype=np.int64)}
+    for event in log.events:
+        if event.action in pulses and event.state:
+            np.add.at(pulses[event.action], min(max(int((event.timestamp - log.start) * step_rate), 0), steps - 1), 1)
+    paused = np.cumsum(pulses[ACTION_PAUSE]) % 2 == 1
+    restarts = pulses[ACTION_RESTART] > 0
+
+    scores = []
+    t = time.perf_counter()
+    for flap, pause, restart in zip(flaps, paused, restarts):
+        if restart:
+            sim.restart()
+        if pause:
+            continue
+        if flap:
+            sim.flap(flappy_sim.EMG_JUMP)
+        if sim.step():
+            scores.append(sim.score)
+    return scores, steps, time.perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay of recorded EMG sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay", help="publish the recorded edges on the shared-memory channel")
+    replay.add_argument("log")
+    run = commands.add_parser("run", help="headless game on the recorded edges")
+    run.add_argument("log")
+    edges = commands.add_parser("edges", help="print the jump edges as timestamp,state lines")
+    edges.add_argument("log")
+    args = parser.parse_args()
+
+    log = SessionLog(args.log)
+    if not log.complete:
+        print(f"{args.log}: sessione interrotta, recuperati {len(log.edges)} fronti", file=sys.stderr)
+
+    if args.command == "replay":
+        print(f"Replay di {len(log.events)} eventi ({log.duration:.1f} s, seed {log.seed})")
+        publish_replay(log)
+    elif args.command == "run":
+        scores, steps, elapsed = run_headless(log)
+        print(f"seed {log.seed}: {len(scores)} partite, punteggi {scores}")
+        print(f"{steps} passi in {elapsed:.3f} s ({steps / max(elapsed, 1e-9):.0f} passi/s)")
+    else:
+        print("timestamp,state")
+        for timestamp, state in log.jumps():
+            print(f"{timestamp:.6f},{int(state)}")
+
+
+if __name__ == "__main__":
+    main()
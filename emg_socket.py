@@ -0,0 +1,233 @@
+"""
+Datagram event endpoint between emg_sensor_flag.py (server) and any number of consumers
+(my_flappy.py, loggers, dashboards), next to the shared-memory ring of emg_channel.py.
+
+The server pushes every trigger edge to its subscribers as one small datagram as soon as it is
+published, so a consumer learns about an edge without reading a file: it drains a non-blocking
+socket, and my_flappy.py turns each edge into a pygame event. Delivery on the same machine takes
+a few tens of microseconds.
+
+Transport: a Unix datagram socket (EMG_SOCKET_FILE) on POSIX, UDP on 127.0.0.1 on Windows, where
+Unix datagram sockets are not available. An address is a path (Unix) or a (host, port) tuple.
+
+Protocol (little endian), every datagram starts with magic b"EMGS" (4s), kind (B), padding (3x):
+    SUBSCRIBE   client -> server, no payload; repeated every RESUBSCRIBE_INTERVAL as keep-alive
+    UNSUBSCRIBE client -> server, no payload
+    STATE       server -> client, reply to SUBSCRIBE: last seq (Q), game seed (I), jump level (B)
+    EVENT       server -> client: seq (Q), timestamp (d), channel (i), state (B), action (B)
+A subscriber that is not renewed within SUBSCRIBER_TIMEOUT, or whose socket is gone, is dropped.
+Datagrams can be lost when a consumer stops reading; the sequence numbers show the gaps (lost).
+"""
+import itertools
+import os
+import select
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+from emg_channel import ACTION_JUMP, EmgEvent
+
+EMG_SOCKET_FILE = "emg_events.sock"
+EMG_UDP_ADDRESS = ("127.0.0.1", 47800)
+DEFAULT_ADDRESS = EMG_SOCKET_FILE if os.name == "posix" else EMG_UDP_ADDRESS
+
+RESUBSCRIBE_INTERVAL = 1.0
+SUBSCRIBER_TIMEOUT = 5.0
+
+_MAGIC = b"EMGS"
+_HEADER = struct.Struct("<4sB3x")
+_STATE = struct.Struct("<QIB3x")
+_EVENT = struct.Struct("<QdiBB2x")
+SUBSCRIBE, UNSUBSCRIBE, STATE, EVENT = 1, 2, 3, 4
+
+_client_ids = itertools.count()
+
+
+def _family(address):
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class EmgEventServer:
+    """Publishes trigger edges to the subscribed consumers (same publish() as EmgEventWriter)"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, seed=0):
+        self.address = address
+        self.seed = seed
+        self._sock = socket.socket(_family(address), socket.SOCK_DGRAM)
+        if isinstance(address, str):
+            _unlink(address)  # left behind by a server that was not closed
+        self._sock.bind(address)
+        # Sends to a slow consumer must never block the sensor: the datagram is dropped instead
+        self._sock.setblocking(False)
+
+        self._subscribers = {}  # address -> expiry (time.monotonic())
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._state = False
+        self.dropped = 0        # datagrams not delivered to a subscriber
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="EmgEventServer", daemon=True)
+        self._thread.start()
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def _serve(self):
+        """Subscription requests, on a thread of their own"""
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._sock], [], [], 0.2)
+            if not readable:
+                continue
+            try:
+                data, peer = self._sock.recvfrom(64)
+            except OSError:
+                continue  # e.g. (UDP on Windows) the ICMP error of a datagram sent to a closed port
+            if len(data) < _HEADER.size or not peer:
+                continue
+            magic, kind = _HEADER.unpack_from(data)
+            if magic != _MAGIC:
+                continue
+            if kind == SUBSCRIBE:
+                # Under the lock, so no edge newer than the STATE reply reaches the peer before it
+                with self._lock:
+                    self._subscribers[peer] = time.monotonic() + SUBSCRIBER_TIMEOUT
+                    self._send(peer, _HEADER.pack(_MAGIC, STATE) + _STATE.pack(self._seq, self.seed, self._state))
+            elif kind == UNSUBSCRIBE:
+                with self._lock:
+                    self._subscribers.pop(peer, None)
+
+    def _send(self, peer, datagram):
+        try:
+            self._sock.sendto(datagram, peer)
+            return True
+        except BlockingIOError:
+            self.dropped += 1  # the consumer's queue is full: it keeps its subscription
+            return True
+        except OSError:
+            self.dropped += 1  # the consumer is gone
+            return False
+
+    def publish(self, state, timestamp=None, channel=0, action=ACTION_JUMP):
+        """Send an edge to every subscriber and return its sequence number"""
+        if timestamp is None:
+            timestamp = time.time()
+        now = time.monotonic()
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            if action == ACTION_JUMP:
+                self._state = bool(state)
+            subscribers = list(self._subscribers.items())
+        datagram = _HEADER.pack(_MAGIC, EVENT) + _EVENT.pack(seq, float(timestamp), int(channel), 1 if state else 0, action)
+
+        gone = [peer for peer, expiry in subscribers if expiry < now or not self._send(peer, datagram)]
+        if gone:
+            with self._lock:
+                for peer in gone:
+                    self._subscribers.pop(peer, None)
+        return seq
+
+    def close(self):
+        self._stop_event.set()
+        self._thread.join(timeout=1.0)
+        self._sock.close()
+        if isinstance(self.address, str):
+            _unlink(self.address)
+
+
+class EmgEventClient:
+    """
+    Non-blocking subscriber, with the interface of EmgEventReader: poll() once per frame
+    returns the edges received since the previous call. It (re)subscribes by itself, so the
+    server may start before or after it.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+        self._sock = socket.socket(_family(address), socket.SOCK_DGRAM)
+        if isinstance(address, str):
+            # A Unix datagram socket needs a name of its own to receive
+            self._path = os.path.join(tempfile.gettempdir(), f"emg_client_{os.getpid()}_{next(_client_ids)}.sock")
+            _unlink(self._path)
+            self._sock.bind(self._path)
+        else:
+            self._path = None
+            self._sock.bind((address[0], 0))
+        self._sock.setblocking(False)
+
+        self._last_seq = None
+        self._state = False
+        self._seed = None
+        self._next_subscribe = 0.0
+        self.lost = 0           # edges missed (gaps in the sequence numbers)
+
+    def _request(self, kind):
+        try:
+            self._sock.sendto(_HEADER.pack(_MAGIC, kind), self.address)
+        except OSError:
+            pass  # no server (yet)
+
+    def poll(self):
+        """Return the list of EmgEvent received since the previous call (usually empty)"""
+        now = time.monotonic()
+        if now >= self._next_subscribe:
+            self._next_subscribe = now + RESUBSCRIBE_INTERVAL
+            self._request(SUBSCRIBE)
+
+        events = []
+        while True:
+            try:
+                data = self._sock.recv(64)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break  # e.g. ICMP port unreachable (UDP on Windows) while the server is down
+            if len(data) < _HEADER.size:
+                continue
+            magic, kind = _HEADER.unpack_from(data)
+            if magic != _MAGIC:
+                continue
+
+            if kind == EVENT and len(data) >= _HEADER.size + _EVENT.size:
+                seq, timestamp, channel, state, action = _EVENT.unpack_from(data, _HEADER.size)
+                if self._last_seq is None or seq <= self._last_seq:
+                    continue  # published before the subscription was confirmed, or a duplicate
+                self.lost += seq - self._last_seq - 1
+                self._last_seq = seq
+                if action == ACTION_JUMP:
+                    self._state = bool(state)
+                events.append(EmgEvent(seq, timestamp, channel, bool(state), action))
+            elif kind == STATE and len(data) >= _HEADER.size + _STATE.size:
+                seq, seed, state = _STATE.unpack_from(data, _HEADER.size)
+                self._seed = seed or None
+                if self._last_seq is None or seq < self._last_seq:
+                    # First reply, or a restarted server: edges before it are history
+                    self._last_seq = seq
+                    self._state = bool(state)
+        return events
+
+    @property
+    def seed(self):
+        """Game seed published by the server, or None"""
+        return self._seed
+
+    @property
+    def state(self):
+        """Current level of the jump command"""
+        return self._state
+
+    def close(self):
+        self._request(UNSUBSCRIBE)
+        self._sock.close()
+        if self._path is not None:
+            _unlink(self._path)
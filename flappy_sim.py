@@ -0,0 +1,402 @@
+"""
+Game engine of my_flappy.py: bird, pipes, collisions, score and high scores, without pygame.
+
+The game advances in fixed steps of STEP seconds, whatever the render frame rate. my_flappy.py
+runs as many steps as the elapsed time requires, applies every input at the step it falls in
+and draws the state interpolated between the last two steps (alpha in [0, 1]). The per-step
+constants are the per-frame ones of the original loop (clock.tick(120 * GAME_SPEED_FACTOR)),
+so the game plays as before when rendering keeps up and at the same speed when it does not.
+
+Given a seed and the same inputs at the same steps, a game always unfolds the same way. With a
+seed, the pipe layout of the k-th game of a session depends only on (seed, k), so games of a
+recorded session can be compared one by one (emg_session.py).
+
+FlappySim is the single game played by my_flappy.py. BatchSim steps many games at once with
+NumPy, under the same rules, for headless runs much faster than real time: it replays scripted
+or recorded EMG trigger streams to tune the difficulty (pipe heights, gap, speed factor) in bulk.
+
+    python flappy_sim.py --games 10000 --seconds 60 --gap 400 --speed 0.5
+    python flappy_sim.py --edges session.csv --games 1000 --gap 350 450
+"""
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+GAME_SPEED_FACTOR = 0.5                 # VELOCITA' DEL GIOCO
+STEP_RATE = 120 * GAME_SPEED_FACTOR     # simulation steps per second
+STEP = 1.0 / STEP_RATE
+
+GRAVITY = 0.3
+KEY_JUMP = 9                            # salto con la barra spaziatrice
+EMG_JUMP = 6                            # QUANTO SALTARE con una contrazione
+SPAWN_INTERVAL = 1.5                    # secondi tra due coppie di tubi a GAME_SPEED_FACTOR = 1
+
+SCREEN_WIDTH = 576
+FLOOR_Y = 900
+CEILING_Y = -100
+BIRD_START = (100, 512)
+BIRD_SIZE = (68, 48)                    # bluebird-midflap.png x2
+PIPE_SIZE = (104, 640)                  # pipe-green.png x2
+PIPE_HEIGHTS = [400, 600, 800]
+PIPE_SPAWN_X = 700
+PIPE_GAP = 400                          # DISTANZA TRA TUBO SU E TUBO GIU'
+PIPE_EXIT_X = -50                       # i tubi spariscono quando il bordo destro passa di qui
+
+HIGH_SCORE_FILE = "highscores.txt"
+MAX_HIGH_SCORES = 10
+
+
+class HighScores:
+    """Best scores, highest first; kept in a text file (one score per line) unless path is None"""
+
+    def __init__(self, path=HIGH_SCORE_FILE, size=MAX_HIGH_SCORES):
+        self.path = path
+        self.size = size
+        self.scores = []
+        self.load()
+
+    def load(self):
+        self.scores = []
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r") as f:
+                scores = [int(line.strip()) for line in f if line.strip().isdigit()]
+                scores.sort(reverse=True)
+                self.scores = scores[:self.size]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Errore nel caricamento dei punteggi: {e}")
+
+    def save(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "w") as f:
+                for s in self.scores:
+                    f.write(f"{s}\n")
+        except Exception as e:
+            print(f"Errore nel salvataggio dei punteggi: {e}")
+
+    def update(self, new_score):
+        if new_score > 0:
+            self.scores.append(new_score)
+            self.scores.sort(reverse=True)
+            self.scores = self.scores[:self.size]
+            self.save()
+
+
+class Difficulty:
+    """Tunable parameters of a game and the per-step quantities derived from them"""
+
+    def __init__(self, pipe_heights=PIPE_HEIGHTS, pipe_gap=PIPE_GAP, speed_factor=GAME_SPEED_FACTOR):
+        self.pipe_heights = list(pipe_heights)
+        self.pipe_gap = pipe_gap
+        self.speed_factor = speed_factor
+        # The original loop ran 120 * speed_factor frames per second with pipes moving
+        # 5 * speed_factor per frame: the speed factor scales the pipes, not the bird
+        self.step_rate = 120 * speed_factor
+        self.pipe_speed = 5 * speed_factor
+        self.floor_speed = 1 * speed_factor
+        self.spawn_steps = max(1, round(SPAWN_INTERVAL / speed_factor * self.step_rate))
+
+
+class Pipe:
+    """One pipe; x is its center, top its upper edge, flipped is True for the pipes hanging from the top"""
+    __slots__ = ("x", "prev_x", "top", "flipped")
+
+    def __init__(self, x, top, flipped):
+        self.x = self.prev_x = x
+        self.top = top
+        self.flipped = flipped
+
+
+class FlappySim:
+    def __init__(self, seed=None, difficulty=None, bird_size=BIRD_SIZE, pipe_size=PIPE_SIZE):
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.games = 0
+        self.difficulty = difficulty or Difficulty()
+        self.bird_size = bird_size
+        self.pipe_size = pipe_size
+        self.active = False
+        self.steps = 0
+        self.score = 0
+        self.floor_x = self.prev_floor_x = 0.
+        self.pipes = []
+        self._place_bird()
+
+    def _place_bird(self):
+        self.bird_y = self.prev_bird_y = float(BIRD_START[1])
+        self.bird_movement = 0.
+
+    def restart(self):
+        # RIAVVIO (reset di tutto)
+        self.games += 1
+        if self.seed is not None:
+            self.random = random.Random(f"{self.seed}/{self.games}")
+        self.active = True
+        self.pipes = []
+        self.score = 0
+        self._place_bird()
+
+    def flap(self, strength):
+        """Jump input (KEY_JUMP or EMG_JUMP); on the game over screen it starts a new game"""
+        if self.active:
+            self.bird_movement = -strength
+        else:
+            self.restart()
+
+    def _spawn_pipes(self):
+        height = self.random.choice(self.difficulty.pipe_heights)
+        self.pipes.append(Pipe(PIPE_SPAWN_X, height, False))
+        self.pipes.append(Pipe(PIPE_SPAWN_X, height - self.difficulty.pipe_gap - self.pipe_size[1], True))
+
+    def _collides(self):
+        left, top, w, h = self.bird_rect()
+        for pipe in self.pipes:
+            pipe_left, pipe_top, pipe_w, pipe_h = self.pipe_rect(pipe)
+            if left < pipe_left + pipe_w and pipe_left < left + w and top < pipe_top + pipe_h and pipe_top < top + h:
+                return True
+        # condizione di "morte" se si colpisce il pavimento o si esce sopra
+        return top <= CEILING_Y or top + h >= FLOOR_Y
+
+    def step(self):
+        """Advance the game by one STEP; return True if the game ended during this step"""
+        d = self.difficulty
+        self.steps += 1
+        self.prev_bird_y = self.bird_y
+        self.prev_floor_x = self.floor_x
+        for pipe in self.pipes:
+            pipe.prev_x = pipe.x
+
+        # Il timer dei tubi gira sempre, i tubi compaiono solo durante la partita
+        if self.steps % d.spawn_steps == 0 and self.active:
+            self._spawn_pipes()
+            self.score += 1
+
+        if not self.active:
+            return False
+
+        self.bird_movement += GRAVITY
+        self.bird_y += self.bird_movement
+        ended = self._collides()
+        self.active = not ended
+
+        for pipe in self.pipes:
+            pipe.x -= d.pipe_speed
+        self.pipes = [pipe for pipe in self.pipes if pipe.x + self.pipe_size[0] / 2 > PIPE_EXIT_X]
+
+        if self.active:
+            self.floor_x -= d.floor_speed
+            if self.floor_x <= -SCREEN_WIDTH:
+                self.floor_x += SCREEN_WIDTH
+                self.prev_floor_x += SCREEN_WIDTH
+        return ended
+
+    # -- Geometry, interpolated between the previous step (alpha=0) and the last one (alpha=1) --
+    def bird_rect(self, alpha=1.):
+        """(left, top, width, height) of the bird"""
+        w, h = self.bird_size
+        y = self.prev_bird_y + (self.bird_y - self.prev_bird_y) * alpha
+        return BIRD_START[0] - w / 2, y - h / 2, w, h
+
+    def pipe_rect(self, pipe, alpha=1.):
+        w, h = self.pipe_size
+        x = pipe.prev_x + (pipe.x - pipe.prev_x) * alpha
+        return x - w / 2, pipe.top, w, h
+
+    def floor_pos(self, alpha=1.):
+        return self.prev_floor_x + (self.floor_x - self.prev_floor_x) * alpha
+
+
+class BatchSim:
+    """
+    n independent games stepped together, same rules as FlappySim (rendering state left out).
+
+    Every game holds at most `slots` pipe pairs, in a ring indexed by the spawn count; a pair
+    is free (x = nan) once it has left the screen. Per game statistics: deaths, best score and
+    steps played (active).
+    """
+
+    def __init__(self, n, seed=None, difficulty=None, bird_size=BIRD_SIZE, pipe_size=PIPE_SIZE):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.difficulty = d = difficulty or Difficulty()
+        self.bird_size = bird_size
+        self.pipe_size = pipe_size
+        self.steps = 0
+        self.spawns = 0
+
+        lifetime = (PIPE_SPAWN_X + pipe_size[0] / 2 - PIPE_EXIT_X) / d.pipe_speed
+        self.slots = math.ceil(lifetime / d.spawn_steps) + 1
+        self.pipe_x = np.full((n, self.slots), np.nan)
+        self.pipe_height = np.zeros((n, self.slots))  # top of the bottom pipe
+
+        self.active = np.zeros(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.bird_y = np.full(n, float(BIRD_START[1]))
+        self.bird_movement = np.zeros(n)
+
+        self.deaths = np.zeros(n, dtype=np.int64)
+        self.best = np.zeros(n, dtype=np.int64)
+        self.active_steps = np.zeros(n, dtype=np.int64)
+
+    def flap(self, mask, strength=EMG_JUMP):
+        """Jump in the games where mask is True; the ones on the game over screen restart"""
+        mask = np.asarray(mask, dtype=bool)
+        restart = mask & ~self.active
+        self.bird_movement[mask & self.active] = -strength
+        if restart.any():
+            self.active[restart] = True
+            self.pipe_x[restart] = np.nan
+            self.score[restart] = 0
+            self.bird_y[restart] = BIRD_START[1]
+            self.bird_movement[restart] = 0.
+
+    def step(self):
+        """Advance every game by one STEP; return the mask of the games that ended"""
+        d = self.difficulty
+        self.steps += 1
+        active = self.active
+
+        if self.steps % d.spawn_steps == 0:
+            slot = self.spawns % self.slots
+            self.spawns += 1
+            self.pipe_x[active, slot] = PIPE_SPAWN_X
+            self.pipe_height[active, slot] = self.rng.choice(d.pipe_heights, size=int(active.sum()))
+            self.score[active] += 1
+
+        # Adding 0 to the games on the game over screen leaves them unchanged, without masked copies
+        self.bird_movement += np.where(active, GRAVITY, 0.)
+        self.bird_y += np.where(active, self.bird_movement, 0.)
+
+        bird_w, bird_h = self.bird_size
+        pipe_w, pipe_h = self.pipe_size
+        left = BIRD_START[0] - bird_w / 2
+        top = (self.bird_y - bird_h / 2)[:, None]
+        bottom = top + bird_h
+        pipe_left = self.pipe_x - pipe_w / 2
+        overlap_x = (left < pipe_left + pipe_w) & (pipe_left < left + bird_w)  # False for free slots (nan)
+        upper = self.pipe_height - d.pipe_gap - pipe_h                            # top of the flipped pipe
+        hit = overlap_x & (((top < self.pipe_height + pipe_h) & (self.pipe_height < bottom)) |
+                           ((top < upper + pipe_h) & (upper < bottom)))
+        ended = active & (hit.any(axis=1) | (top[:, 0] <= CEILING_Y) | (bottom[:, 0] >= FLOOR_Y))
+
+        self.pipe_x -= np.where(active, d.pipe_speed, 0.)[:, None]
+        self.pipe_x[self.pipe_x + pipe_w / 2 <= PIPE_EXIT_X] = np.nan
+
+        self.active_steps += active
+        self.active = active & ~ended
+        self.deaths += ended
+        np.maximum(self.best, np.where(ended, self.score, 0), out=self.best)
+        return ended
+
+
+# -----------------------------------
+# Trigger streams
+# -----------------------------------
+def triggers_from_edges(edges, steps, step_rate=STEP_RATE, start=None):
+    """
+    Per-step flap mask of a recorded EMG edge stream [(timestamp, state), ...] (EmgEvent order).
+    As in my_flappy.py, a step flaps when an ON edge falls in it or the contraction is still held.
+    start is the time of step 0 (default: the first edge).
+    """
+    flaps = np.zeros(steps, dtype=bool)
+    edges = sorted((float(t), bool(state)) for t, state in edges)
+    if not edges:
+        return flaps
+    if start is None:
+        start = edges[0][0]
+    on_since = None
+    for t, state in edges:
+        k = max(int((t - start) * step_rate), 0)
+        if state:
+            if k < steps:
+                flaps[k] = True
+            if on_since is None:
+                on_since = k
+        elif on_since is not None:
+            flaps[on_since:min(k, steps)] = True
+            on_since = None
+    if on_since is not None:
+        flaps[on_since:] = True
+    return flaps
+
+
+def scripted_triggers(n, steps, rate=1.0, hold=0.05, step_rate=STEP_RATE, seed=None):
+    """(n, steps) flap masks of random contractions: `rate` per second, each held `hold` seconds"""
+    rng = np.random.default_rng(seed)
+    onsets = rng.random((n, steps)) < rate / step_rate
+    hold_steps = max(1, round(hold * step_rate))
+    flaps = onsets.copy()
+    for k in range(1, hold_steps):
+        flaps[:, k:] |= onsets[:, :-k]
+    return flaps
+
+
+def run_batch(triggers, n=None, seed=None, difficulty=None):
+    """
+    Replay flap masks, (steps,) shared by all games or (n, steps), in n headless games.
+    Every game starts on its first trigger, like a player on the start screen. Returns the BatchSim.
+    """
+    triggers = np.asarray(triggers, dtype=bool)
+    if triggers.ndim == 1:
+        triggers = np.broadcast_to(triggers, (n or 1, triggers.size))
+    sim = BatchSim(triggers.shape[0], seed=seed, difficulty=difficulty)
+    for k in range(triggers.shape[1]):
+        sim.flap(triggers[:, k])
+        sim.step()
+    return sim
+
+
+def read_edges(path):
+    """Read timestamp,state lines (e.g. EmgEvent fields exported from a session)"""
+    edges = []
+    with open(path) as f:
+        for line in f:
+            fields = line.strip().split(",")
+            try:
+                edges.append((float(fields[0]), fields[1].strip().lower() in ("1", "true", "on")))
+            except (ValueError, IndexError):
+                continue  # header or blank line
+    return edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless game runs for difficulty tuning")
+    parser.add_argument("--games", type=int, default=10000, help="games per difficulty")
+    parser.add_argument("--seconds", type=float, default=60., help="game time replayed per game")
+    parser.add_argument("--edges", help="recorded EMG edges (timestamp,state per line), shared by all games")
+    parser.add_argument("--rate", type=float, default=1.0, help="scripted contractions per second")
+    parser.add_argument("--hold", type=float, default=0.05, help="scripted contraction length (s)")
+    parser.add_argument("--gap", type=float, nargs="+", default=[PIPE_GAP])
+    parser.add_argument("--speed", type=float, nargs="+", default=[GAME_SPEED_FACTOR])
+    parser.add_argument("--heights", type=float, nargs="+", default=PIPE_HEIGHTS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    edges = read_edges(args.edges) if args.edges else None
+    print(f"{'gap':>6} {'speed':>6} {'deaths/game':>12} {'best':>6} {'p50 best':>9} {'games/s':>10}")
+    for speed in args.speed:
+        for gap in args.gap:
+            difficulty = Difficulty(args.heights, gap, speed)
+            steps = int(args.seconds * difficulty.step_rate)
+            if edges is not None:
+                triggers = triggers_from_edges(edges, steps, difficulty.step_rate)
+            else:
+                triggers = scripted_triggers(args.games, steps, args.rate, args.hold, difficulty.step_rate, args.seed)
+            t = time.perf_counter()
+            sim = run_batch(triggers, args.games, args.seed, difficulty)
+            elapsed = time.perf_counter() - t
+            best = np.maximum(sim.best, np.where(sim.active, sim.score, 0))
+            print(f"{gap:6g} {speed:6g} {sim.deaths.mean():12.2f} {best.max():6d} {np.median(best):9g} "
+                  f"{args.games / elapsed:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
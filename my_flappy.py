@@ -1,126 +1,90 @@
-import pygame, sys, random, os
-
-#TENERE LISTA GLOBALE PUNTEGGI MIGLIORI
-HIGH_SCORES = []
-HIGH_SCORE_FILE = "highscores.txt"
-MAX_HIGH_SCORES = 10
-
-def load_high_scores():
-    global HIGH_SCORES
-    try:
-        with open(HIGH_SCORE_FILE, "r") as f:
-            scores = [int(line.strip()) for line in f if line.strip().isdigit()]
-            scores.sort(reverse=True)
-            HIGH_SCORES = scores[:MAX_HIGH_SCORES]
-    except FileNotFoundError:
-        HIGH_SCORES = []
-    except Exception as e:
-        print(f"Errore nel caricamento dei punteggi: {e}")
-        HIGH_SCORES = []
-
-def save_high_scores():
-    try:
-        with open(HIGH_SCORE_FILE, "w") as f:
-            for s in HIGH_SCORES:
-                f.write(f"{s}\n")
-    except Exception as e:
-        print(f"Errore nel salvataggio dei punteggi: {e}")
-
-def update_high_scores(new_score):
-    global HIGH_SCORES
-    if new_score > 0:
-        HIGH_SCORES.append(new_score)
-        HIGH_SCORES.sort(reverse=True)
-        HIGH_SCORES = HIGH_SCORES[:MAX_HIGH_SCORES]
-        save_high_scores()
-        
-        
-        
-
-score = 0
-
-def read_emg_state_from_file():
-    file_path = "emg_state.txt"
-    if not os.path.exists(file_path):
-        return False 
-    try:
-        with open(file_path, "r") as f:
-            state_str = f.read().strip()
-            return state_str.lower() == "true"
-    except IOError as e:
-        print(f"Errore nella lettura del file: {e}")
-        return False
-
-def draw_floor():
-    screen.blit(floor_surface, (floor_x_pos, 900))
-    screen.blit(floor_surface, (floor_x_pos + 576, 900))
-
-def create_pipe():
-    random_pipe_pos = random.choice(pipe_height)
-    # DISTANZA TRA TUBI A DX E SX (700 POCO?)
-    bottom_pipe = pipe_surface.get_rect(midtop=(700, random_pipe_pos))
-    # DISTANZA TRA TUBO SU E TUBO GIU' A 400 PIXEL (MOLTO LONTANI)
-    top_pipe = pipe_surface.get_rect(midbottom=(700, random_pipe_pos - 400)) 
-    return bottom_pipe, top_pipe
-
-def move_pipes(pipes):
-    for pipe in pipes:
-        pipe.centerx -= 5 * game_speed_factor
-    visible_pipes = [pipe for pipe in pipes if pipe.right > -50]
-    return visible_pipes
-
-def draw_pipes(pipes):
-    for pipe in pipes:
-        if pipe.bottom >= 1024:
-            screen.blit(pipe_surface, pipe)
+import pygame, sys, os, time, argparse
+from functools import lru_cache
+
+from emg_channel import ACTION_JUMP, ACTION_PAUSE, ACTION_RESTART, EmgEventReader
+from emg_session import ReplayReader, SessionLog
+from emg_socket import EmgEventClient
+from flappy_sim import FlappySim, HighScores, STEP, STEP_RATE, KEY_JUMP, EMG_JUMP
+
+# SPRITE DISEGNATI NEL FRAME CORRENTE E IN QUELLO PRECEDENTE: (superficie, rettangolo)
+sprites = []
+last_sprites = []
+
+def draw(surface, pos):
+    # Registra lo sprite: viene disegnato da present() a fine frame
+    sprites.append((surface, pygame.Rect(pos[0], pos[1], *surface.get_size())))
+
+def present():
+    # AGGIORNA SOLO I RETTANGOLI SPORCHI: si ripristina lo sfondo dove c'erano gli sprite
+    # del frame precedente e si ridisegnano quelli nuovi. Se non cambia nulla (es. schermata
+    # di game over) non si tocca lo schermo.
+    global sprites, last_sprites
+    if sprites != last_sprites:
+        screen_rect = screen.get_rect()
+        dirty = [screen.blit(bg_surface, rect, rect) for rect in (r.clip(screen_rect) for _, r in last_sprites)]
+        dirty += [screen.blit(surface, rect) for surface, rect in sprites]
+        pygame.display.update(dirty)
+    last_sprites = sprites
+    sprites = []
+
+@lru_cache(maxsize=64)
+def render_text(text, color):
+    # CACHE LRU DELLE SCRITTE: ogni stringa (punteggio, classifica...) viene renderizzata una sola volta
+    return game_font.render(text, True, color)
+
+def draw_floor(alpha):
+    floor_x_pos = sim.floor_pos(alpha)
+    draw(floor_surface, (floor_x_pos, 900))
+    draw(floor_surface, (floor_x_pos + 576, 900))
+
+def draw_pipes(alpha):
+    for pipe in sim.pipes:
+        if pipe.flipped:
+            draw(flip_pipe_surface, sim.pipe_rect(pipe, alpha))
         else:
-            flip_pipe = pygame.transform.flip(pipe_surface, False, True)
-            screen.blit(flip_pipe, pipe)
-
-def check_collision(pipes):
-    for pipe in pipes:
-        if bird_rect.colliderect(pipe):
-            return False
-
-    #condizione di "morte" se si colpisce il pavimento (>= 900) o si esce sopra (<= -100)
-    if bird_rect.top <= -100 or bird_rect.bottom >= 900:
-        return False
-    return True
+            draw(pipe_surface, sim.pipe_rect(pipe, alpha))
 
 
 def display_game_over_screen():
-    game_over_text = game_font.render("GAME OVER", True, (255, 0, 0))
+    game_over_text = render_text("GAME OVER", (255, 0, 0))
     game_over_rect = game_over_text.get_rect(center=(288, 200))
-    screen.blit(game_over_text, game_over_rect)
+    draw(game_over_text, game_over_rect)
 
-    high_score_title = game_font.render("HIGHEST SCORES", True, (255, 255, 255))
+    high_score_title = render_text("HIGHEST SCORES", (255, 255, 255))
     high_score_rect = high_score_title.get_rect(center=(288, 300))
-    screen.blit(high_score_title, high_score_rect)
+    draw(high_score_title, high_score_rect)
     
     y_pos = 350
-    for i, s in enumerate(HIGH_SCORES):
+    for i, s in enumerate(high_scores.scores):
         color = (255, 255, 255)
         # EVIDENZIO IL PUNTEGGIO SE è IL TUO
-        if s == int(score) and i == HIGH_SCORES.index(s):
+        if s == sim.score and i == high_scores.scores.index(s):
             color = (255, 255, 0)
 
         score_line = f"{i + 1}. {s}"
-        score_surface = game_font.render(score_line, True, color)
+        score_surface = render_text(score_line, color)
         score_rect = score_surface.get_rect(center=(288, y_pos)) 
-        screen.blit(score_surface, score_rect)
+        draw(score_surface, score_rect)
         y_pos += 40 #spazio tra le linee
 
-    restart_text = game_font.render("Premi SPAZIO per Riprovare", True, (255, 255, 255))
+    restart_text = render_text("Premi SPAZIO per Riprovare", (255, 255, 255))
     restart_rect = restart_text.get_rect(center=(288, 800))
-    screen.blit(restart_text, restart_rect)
+    draw(restart_text, restart_rect)
     
     
 
 
 
 ####################################################################################
+parser = argparse.ArgumentParser(description="Flappy Bird comandato dal flag EMG")
+parser.add_argument("--replay", metavar="FILE", help="gioca sui fronti di una sessione registrata (emg_session.py)")
+parser.add_argument("--input", choices=["socket", "shm"], default="socket",
+                    help="fronti dal sensore via socket (emg_socket.py) o dalla memoria condivisa (emg_channel.py)")
+args = parser.parse_args()
+
 pygame.init()
-load_high_scores() 
+#TENERE LISTA GLOBALE PUNTEGGI MIGLIORI (highscores.txt)
+high_scores = HighScores()
 
 screen = pygame.display.set_mode((576, 1024))
 clock = pygame.time.Clock()
@@ -129,33 +93,54 @@ try:
 except pygame.error:
     game_font = pygame.font.SysFont('arial', 40)
 
-gravity = 0.3
-bird_movement = 0
-game_active = False
-can_score = True
-
-game_speed_factor = 0.5  # VELOCITA' DEL GIOCO
-
 bg_surface = pygame.image.load('assets/background-day.png').convert()
 bg_surface = pygame.transform.scale2x(bg_surface)
 
 floor_surface = pygame.image.load('assets/base.png').convert()
 floor_surface = pygame.transform.scale2x(floor_surface)
-floor_x_pos = 0
 
 bird_surface = pygame.image.load('assets/bluebird-midflap.png').convert_alpha()
 bird_surface = pygame.transform.scale2x(bird_surface)
-bird_rect = bird_surface.get_rect(center=(100, 512))
 
-pipe_surface = pygame.image.load('assets/pipe-green.png')
+pipe_surface = pygame.image.load('assets/pipe-green.png').convert()
 pipe_surface = pygame.transform.scale2x(pipe_surface)
-pipe_list = []
-SPAWNPIPE = pygame.USEREVENT
-# La velocità di spawn dei tubi viene ridotta in base al fattore di velocità
-pygame.time.set_timer(SPAWNPIPE, int(1500 / game_speed_factor))
-pipe_height = [400, 600, 800]
+# TUBO SUPERIORE GIA' RIBALTATO UNA VOLTA SOLA
+flip_pipe_surface = pygame.transform.flip(pipe_surface, False, True)
+
+# SIMULAZIONE A PASSO FISSO (flappy_sim.py): la fisica avanza di STEP secondi alla volta,
+# indipendentemente dai frame disegnati
+sim = FlappySim(bird_size=bird_surface.get_size(), pipe_size=pipe_surface.get_size())
+MAX_FRAME_TIME = 0.25   # dopo un blocco lungo la simulazione non prova a recuperare piu' di cosi'
+
+# Fronti pubblicati da emg_sensor_flag.py (socket o memoria condivisa), oppure il replay di una sessione registrata
+if args.replay:
+    emg_input = ReplayReader(SessionLog(args.replay))
+elif args.input == "socket":
+    emg_input = EmgEventClient()
+else:
+    emg_input = EmgEventReader()
+# Ogni fronte arriva al gioco come evento pygame, insieme a tastiera e finestra
+EMG_EVENT = pygame.event.custom_type()
+emg_level = False       # livello del comando EMG (True finche' la contrazione e' sopra soglia)
+pending = []            # ingressi (istante, forza del salto o stato EMG) non ancora applicati
+paused = False          # pausa comandata da una combinazione di canali EMG (emg_control.py)
+
+# Lo sfondo si disegna tutto una volta sola, poi solo dove si muovono gli sprite
+screen.blit(bg_surface, (0, 0))
+pygame.display.update()
+
+previous = time.perf_counter()
+accumulator = 0.
 
 while True:
+    now = time.perf_counter()
+    accumulator += min(now - previous, MAX_FRAME_TIME)
+
+    #LEGGO I FRONTI EMG SENZA BLOCCARE (timestamp time.time() -> orologio del gioco)
+    for emg_event in emg_input.poll():
+        pygame.event.post(pygame.event.Event(EMG_EVENT, emg=emg_event))
+    clock_offset = time.time() - now
+
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             pygame.quit()
@@ -163,69 +148,73 @@ while True:
         
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
-                if game_active:
-                    bird_movement = 0
-                    bird_movement -=9
-                else:
-                    # RIAVVIO (reset di tutto)
-                    game_active = True
-                    pipe_list.clear()
-                    bird_rect.center = (100,512)
-                    bird_movement = 0
-                    score = 0 
-        
-        if event.type == SPAWNPIPE and game_active:
-            pipe_list.extend(create_pipe())
-            score +=1
-
-    #LEGGO IL FILE EMG CON LO STATO
-    if read_emg_state_from_file():
-        if game_active:
-            bird_movement = 0
-            bird_movement -= 6      #QUANTO SALTARE
-        else:
-            game_active = True
-            pipe_list.clear()
-            bird_rect.center = (100, 512)
-            bird_movement = 0
-            score = 0
-            
-    screen.blit(bg_surface, (0, 0))
-
-    if game_active:
-        bird_movement += gravity
-        bird_rect.centery += bird_movement
-        screen.blit(bird_surface, bird_rect)
-        new_game_active_state = check_collision(pipe_list) 
-        
-        if game_active and not new_game_active_state:
+                # Arrivato dopo il frame precedente: vale dal primo passo di questo frame
+                pending.append((previous, "key", True))
+
+        if event.type == EMG_EVENT:
+            emg_event = event.emg
+            if emg_event.action == ACTION_JUMP:
+                pending.append((emg_event.timestamp - clock_offset, "emg", emg_event.state))
+            elif emg_event.action == ACTION_PAUSE and emg_event.state:
+                paused = not paused
+            elif emg_event.action == ACTION_RESTART and emg_event.state:
+                sim.restart()
+    pending.sort(key=lambda item: item[0])
+    previous = now
+
+    # IN PAUSA la simulazione e' ferma e gli ingressi arrivati nel frattempo si scartano
+    if paused:
+        accumulator = 0.
+        pending.clear()
+
+    # SEED DEL SENSORE: dalla prossima partita i tubi sono quelli della sessione registrata
+    if sim.seed is None and not sim.active and emg_input.seed is not None:
+        sim.seed = emg_input.seed
+        sim.games = 0
+
+    # PASSI DI SIMULAZIONE: ogni ingresso viene applicato al passo in cui e' arrivato
+    step_end = now - accumulator + STEP
+    while accumulator >= STEP:
+        emg_pressed = False
+        while pending and pending[0][0] <= step_end:
+            _, source, state = pending.pop(0)
+            if source == "key":
+                sim.flap(KEY_JUMP)
+            else:
+                # Un impulso ON arrivato tra due passi conta anche se e' gia' tornato OFF
+                emg_pressed = emg_pressed or state
+                emg_level = state
+        if emg_pressed or emg_level:
+            sim.flap(EMG_JUMP)
+
+        if sim.step():
             # IL GIOCO E' APPENA FINITO
-            update_high_scores(int(score))
-        
-        game_active = new_game_active_state
-        
-        pipe_list = move_pipes(pipe_list)
-        draw_pipes(pipe_list)
+            high_scores.update(sim.score)
+        accumulator -= STEP
+        step_end += STEP
+    if not pending:
+        emg_level = emg_input.state
+
+    # DISEGNO: stato interpolato tra gli ultimi due passi
+    alpha = accumulator / STEP
+    draw(bird_surface, sim.bird_rect(alpha))
+    if sim.active:
+        draw_pipes(alpha)
     else:
         #STATO GAME OVER
-        screen.blit(bird_surface, bird_rect) 
-        
         # Chiama la funzione per disegnare la schermata del Game Over
         display_game_over_screen()
 
+    draw_floor(alpha)
 
-    if game_active:
-        floor_x_pos -= 1 * game_speed_factor
-    
-    draw_floor()
-    if floor_x_pos <= -576:
-        floor_x_pos = 0
-
-    score_surface = game_font.render(str(int(score)),True,(255,255,255))
+    score_surface = render_text(str(sim.score), (255,255,255))
     score_rect = score_surface.get_rect(center = (288,100))
-    screen.blit(score_surface,score_rect)
+    draw(score_surface,score_rect)
+    if paused:
+        pause_surface = render_text("PAUSA", (255,255,255))
+        draw(pause_surface, pause_surface.get_rect(center = (288,512)))
     
     
-    pygame.display.update()
-    # Rallenta il clock in base al fattore di velocità
-    clock.tick(120 * game_speed_factor)
\ No newline at end of file
+    present()
+    # Il disegno resta limitato alla frequenza della simulazione
+    clock.tick(STEP_RATE)